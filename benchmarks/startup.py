@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Measure CLI startup: time from process spawn until `list` finishes, or until `backup --id`
+hands its targets to the backup pipeline (stubbed, so no DB work is timed).
+
+    python -m benchmarks.startup [--runs 20] [--targets 50] [--budget-ms 100]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Replaces the pipeline's run before the CLI gets to it so the run stops right before any DB work
+BACKUP_HARNESS = """
+import runpy, sys
+import operations.pipeline as pipeline
+pipeline.BackupPipeline.run = lambda self, targets: ([target["id"] for target in targets], {})
+sys.argv = ["db_backup.py", "backup", "--local", "--id", "target_0"]
+runpy.run_path("db_backup.py", run_name="__main__")
+"""
+
+SCENARIOS = {
+    "python -c pass": [sys.executable, "-c", "pass"],
+    "list": [sys.executable, "db_backup.py", "list"],
+    "backup --id": [sys.executable, "-c", BACKUP_HARNESS],
+}
+
+
+def write_config(home: Path, count: int) -> None:
+    config_dir = home / ".db_backup"
+    config_dir.mkdir(parents=True)
+    targets = [{
+        "id": f"target_{i}",
+        "database": {"type": "sqlite", "name": f"target_{i}", "host": "localhost", "port": 0,
+                     "user": "", "password": "", "path": str(home / f"target_{i}.sqlite")},
+        "backup": {"local_path": str(home / "backups"), "schedule": "daily",
+                   "cloud": {"type": "none", "s3": {"bucket": "", "access_key": "", "secret_key": ""}}},
+    } for i in range(count)]
+    (config_dir / "config.json").write_text(json.dumps({"targets": targets}))
+
+def time_command(cmd: list, env: dict, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="CLI startup benchmark")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--targets", type=int, default=50, help="Targets in the generated config")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="Fail if a CLI scenario's median wall time exceeds this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        write_config(Path(home), args.targets)
+        env = {**os.environ, "HOME": home}
+        # Warm the dependency cache and OS page cache so runs measure steady-state startup
+        time_command(SCENARIOS["backup --id"], env, 1)
+        results = {name: time_command(cmd, env, args.runs) for name, cmd in SCENARIOS.items()}
+
+    over_budget = False
+    baseline = statistics.median(results["python -c pass"])
+    print(f"{'scenario':<16}{'median ms':>11}{'p90 ms':>9}{'over python ms':>16}")
+    for name, samples in results.items():
+        median = statistics.median(samples)
+        p90 = sorted(samples)[int(len(samples) * 0.9) - 1]
+        print(f"{name:<16}{median:>11.1f}{p90:>9.1f}{median - baseline:>16.1f}")
+        # The budget is absolute wall time, interpreter startup included; the bare interpreter is only a reference
+        over_budget |= name != "python -c pass" and median > args.budget_ms
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""Backup/restore throughput benchmark over synthetic databases.
+
+Generates each shape for each handler, then backs it up and restores it once per compression
+codec in a fresh process (so peak RSS is per run), reading timings from the run's metrics record.
+
+    python -m benchmarks.suite [--handlers sqlite postgresql] [--shapes blobs] [--codecs deflate lzma]
+                               [--scale 0.1] [--repeat 3] [--output results.json]
+                               [--baseline old.json] [--tolerance 0.1]
+
+Server handlers default to the test-data docker-compose servers on localhost; point them elsewhere
+with --server postgresql=host:port:user:password.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Every table also gets an integer "id" primary key; rows are per table at --scale 1
+SHAPES = {
+    "tiny_tables": {"tables": 200, "rows": 10, "columns": {"name": "text", "value": "real"}},
+    "huge_tables": {"tables": 2, "rows": 100_000, "columns": {"name": "text", "value": "real", "created": "text"}},
+    "wide_rows": {"tables": 1, "rows": 5_000, "columns": {f"c{i}": "text" for i in range(60)}},
+    "blobs": {"tables": 1, "rows": 400, "columns": {"payload": "blob"}},
+    "deep_documents": {"tables": 1, "rows": 5_000, "columns": {"doc": "document"}},
+}
+CODECS = ["stored", "deflate", "bzip2", "lzma"]
+HANDLERS = ["sqlite", "postgresql", "mysql", "mongodb"]
+BLOB_SIZE = 64 * 1024
+DOCUMENT_DEPTH = 6
+
+# Credentials of the servers started by test-data/docker-compose.yml
+SERVERS = {
+    "postgresql": {"host": "localhost", "port": 5432, "user": "postgres", "password": ""},
+    "mysql": {"host": "localhost", "port": 3306, "user": "root", "password": ""},
+    "mongodb": {"host": "localhost", "port": 27017, "user": "", "password": ""},
+}
+COLUMN_TYPES = {
+    "sqlite": {"int": "INTEGER", "text": "TEXT", "real": "REAL", "blob": "BLOB", "document": "TEXT"},
+    "postgresql": {"int": "BIGINT", "text": "TEXT", "real": "DOUBLE PRECISION", "blob": "BYTEA", "document": "TEXT"},
+    "mysql": {"int": "BIGINT", "text": "TEXT", "real": "DOUBLE", "blob": "LONGBLOB", "document": "LONGTEXT"},
+}
+QUOTE = {"sqlite": '"', "postgresql": '"', "mysql": "`"}
+PLACEHOLDER = {"sqlite": "?", "postgresql": "%s", "mysql": "%s"}
+INSERT_BATCH = 1000
+
+# (metric, True if higher is better) compared against --baseline
+COMPARED = [
+    ("backup_mb_s", True), ("restore_mb_s", True),
+    ("backup_peak_rss", False), ("restore_peak_rss", False), ("archive_bytes", False),
+]
+
+WORKER = """
+import json, sys
+from operations.backup_restore import perform_backup, perform_restore
+op, target = sys.argv[1], json.loads(sys.argv[2])
+if op == "backup":
+    perform_backup(target)
+else:
+    perform_restore(target, sys.argv[3], force=True)
+"""
+
+
+def _text(rng: random.Random, length: int = 24) -> str:
+    return "".join(rng.choices(string.ascii_letters + "     ", k=length))
+
+def _document(rng: random.Random, depth: int) -> dict:
+    if depth == 0:
+        return {"value": rng.random(), "label": _text(rng, 12)}
+    return {
+        "name": _text(rng, 12),
+        "tags": [_text(rng, 6) for _ in range(3)],
+        "child": _document(rng, depth - 1),
+    }
+
+def _value(rng: random.Random, kind: str, as_json: bool):
+    if kind == "text":
+        return _text(rng)
+    if kind == "real":
+        return rng.random() * 1e6
+    if kind == "blob":
+        # Half noise, half zeros: realistic enough that codecs differ
+        return rng.randbytes(BLOB_SIZE // 2) + bytes(BLOB_SIZE // 2)
+    doc = _document(rng, DOCUMENT_DEPTH)
+    return json.dumps(doc) if as_json else doc
+
+def shape_rows(shape: dict, scale: float) -> int:
+    return max(1, int(shape["rows"] * scale))
+
+def generate_rows(shape: dict, table: int, scale: float, as_json: bool = True):
+    rng = random.Random(table)
+    for i in range(shape_rows(shape, scale)):
+        yield [i] + [_value(rng, kind, as_json) for kind in shape["columns"].values()]
+
+
+def populate_sql(kind: str, conn, shape: dict, scale: float) -> None:
+    q, types = QUOTE[kind], COLUMN_TYPES[kind]
+    columns = {"id": "int", **shape["columns"]}
+    cursor = conn.cursor()
+    for t in range(shape["tables"]):
+        table = f"{q}t{t:04d}{q}"
+        defs = ", ".join(f"{q}{name}{q} {types[col]}" + (" PRIMARY KEY" if name == "id" else "") for name, col in columns.items())
+        cursor.execute(f"CREATE TABLE {table} ({defs})")
+        names = ", ".join(f"{q}{name}{q}" for name in columns)
+        insert = f"INSERT INTO {table} ({names}) VALUES ({', '.join([PLACEHOLDER[kind]] * len(columns))})"
+        batch = []
+        for row in generate_rows(shape, t, scale):
+            batch.append(row)
+            if len(batch) == INSERT_BATCH:
+                cursor.executemany(insert, batch)
+                batch = []
+        if batch:
+            cursor.executemany(insert, batch)
+    conn.commit()
+    cursor.close()
+
+def create_database(kind: str, name: str, workdir: Path, shape: dict, scale: float) -> dict:
+    """Build the shape from scratch and return the target's "database" section."""
+    if kind == "sqlite":
+        path = workdir / f"{name}.sqlite"
+        path.unlink(missing_ok=True)
+        with sqlite3.connect(path) as conn:
+            populate_sql(kind, conn, shape, scale)
+        conn.close()
+        return {"type": kind, "name": name, "host": "localhost", "port": 0, "user": "", "password": "", "path": str(path)}
+
+    server = SERVERS[kind]
+    db_config = {"type": kind, "name": name, "path": "", **server}
+    if kind == "postgresql":
+        import psycopg
+        params = {"user": server["user"], "password": server["password"], "host": server["host"], "port": server["port"]}
+        with psycopg.connect(dbname="postgres", autocommit=True, **params) as admin:
+            admin.execute(f'DROP DATABASE IF EXISTS "{name}"')
+            admin.execute(f'CREATE DATABASE "{name}"')
+        with psycopg.connect(dbname=name, **params) as conn:
+            populate_sql(kind, conn, shape, scale)
+    elif kind == "mysql":
+        import mysql.connector
+        conn = mysql.connector.connect(host=server["host"], port=server["port"], user=server["user"], password=server["password"])
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+            cursor.execute(f"CREATE DATABASE `{name}`")
+            cursor.execute(f"USE `{name}`")
+            cursor.close()
+            populate_sql(kind, conn, shape, scale)
+        finally:
+            conn.close()
+    else:
+        import pymongo
+        auth = {"username": server["user"], "password": server["password"]} if server["user"] else {}
+        client = pymongo.MongoClient(host=server["host"], port=server["port"], **auth)
+        try:
+            client.drop_database(name)
+            db = client[name]
+            names = list(shape["columns"])
+            for t in range(shape["tables"]):
+                docs = ({"_id": row[0], **dict(zip(names, row[1:]))} for row in generate_rows(shape, t, scale, as_json=False))
+                batch = []
+                for doc in docs:
+                    batch.append(doc)
+                    if len(batch) == INSERT_BATCH:
+                        db[f"t{t:04d}"].insert_many(batch)
+                        batch = []
+                if batch:
+                    db[f"t{t:04d}"].insert_many(batch)
+        finally:
+            client.close()
+    return db_config
+
+
+def run_worker(env: dict, metrics_file: Path, *args: str) -> dict:
+    """Run one backup or restore in a fresh interpreter and return its metrics record."""
+    metrics_file.unlink(missing_ok=True)
+    proc = subprocess.run([sys.executable, "-c", WORKER, *args], cwd=ROOT, env=env, capture_output=True, text=True)
+    records = metrics_file.read_text().splitlines() if metrics_file.exists() else []
+    if proc.returncode or not records:
+        raise RuntimeError((proc.stderr.strip().splitlines() or ["worker failed"])[-1])
+    return json.loads(records[-1])
+
+def run_case(kind: str, shape_name: str, codec: str, db_config: dict, workdir: Path, env: dict, scale: float) -> dict:
+    shape = SHAPES[shape_name]
+    backup_dir = workdir / "backups"
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    target = {
+        "id": "bench",
+        "database": db_config,
+        "backup": {"local_path": str(backup_dir), "schedule": "daily", "compression": codec,
+                   "cloud": {"type": "none", "s3": {"bucket": "", "access_key": "", "secret_key": ""}}},
+    }
+    metrics_file = Path(env["DB_BACKUP_METRICS_FILE"])
+    backup = run_worker(env, metrics_file, "backup", json.dumps(target))
+    archive = max(backup_dir.glob("*.zip"), key=os.path.getmtime)
+    restore = run_worker(env, metrics_file, "restore", json.dumps(target), str(archive))
+    # Each worker is its own process, so the process-wide peak RSS is the run's
+
+    dump_bytes = sum(p["bytes"] for p in backup["phases"] if p["phase"] == "dump")
+    rows = shape["tables"] * shape_rows(shape, scale)
+    return {
+        "rows": rows,
+        "dump_bytes": dump_bytes,
+        "archive_bytes": archive.stat().st_size,
+        "backup_s": backup["duration"],
+        "backup_mb_s": dump_bytes / 1e6 / backup["duration"],
+        "backup_rows_s": rows / backup["duration"],
+        "backup_peak_rss": backup["process_peak_rss"],
+        "restore_s": restore["duration"],
+        "restore_mb_s": dump_bytes / 1e6 / restore["duration"],
+        "restore_rows_s": rows / restore["duration"],
+        "restore_peak_rss": restore["process_peak_rss"],
+    }
+
+def median_case(samples: list) -> dict:
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def case_key(result: dict) -> tuple:
+    return result["handler"], result["shape"], result["codec"]
+
+def compare(results: list, baseline: list, tolerance: float) -> bool:
+    """Print per-case changes against baseline; returns True if anything regressed beyond tolerance."""
+    old = {case_key(r): r for r in baseline}
+    regressed = False
+    print(f"\n{'case':<36}{'metric':<18}{'baseline':>14}{'current':>14}{'change':>9}")
+    for result in results:
+        before = old.get(case_key(result))
+        if not before:
+            continue
+        name = "/".join(case_key(result))
+        if before["status"] == "ok" and result["status"] != "ok":
+            print(f"{name:<36}{'status':<18}{'ok':>14}{'failed':>14}")
+            regressed = True
+            continue
+        if result["status"] != "ok" or before["status"] != "ok":
+            continue
+        for metric, higher_is_better in COMPARED:
+            change = (result[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > tolerance else ""
+            regressed |= worse > tolerance
+            print(f"{name:<36}{metric:<18}{before[metric]:>14.2f}{result[metric]:>14.2f}{change:>+8.1%}{flag}")
+    return regressed
+
+def parse_server(value: str) -> tuple:
+    kind, _, spec = value.partition("=")
+    if kind not in SERVERS or not spec:
+        raise argparse.ArgumentTypeError(f"expected {{{','.join(SERVERS)}}}=host:port[:user[:password]], got '{value}'")
+    host, port, user, password = (spec.split(":", 3) + ["", ""])[:4]
+    return kind, {"host": host, "port": int(port), "user": user or SERVERS[kind]["user"], "password": password}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backup/restore throughput benchmark")
+    parser.add_argument("--handlers", nargs="+", choices=HANDLERS, default=["sqlite"])
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES))
+    parser.add_argument("--codecs", nargs="+", choices=CODECS, default=CODECS)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for rows per table")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the median is reported")
+    parser.add_argument("--server", action="append", type=parse_server, default=[], help="kind=host:port[:user[:password]]")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression before failing")
+    args = parser.parse_args()
+    SERVERS.update(dict(args.server))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        (workdir / ".db_backup").mkdir()
+        env = {
+            **os.environ,
+            "HOME": tmp,
+            "DB_BACKUP_METRICS_FILE": str(workdir / "metrics.jsonl"),
+            "DB_BACKUP_PROM_FILE": str(workdir / "db_backup.prom"),
+        }
+        print(f"{'handler':<12}{'shape':<16}{'codec':<9}{'backup MB/s':>12}{'rows/s':>11}{'restore MB/s':>13}{'peak MiB':>10}{'archive MiB':>12}")
+        for kind in args.handlers:
+            for shape_name in args.shapes:
+                try:
+                    started = time.perf_counter()
+                    db_config = create_database(kind, f"bench_{shape_name}", workdir, SHAPES[shape_name], args.scale)
+                    generated = time.perf_counter() - started
+                except Exception as e:
+                    print(f"{kind:<12}{shape_name:<16}could not generate data: {e}")
+                    results.extend({"handler": kind, "shape": shape_name, "codec": codec, "status": "failed", "error": str(e)} for codec in args.codecs)
+                    continue
+                for codec in args.codecs:
+                    result = {"handler": kind, "shape": shape_name, "codec": codec}
+                    try:
+                        samples = [run_case(kind, shape_name, codec, db_config, workdir, env, args.scale) for _ in range(args.repeat)]
+                        result.update(status="ok", generate_s=generated, **median_case(samples))
+                        peak = max(result["backup_peak_rss"], result["restore_peak_rss"]) / 2**20
+                        print(f"{kind:<12}{shape_name:<16}{codec:<9}{result['backup_mb_s']:>12.1f}{result['backup_rows_s']:>11.0f}"
+                              f"{result['restore_mb_s']:>13.1f}{peak:>10.1f}{result['archive_bytes'] / 2**20:>12.2f}")
+                    except Exception as e:
+                        result.update(status="failed", error=str(e))
+                        print(f"{kind:<12}{shape_name:<16}{codec:<9}failed: {e}")
+                    results.append(result)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        if compare(results, baseline, args.tolerance):
+            print(f"\nRegression beyond {args.tolerance:.0%} against {args.baseline}")
+            return 1
+    return 1 if any(r["status"] != "ok" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
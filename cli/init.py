@@ -0,0 +1,446 @@
+import os
+import sys
+import argparse
+import re
+import time
+from glob import glob
+from pathlib import Path
+from configs.init import logger
+from configs.store import TargetStore
+
+
+# load .env if found
+def load_env_file(filepath):
+    with open(filepath) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if '=' not in line:
+                continue
+            key, val = line.split('=', 1)
+            key = key.strip()
+            val = val.strip().strip('"').strip("'")
+            os.environ.setdefault(key, val)
+
+env_file = Path(__file__).parent.parent / '.env'
+if env_file.exists():
+    load_env_file(env_file)
+
+def prompt_for_input(
+    prompt: str,
+    default: str = "",
+    required: bool = False,
+    is_password: bool = False,
+    allow_empty: bool = False
+) -> str:
+    while True:
+        if is_password:
+            value = input(f"{prompt}: ")
+        else:
+            value = input(f"{prompt} [{default}]: ").strip()
+        if value != "":
+            return value
+        if allow_empty:
+            return ""
+        if default != "":
+            return default
+        if not required:
+            return value
+        print("This field is required.")
+
+def sanitize_id(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_-]", "_", name).strip("_").lower() or "default"
+
+def daemon_client():
+    # Imported on first use: socket isn't needed by local commands such as list or backup --local
+    from daemon import client
+    return client
+
+def report_daemon_jobs(jobs: list, detach: bool = False) -> None:
+    if not jobs:
+        print("No daemon jobs.")
+        return
+    for job in jobs:
+        print(f"Daemon job {job['job']}: {job['kind']} {job['target']}")
+    if detach:
+        return
+    failed = [job for job in daemon_client().wait_for_jobs(jobs) if job["state"] == "failed"]
+    print(f"{jobs[0]['kind'].capitalize()} summary: {len(jobs) - len(failed)} succeeded, {len(failed)} failed")
+    for job in failed:
+        print(f"  - {job['target']}: {job['error']}")
+    if failed:
+        sys.exit(1)
+
+def parse_assignment(item: str, option: str) -> tuple:
+    name, sep, value = item.partition("=")
+    if not sep or not name.strip():
+        raise ValueError(f"{option} expects NAME=VALUE, got '{item}'")
+    return name.strip(), value.strip()
+
+def add_selection_args(parser: argparse.ArgumentParser, id_help: str = "Target ID (all if omitted)") -> None:
+    parser.add_argument("--id", help=id_help)
+    parser.add_argument("--tag", action="append", help="Only targets with this tag (repeatable, all must match)")
+    parser.add_argument("--group", action="append", help="Only targets in this group (repeatable)")
+
+def select_targets(store: TargetStore, args: argparse.Namespace) -> list:
+    targets = store.select([args.id] if args.id else None, args.tag, args.group)
+    if not targets:
+        if args.id:
+            raise ValueError(f"No targets found with id: {args.id}")
+        raise ValueError("No targets match the given tags/groups." if args.tag or args.group else "No targets configured.")
+    return targets
+
+def main():
+    parser = argparse.ArgumentParser(description="Database Backup CLI")
+    subparsers = parser.add_subparsers(dest="command")
+
+    init = subparsers.add_parser("init", help="Initialize backup config")
+    init.add_argument("--id", help="Target ID (auto-generated if omitted)")
+    init.add_argument("--db-type", help="Database type (postgresql/mysql/mongodb/sqlite/sqlite_fleet)")
+    init.add_argument("--db-name", help="Database name, SQLite file path, or SQLite fleet glob (e.g. '/data/tenants/*.sqlite')")
+    init.add_argument("--db-host", help="Database host")
+    init.add_argument("--db-port", type=int, help="Database port")
+    init.add_argument("--db-user", help="Database user")
+    init.add_argument("--db-password", help="Database password")
+    init.add_argument("--backup-path", help="Local backup path")
+    init.add_argument("--schedule", help="Backup schedule (hourly/daily/weekly or a cron expression)")
+    init.add_argument("--jitter", type=int, help="Random delay in seconds added to each scheduled run")
+    init.add_argument("--compression", choices=["stored", "deflate", "bzip2", "lzma"], help="Archive compression (default: deflate)")
+    init.add_argument("--compression-level", type=int, help="Zip compression level 0-9 (default: chosen by size)")
+    init.add_argument("--data-format", choices=["sql", "parquet", "arrow"], help="Table data as SQL INSERTs (default) or Parquet/Arrow files next to a schema-only dump (PostgreSQL/MySQL)")
+    init.add_argument("--max-workers", type=int, help="Upper bound on parallel table dumps for large databases (default: 4)")
+    init.add_argument("--step-pages", type=int, help="SQLite pages copied per backup step (default: 1024)")
+    init.add_argument("--step-sleep", type=float, help="Seconds SQLite backups pause between steps for writers (default: 0.005)")
+    init.add_argument("--incremental", action="store_true", help="SQLite: store only pages changed since the last full backup")
+    init.add_argument("--full-every", type=int, help="With --incremental, take a full backup every N backups (default: 7)")
+    init.add_argument("--shard-bytes", type=int, help="SQLite fleets: source bytes packed per shard archive (default: 1 GiB)")
+    init.add_argument("--include", action="append", help="Only back up tables/collections matching this pattern, e.g. 'orders*' or 'public.*' (repeatable)")
+    init.add_argument("--exclude", action="append", help="Skip tables/collections matching this pattern (repeatable)")
+    init.add_argument("--exclude-data", action="append", help="Back up the schema but not the rows of matching tables (repeatable)")
+    init.add_argument("--where", action="append", help="Row filter TABLE=CONDITION: SQL, or a JSON query for MongoDB (repeatable)")
+    init.add_argument("--partition", action="append", help="Archive TABLE=COLUMN:INTERVAL ranges separately; INTERVAL is day/month/year or a number (repeatable)")
+    init.add_argument("--read-rate", help="Max bytes/s read from this database, e.g. 20M")
+    init.add_argument("--upload-rate", help="Max bytes/s uploaded for this target, e.g. 5M")
+    init.add_argument("--cloud", choices=["none", "s3"], help="Cloud storage")
+    init.add_argument("--s3-bucket", help="S3 bucket name")
+    init.add_argument("--s3-access-key", help="S3 access key")
+    init.add_argument("--s3-secret-key", help="S3 secret key")
+    init.add_argument("--keep-hourly", type=int, help="Hourly backups to retain")
+    init.add_argument("--keep-daily", type=int, help="Daily backups to retain")
+    init.add_argument("--keep-weekly", type=int, help="Weekly backups to retain")
+    init.add_argument("--keep-monthly", type=int, help="Monthly backups to retain")
+    init.add_argument("--tag", action="append", help="Tag for bulk selection (repeatable)")
+    init.add_argument("--group", help="Group for bulk selection")
+    init.add_argument("--interactive", action="store_true")
+
+    backup = subparsers.add_parser("backup", help="Perform backup")
+    add_selection_args(backup)
+    backup.add_argument("--jobs", type=int, default=4, help="Targets dumped concurrently")
+    backup.add_argument("--compress-jobs", type=int, help="Archives compressed concurrently (default: --jobs, at most one per CPU)")
+    backup.add_argument("--upload-jobs", type=int, help="Archives uploaded concurrently (default: --jobs)")
+    backup.add_argument("--queue-size", type=int, help="Finished dumps/archives allowed to wait for the next stage (default 2)")
+    backup.add_argument("--per-host", type=int, default=1, help="Concurrent backups per database host")
+    backup.add_argument("--local", action="store_true", help="Run in this process even if the daemon is running")
+    backup.add_argument("--detach", action="store_true", help="Return after the daemon accepts the job")
+    backup.add_argument("--read-limit", help="Max bytes/s read from all databases combined (default: scheduler.read_bandwidth)")
+    backup.add_argument("--upload-limit", help="Max bytes/s uploaded by all targets combined (default: scheduler.upload_bandwidth)")
+    backup.add_argument("--profile", action="store_true", help="Save cProfile and tracemalloc captures per phase next to the backup (runs locally, one target at a time)")
+
+    restore = subparsers.add_parser("restore", help="Restore database")
+    restore.add_argument("--id", required=True, help="Target ID")
+    restore.add_argument("--file", help="Backup file (latest if omitted)")
+    restore.add_argument("--member", action="append", help="SQLite fleets: database to restore, as named in the index (all if omitted, repeatable)")
+    restore.add_argument("--force", action="store_true")
+    restore.add_argument("--interactive", action="store_true")
+    restore.add_argument("--local", action="store_true", help="Run in this process even if the daemon is running")
+    restore.add_argument("--detach", action="store_true", help="Return after the daemon accepts the job")
+    restore.add_argument("--profile", action="store_true", help="Save cProfile and tracemalloc captures per phase next to the backups (runs locally)")
+
+    plan = subparsers.add_parser("plan", help="Estimate backup size and duration without backing up")
+    add_selection_args(plan)
+
+    prune = subparsers.add_parser("prune", help="Delete backups outside the retention policy")
+    add_selection_args(prune)
+    prune.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+
+    verify = subparsers.add_parser("verify", help="Check stored backups against their checksum manifests")
+    add_selection_args(verify)
+    verify.add_argument("--file", action="append", help="Backup archive name (all stored backups if omitted, repeatable)")
+    verify.add_argument("--latest", action="store_true", help="Only verify each target's newest backup")
+    verify.add_argument("--deep", action="store_true", help="Also decompress and check the dump's structure")
+    verify.add_argument("--jobs", type=int, default=4, help="Chunks hashed in parallel per archive")
+
+    schedule = subparsers.add_parser("schedule", help="Start scheduler")
+    add_selection_args(schedule)
+    schedule.add_argument("--jobs", type=int, help="Maximum concurrent scheduled backups (default: scheduler.jobs or 4)")
+
+    daemon = subparsers.add_parser("daemon", help="Run the backup daemon")
+    daemon.add_argument("--jobs", type=int, default=4, help="Concurrent requests (backup batches, restores) run through the API")
+    daemon.add_argument("--schedule", action="store_true", help="Also run the scheduler inside the daemon")
+
+    status = subparsers.add_parser("status", help="Show daemon job status")
+    status.add_argument("--job", help="Job ID (all if omitted)")
+
+    subparsers.add_parser("reload", help="Reload the daemon's config")
+
+    remove = subparsers.add_parser("remove", help="Remove a target from the config (its backups are kept)")
+    remove.add_argument("--id", required=True, help="Target ID")
+
+    list_cmd = subparsers.add_parser("list", help="List targets")
+    add_selection_args(list_cmd)
+    list_cmd.add_argument("--show-backups", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.command == "init":
+        store = TargetStore()
+        target = {
+            "id": "",
+            "database": {"type": "", "name": "", "host": "localhost", "port": 0, "user": "", "password": "", "path": ""},
+            "backup": {"local_path": "", "schedule": "daily", "cloud": {"type": "none", "s3": {"bucket": "", "access_key": "", "secret_key": ""}}},
+        }
+
+        if args.interactive or not args.db_type:
+            target["database"]["type"] = prompt_for_input("Database type (postgresql/mysql/mongodb/sqlite/sqlite_fleet)", required=True).lower()
+        else:
+            target["database"]["type"] = args.db_type.lower()
+
+        if target["database"]["type"] == "sqlite":
+            target["database"]["path"] = args.db_name or prompt_for_input("SQLite file path", required=True)
+            target["database"]["name"] = Path(target["database"]["path"]).stem
+        elif target["database"]["type"] == "sqlite_fleet":
+            target["database"]["path"] = args.db_name or prompt_for_input("Glob of the fleet's SQLite files", required=True)
+            from db_store.sqlite_fleet import glob_base
+            target["database"]["name"] = glob_base(target["database"]["path"]).resolve().name or "fleet"
+        else:
+            target["database"]["name"] = args.db_name or prompt_for_input("Database name", required=True)
+            target["database"]["host"] = args.db_host or prompt_for_input("Database host", "localhost")
+            target["database"]["port"] = args.db_port or int(prompt_for_input("Database port", "5432" if target["database"]["type"] == "postgresql" else "3306" if target["database"]["type"] == "mysql" else "27017", required=True))
+            if target["database"]["type"] in ["postgresql", "mysql"]:
+                target["database"]["user"] = args.db_user or prompt_for_input("Database user", required=True)
+                target["database"]["password"] = args.db_password or prompt_for_input("Database password", required=True, is_password=True, allow_empty=True)
+            elif target["database"]["type"] == "mongodb":
+                target["database"]["user"] = args.db_user or prompt_for_input("Database user", default="", required=False, allow_empty=True)
+                target["database"]["password"] = args.db_password or prompt_for_input("Database password", default="", is_password=True, allow_empty=True)
+
+        target["backup"]["local_path"] = args.backup_path or prompt_for_input("Local backup path", required=True)
+        target["backup"]["schedule"] = args.schedule or prompt_for_input("Schedule (hourly/daily/weekly or cron expression)", "daily")
+        if args.jitter:
+            target["backup"]["jitter"] = args.jitter
+        if args.compression:
+            target["backup"]["compression"] = args.compression
+        if args.compression_level is not None:
+            target["backup"]["compression_level"] = args.compression_level
+        if args.data_format:
+            target["backup"]["data_format"] = args.data_format
+        if args.max_workers:
+            target["backup"]["max_workers"] = args.max_workers
+        if args.step_pages:
+            target["backup"]["step_pages"] = args.step_pages
+        if args.step_sleep is not None:
+            target["backup"]["step_sleep"] = args.step_sleep
+        if args.incremental:
+            target["backup"]["incremental"] = True
+        if args.full_every:
+            target["backup"]["full_every"] = args.full_every
+        if args.shard_bytes:
+            target["backup"]["shard_bytes"] = args.shard_bytes
+        filters = {key: patterns for key, patterns in (
+            ("include", args.include), ("exclude", args.exclude), ("exclude_data", args.exclude_data)) if patterns}
+        if args.where:
+            filters["where"] = dict(parse_assignment(item, "--where") for item in args.where)
+        if args.partition:
+            filters["partition"] = {}
+            for table, spec in (parse_assignment(item, "--partition") for item in args.partition):
+                column, _, interval = spec.rpartition(":")
+                filters["partition"][table] = {"column": column, "interval": int(interval) if interval.isdigit() else interval}
+        if filters:
+            target["backup"]["filters"] = filters
+        if args.read_rate:
+            target["backup"]["read_rate"] = args.read_rate
+        if args.upload_rate:
+            target["backup"]["upload_rate"] = args.upload_rate
+        target["backup"]["cloud"]["type"] = args.cloud or prompt_for_input("Cloud storage (none/s3)", "none")
+
+        if target["backup"]["cloud"]["type"] == "s3":
+            target["backup"]["cloud"]["s3"]["bucket"] = args.s3_bucket or prompt_for_input("S3 bucket name", required=True)
+            target["backup"]["cloud"]["s3"]["access_key"] = args.s3_access_key or prompt_for_input("S3 access key", required=True)
+            target["backup"]["cloud"]["s3"]["secret_key"] = args.s3_secret_key or prompt_for_input("S3 secret key", required=True, is_password=True)
+
+        retention = {
+            period: count for period, count in (
+                ("hourly", args.keep_hourly), ("daily", args.keep_daily),
+                ("weekly", args.keep_weekly), ("monthly", args.keep_monthly),
+            ) if count is not None
+        }
+        if retention:
+            target["backup"]["retention"] = retention
+        if args.tag:
+            target["tags"] = sorted(set(args.tag))
+        if args.group:
+            target["group"] = args.group
+
+        default_id = sanitize_id(target["database"]["name"])
+        target["id"] = sanitize_id(args.id or prompt_for_input("Target ID", default_id, required=True))
+
+        if store.get(target["id"]):
+            raise ValueError(f"ID '{target['id']}' already exists.")
+        store.add(target)
+        logger.info(f"Target '{target['id']}' initialized.")
+
+    elif args.command == "backup":
+        store = TargetStore()
+        targets = select_targets(store, args)
+        # Profiling and one-off limits apply to this process, so they bypass the daemon
+        local = args.local or args.profile or args.read_limit or args.upload_limit
+        if not local and daemon_client().is_running():
+            jobs = daemon_client().request({
+                "op": "backup", "ids": [args.id] if args.id else None, "tags": args.tag, "groups": args.group,
+                "jobs": args.jobs, "per_host": args.per_host, "compress_jobs": args.compress_jobs,
+                "upload_jobs": args.upload_jobs, "queue_size": args.queue_size,
+            })["jobs"]
+            report_daemon_jobs(jobs, args.detach)
+            return
+        # Deferred so listing and daemon-client paths don't pay for handler imports
+        from operations import throttle
+        from operations.batch import run_backups
+        limits = store.config.get("scheduler", {})
+        throttle.configure(args.read_limit or limits.get("read_bandwidth", 0), args.upload_limit or limits.get("upload_bandwidth", 0))
+        stage_jobs = {stage: n for stage, n in (("compress", args.compress_jobs), ("upload", args.upload_jobs)) if n}
+        succeeded, failed = run_backups(targets, args.jobs, args.per_host, args.profile, stage_jobs, args.queue_size)
+        print(f"Backup summary: {len(succeeded)} succeeded, {len(failed)} failed")
+        for target_id, error in failed.items():
+            print(f"  - {target_id}: {error}")
+        if failed:
+            sys.exit(1)
+
+    elif args.command == "restore":
+        target = TargetStore().get(args.id)
+        if not target:
+            raise ValueError(f"No target with id: {args.id}")
+        from operations.backup_restore import perform_restore, find_latest_backup
+        backup_file = args.file
+        if not backup_file and args.interactive:
+            suffix = "index.json" if target["database"]["type"] == "sqlite_fleet" else "zip"
+            backups = sorted(glob(os.path.join(target["backup"]["local_path"], f"{target['database']['type']}_{args.id}_*.{suffix}")), reverse=True)
+            if not backups:
+                logger.error(f"No backups found for target: {args.id}")
+                sys.exit(1)
+            for i, b in enumerate(backups, 1):
+                print(f"{i}. {b}")
+            choice = int(prompt_for_input("Select backup number", required=True)) - 1
+            backup_file = backups[choice]
+        elif not backup_file:
+            backup_file = find_latest_backup(target, Path(target["backup"]["local_path"]))
+            if not backup_file:
+                logger.error(f"No backups found for target: {args.id}")
+                sys.exit(1)
+            backup_file = str(backup_file)
+        if not (args.local or args.profile) and daemon_client().is_running():
+            if not args.force:
+                confirm = input(f"Restore {target['database']['type']} database '{target['database']['name']}' from {backup_file}? (y/n): ").strip().lower()
+                if confirm != "y":
+                    logger.info("Restore cancelled.")
+                    return
+            jobs = daemon_client().request({"op": "restore", "id": args.id, "file": str(Path(backup_file).resolve()), "members": args.member})["jobs"]
+            report_daemon_jobs(jobs, args.detach)
+            return
+        logger.info(f"Restoring target: {args.id} from {backup_file}")
+        perform_restore(target, backup_file, args.force, args.profile, args.member)
+
+    elif args.command == "plan":
+        targets = select_targets(TargetStore(), args)
+        from db_store.dbms_handler import get_dbms_handler
+        from operations.planner import plan_backup
+        from operations.throttle import human_bytes
+        for target in targets:
+            plan = plan_backup(target, get_dbms_handler(target["database"]["type"]))
+            if not plan:
+                print(f"- {target['id']}: no estimate available")
+                continue
+            print(f"- {target['id']}: ~{human_bytes(plan['dump_bytes'])} dump, ~{human_bytes(plan['archive_bytes'])} archive, ~{plan['duration']:.0f}s")
+            print(f"  {plan['tables']} table(s), {plan['workers']} worker(s), {plan['fetch_size']} rows per fetch, "
+                  f"{human_bytes(plan['free_bytes'])} free in {target['backup']['local_path']}")
+
+    elif args.command == "prune":
+        targets = select_targets(TargetStore(), args)
+        from operations.retention import prune_backups
+        for target in targets:
+            prune_backups(target, args.dry_run)
+
+    elif args.command == "verify":
+        targets = select_targets(TargetStore(), args)
+        from operations.verify import VerificationError, verify_target
+        failed = 0
+        for target in targets:
+            names = [Path(name).name for name in args.file] if args.file else None
+            try:
+                results = verify_target(target, names, args.latest, args.jobs, args.deep)
+            except VerificationError as e:
+                results, failed = e.results, failed + 1
+            if not results:
+                print(f"- {target['id']}: no backups found")
+            for name, problems in results.items():
+                print(f"- {target['id']} {name}: {'FAILED' if problems else 'OK'}")
+                for problem in problems:
+                    print(f"  {problem}")
+        if failed:
+            sys.exit(1)
+
+    elif args.command == "schedule":
+        from scheduler.init import schedule_backups
+        store = TargetStore()
+        select_targets(store, args)
+        limits = store.config.get("scheduler", {})
+        selection = {"ids": [args.id] if args.id else None, "tags": args.tag, "groups": args.group}
+        schedule_backups(store, selection, args.jobs or limits.get("jobs", 4), limits)
+
+    elif args.command == "daemon":
+        from daemon.init import run_daemon
+        run_daemon(args.jobs, args.schedule)
+
+    elif args.command == "status":
+        jobs = daemon_client().request({"op": "status", "job": args.job})["jobs"]
+        if not jobs:
+            print("No daemon jobs.")
+        for job in jobs:
+            elapsed = (job["finished_at"] or time.time()) - (job["started_at"] or job["queued_at"])
+            state = f"{job['state']} [{job['phase']}]" if job.get("phase") else job["state"]
+            print(f"- Job {job['job']}: {job['kind']} {job['target']} {state} ({elapsed:.1f}s)")
+            if job["error"]:
+                print(f"  Error: {job['error']}")
+
+    elif args.command == "reload":
+        targets = daemon_client().request({"op": "reload"})["targets"]
+        print(f"Daemon reloaded {targets} target(s).")
+
+    elif args.command == "remove":
+        TargetStore().remove(args.id)
+        logger.info(f"Target '{args.id}' removed.")
+
+    elif args.command == "list":
+        store = TargetStore()
+        if not store.targets:
+            print("No backup targets configured.")
+            return
+        print("Backup targets:")
+        for target in select_targets(store, args):
+            print(f"- ID: {target['id']}")
+            print(f"  Database: {target['database']['type']} ({target['database']['name']})")
+            print(f"  Backup Path: {target['backup']['local_path']}")
+            print(f"  Schedule: {target['backup']['schedule']}")
+            print(f"  Cloud: {target['backup']['cloud']['type']}")
+            if target.get("tags") or target.get("group"):
+                print(f"  Tags: {', '.join(target.get('tags', [])) or '-'}  Group: {target.get('group') or '-'}")
+            if target["backup"].get("retention"):
+                print(f"  Retention: {', '.join(f'{k}={v}' for k, v in target['backup']['retention'].items())}")
+            if args.show_backups:
+                backups = sorted(glob(os.path.join(target["backup"]["local_path"], f"{target['database']['type']}_{target['id']}_*.zip")), reverse=True)
+                print("  Backups:" if backups else "  No backups found.")
+                for b in backups:
+                    print(f"    - {b}")
+            print()
+
+    else:
+        parser.print_help()
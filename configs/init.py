@@ -1,3 +1,4 @@
+from datetime import datetime
 import logging
 from pathlib import Path
 import json
@@ -20,18 +21,37 @@ def load_config() -> Dict:
     if not CONFIG_FILE.exists():
         raise FileNotFoundError("Configuration file not found. Run 'init' first.")
     with CONFIG_FILE.open("r") as f:
-        config = json.load(f)
-        save_config(config)
-    return config
+        return json.load(f)
 
 def save_config(config: Dict) -> None:
     with CONFIG_FILE.open("w") as f:
         json.dump(config, f, indent=4)
     logger.info(f"Configuration saved to {CONFIG_FILE}")
 
+def validate_filters(db_type: str, filters: Dict) -> None:
+    for key in ["include", "exclude", "exclude_data"]:
+        if not isinstance(filters.get(key, []), list) or not all(isinstance(p, str) for p in filters.get(key, [])):
+            raise ValueError(f"Filter '{key}' must be a list of patterns")
+    for table, condition in filters.get("where", {}).items():
+        if db_type == "mongodb":
+            try:
+                query = json.loads(condition) if isinstance(condition, str) else condition
+            except ValueError:
+                raise ValueError(f"Filter 'where' for {table} must be a JSON query") from None
+            if not isinstance(query, dict):
+                raise ValueError(f"Filter 'where' for {table} must be a JSON query")
+        elif not isinstance(condition, str) or not condition.strip():
+            raise ValueError(f"Filter 'where' for {table} must be a SQL condition")
+    for table, spec in filters.get("partition", {}).items():
+        interval = spec.get("interval") if isinstance(spec, dict) else None
+        if not isinstance(spec, dict) or not spec.get("column") or not (interval in ["day", "month", "year"] or (isinstance(interval, int) and interval > 0)):
+            raise ValueError(f"Filter 'partition' for {table} needs a 'column' and an 'interval' (day/month/year or a positive number)")
+    if filters and db_type not in ["postgresql", "mysql", "mongodb"]:
+        raise ValueError(f"Backup filters aren't supported for {db_type}")
+
 def validate_config(target: Dict) -> None:
     db_type = target["database"]["type"]
-    if db_type == "sqlite":
+    if db_type in ["sqlite", "sqlite_fleet"]:
         if not target["database"].get("path"):
             raise ValueError("SQLite requires 'path'")
     else:
@@ -44,6 +64,45 @@ def validate_config(target: Dict) -> None:
                     raise ValueError(f"{db_type} requires '{field}'")
     if not target["backup"].get("local_path"):
         raise ValueError("Backup requires 'local_path'")
+    from scheduler.cron import CronExpression
+    # A schedule that parses can still never fire (e.g. "0 0 30 2 *")
+    CronExpression(target["backup"].get("schedule", "daily")).next_after(datetime.now())
+    if target["backup"].get("jitter", 0) < 0:
+        raise ValueError("Backup 'jitter' must be non-negative")
+    for period, count in target["backup"].get("retention", {}).items():
+        if period not in ["hourly", "daily", "weekly", "monthly"]:
+            raise ValueError(f"Unknown retention period '{period}'")
+        if not isinstance(count, int) or count < 0:
+            raise ValueError(f"Retention '{period}' must be a non-negative integer")
+    if target["backup"].get("retention") and not sum(target["backup"]["retention"].values()):
+        raise ValueError("Retention must keep at least one backup")
+    from operations.throttle import parse_rate
+    for key in ["read_rate", "upload_rate"]:
+        parse_rate(target["backup"].get(key, 0))
+    codec = target["backup"].get("compression", "deflate")
+    if codec not in ["stored", "deflate", "bzip2", "lzma"]:
+        raise ValueError(f"Unknown compression '{codec}'")
+    level = target["backup"].get("compression_level")
+    # zlib takes 0-9 and bz2 1-9; zipfile ignores the level for stored and lzma
+    low, high = {"bzip2": (1, 9)}.get(codec, (0, 9))
+    if level is not None and (not isinstance(level, int) or not low <= level <= high):
+        raise ValueError(f"Backup 'compression_level' for {codec} must be an integer from {low} to {high}")
+    workers = target["backup"].get("max_workers", 1)
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError("Backup 'max_workers' must be a positive integer")
+    for key in ["step_pages", "full_every", "shard_bytes"]:
+        value = target["backup"].get(key, 1)
+        if not isinstance(value, int) or value < 1:
+            raise ValueError(f"Backup '{key}' must be a positive integer")
+    step_sleep = target["backup"].get("step_sleep", 0)
+    if not isinstance(step_sleep, (int, float)) or step_sleep < 0:
+        raise ValueError("Backup 'step_sleep' must be a non-negative number of seconds")
+    validate_filters(db_type, target["backup"].get("filters", {}))
+    data_format = target["backup"].get("data_format", "sql")
+    if data_format not in ["sql", "parquet", "arrow"]:
+        raise ValueError(f"Unknown data_format '{data_format}'")
+    if data_format != "sql" and db_type not in ["postgresql", "mysql"]:
+        raise ValueError(f"data_format '{data_format}' is only supported for PostgreSQL and MySQL")
     if target["backup"]["cloud"]["type"] == "s3":
         for field in ["bucket", "access_key", "secret_key"]:
             if not target["backup"]["cloud"]["s3"].get(field):
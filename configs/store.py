@@ -0,0 +1,159 @@
+import fcntl
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from configs.init import CONFIG_FILE, logger, validate_config
+
+# Above this many targets config.json is written one target per line, which is ~4x faster than indent=4
+PRETTY_PRINT_LIMIT = 1000
+
+
+class TargetStore:
+    """config.json loaded into an ID index with tag and group indexes.
+
+    Updates take an exclusive lock, re-read the file, apply the change and atomically
+    replace it, so concurrent CLI, scheduler and daemon processes never lose each other's edits.
+    Within a process, reloads build new indexes and swap them in under a lock, so threads
+    selecting targets never see them half-built.
+    """
+
+    def __init__(self, path: Path = CONFIG_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.lock_path = path.with_suffix(".lock")
+        self.stamp = None
+        self.version = 0
+        self._load()
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            raise FileNotFoundError("Configuration file not found. Run 'init' first.")
+        stamp = self._stat()
+        with self.path.open("r") as f:
+            self._index(json.load(f))
+        self.stamp = stamp
+
+    def _index(self, config: Dict) -> None:
+        by_id, by_tag, by_group = {}, defaultdict(set), defaultdict(set)
+        for target in config["targets"]:
+            _index_target(target, by_id, by_tag, by_group)
+        with self.lock:
+            self.config, self.by_id, self.by_tag, self.by_group = config, by_id, by_tag, by_group
+            self.version += 1
+
+    @property
+    def targets(self) -> List[Dict]:
+        return self.config["targets"]
+
+    def get(self, target_id: str) -> Optional[Dict]:
+        return self.by_id.get(target_id)
+
+    def select(self, ids: Iterable[str] = None, tags: Iterable[str] = None, groups: Iterable[str] = None) -> List[Dict]:
+        """Targets matching every given filter: any of ids, all of tags, any of groups."""
+        with self.lock:
+            return self._select(ids, tags, groups)
+
+    def _select(self, ids: Iterable[str] = None, tags: Iterable[str] = None, groups: Iterable[str] = None) -> List[Dict]:
+        selected = None
+        if ids:
+            selected = {i for i in ids if i in self.by_id}
+        for tag in tags or []:
+            matches = self.by_tag.get(tag, set())
+            selected = matches if selected is None else selected & matches
+        if groups:
+            matches = set().union(*(self.by_group.get(g, set()) for g in groups))
+            selected = matches if selected is None else selected & matches
+        if selected is None:
+            return list(self.targets)
+        if ids and not tags and not groups:
+            return [self.by_id[i] for i in dict.fromkeys(ids) if i in selected]
+        return [t for t in self.targets if t["id"] in selected]
+
+    def reload(self) -> None:
+        self._load()
+        logger.info(f"Configuration reloaded: {len(self.targets)} target(s)")
+
+    def refresh(self) -> bool:
+        """Reload if config.json changed on disk; returns True when it did."""
+        if self._stat() == self.stamp:
+            return False
+        self.reload()
+        return True
+
+    @contextmanager
+    def _locked(self):
+        with self.lock_path.open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self.path.exists():
+                    if self._stat() != self.stamp:
+                        self._load()
+                else:
+                    self._index({"targets": []})
+                try:
+                    yield
+                    self._write()
+                except Exception:
+                    if self.path.exists():
+                        self._load()  # drop the half-applied (or unsaved) change
+                    raise
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write(self) -> None:
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with tmp_path.open("w") as f:
+                if len(self.targets) <= PRETTY_PRINT_LIMIT:
+                    json.dump(self.config, f, indent=4)
+                else:
+                    rest = {k: v for k, v in self.config.items() if k != "targets"}
+                    f.write('{\n"targets": [\n')
+                    f.write(",\n".join(json.dumps(t) for t in self.targets))
+                    f.write("\n]")
+                    for key, value in rest.items():
+                        f.write(f",\n{json.dumps(key)}: {json.dumps(value)}")
+                    f.write("\n}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            tmp_path.replace(self.path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        self.stamp = self._stat()
+        logger.info(f"Configuration saved to {self.path}")
+
+    def add(self, target: Dict) -> None:
+        validate_config(target)
+        with self._locked():
+            if target["id"] in self.by_id:
+                raise ValueError(f"ID '{target['id']}' already exists.")
+            with self.lock:
+                self.targets.append(target)
+                _index_target(target, self.by_id, self.by_tag, self.by_group)
+                self.version += 1
+
+    def remove(self, target_id: str) -> None:
+        with self._locked():
+            if target_id not in self.by_id:
+                raise ValueError(f"No target with id: {target_id}")
+            self._index({**self.config, "targets": [t for t in self.targets if t["id"] != target_id]})
+
+
+def _index_target(target: Dict, by_id: Dict, by_tag: Dict, by_group: Dict) -> None:
+    by_id[target["id"]] = target
+    for tag in target.get("tags", []):
+        by_tag[tag].add(target["id"])
+    if target.get("group"):
+        by_group[target["group"]].add(target["id"])
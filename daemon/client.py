@@ -0,0 +1,47 @@
+import json
+import socket
+import time
+from typing import Dict
+from configs.init import CONFIG_DIR
+
+SOCKET_PATH = CONFIG_DIR / "daemon.sock"
+
+
+def request(payload: Dict, timeout: float = 30.0) -> Dict:
+    """Send one request to the daemon and return its reply; raises ConnectionError if it isn't running."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(SOCKET_PATH))
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except (FileNotFoundError, ConnectionRefusedError, socket.timeout) as e:
+        raise ConnectionError(f"Backup daemon not reachable at {SOCKET_PATH}: {e}") from None
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise ValueError(response.get("error", "Daemon request failed"))
+    return response
+
+def is_running() -> bool:
+    if not SOCKET_PATH.exists():
+        return False
+    try:
+        request({"op": "ping"}, timeout=1.0)
+        return True
+    except ConnectionError:
+        return False
+
+def wait_for_jobs(jobs: list, poll_interval: float = 0.5) -> list:
+    """Poll until every job has finished; returns their final records."""
+    pending = {job["job"] for job in jobs}
+    finished = {}
+    while pending:
+        for job_id in list(pending):
+            job = request({"op": "status", "job": job_id})["jobs"][0]
+            if job["state"] in ("succeeded", "failed"):
+                finished[job_id] = job
+                pending.discard(job_id)
+        if pending:
+            time.sleep(poll_interval)
+    return [finished[job["job"]] for job in jobs]
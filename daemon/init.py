@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from configs.init import logger
+from configs.store import TargetStore
+from daemon.client import SOCKET_PATH
+from db_store.connections import connections
+from operations import metrics, throttle
+from operations.backup_restore import perform_restore
+from operations.batch import run_backups
+
+
+class BackupDaemon:
+    """Long-running process that keeps config and handlers warm and serves a JSON-lines API on a Unix socket.
+
+    Each request is one JSON object per line with an "op" key; each reply is one JSON object per line.
+      ping                              -> {"ok": true, "pid": ...}
+      backup  {"ids", "tags", "groups",  -> {"ok": true, "jobs": [...]}  (one per target, run as one batch)
+               "jobs", "per_host", "compress_jobs", "upload_jobs", "queue_size"}
+      restore {"id": .., "file": ..}    -> {"ok": true, "jobs": [...]}
+      status  {"job": .. | null}        -> {"ok": true, "jobs": [...]}
+      reload                            -> {"ok": true, "targets": n}
+      shutdown                          -> {"ok": true}
+    """
+
+    def __init__(self, jobs: int = 4, schedule: bool = False):
+        self.store = TargetStore()
+        limits = self.store.config.get("scheduler", {})
+        connections.enable(limits.get("pool_idle_timeout", 300), limits.get("pool_size", 4))
+        throttle.configure(limits.get("read_bandwidth", 0), limits.get("upload_bandwidth", 0))
+        self.executor = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="daemon")
+        self.jobs = {}
+        self.job_ttl = limits.get("job_ttl", 3600)  # seconds finished jobs stay visible to status
+        self.job_ids = itertools.count(1)
+        self.schedule = schedule
+        self.scheduler = None
+        self.stopping = None
+
+    def _targets(self, ids: List[str] = None, tags: List[str] = None, groups: List[str] = None) -> List[Dict]:
+        self.store.refresh()
+        targets = self.store.select(ids, tags, groups)
+        missing = set(ids or []) - set(self.store.by_id)
+        if missing:
+            raise ValueError(f"No targets found with id: {', '.join(sorted(missing))}")
+        if not targets:
+            raise ValueError("No targets configured.")
+        return targets
+
+    def _new_job(self, kind: str, target_id: str) -> Dict:
+        self._evict()
+        job = {
+            "job": str(next(self.job_ids)),
+            "kind": kind,
+            "target": target_id,
+            "state": "queued",
+            "queued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        self.jobs[job["job"]] = job
+        return job
+
+    def _evict(self) -> None:
+        """Forget jobs that finished more than job_ttl seconds ago."""
+        cutoff = time.time() - self.job_ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self.jobs[job_id]
+
+    def _set_state(self, job: Dict, state: str, error: str = None) -> None:
+        if state == "running":
+            job["started_at"] = time.time()
+        else:
+            job["finished_at"] = time.time()
+            job["error"] = error
+        job["state"] = state
+
+    def _start_job(self, kind: str, target: Dict, fn, *args) -> Dict:
+        job = self._new_job(kind, target["id"])
+
+        def run():
+            self._set_state(job, "running")
+            try:
+                fn(target, *args)
+                self._set_state(job, "succeeded")
+            except Exception as e:
+                logger.error(f"Daemon {kind} of {target['id']} failed: {e}")
+                self._set_state(job, "failed", str(e))
+
+        self.executor.submit(run)
+        return job
+
+    def _start_backups(self, targets: List[Dict], request: Dict) -> List[Dict]:
+        """Back targets up as one batch through the staged pipeline, with the client's concurrency options."""
+        jobs = {target["id"]: self._new_job("backup", target["id"]) for target in targets}
+        stage_jobs = {stage: request[f"{stage}_jobs"] for stage in ("compress", "upload") if request.get(f"{stage}_jobs")}
+
+        def run():
+            try:
+                run_backups(targets, request.get("jobs") or 4, request.get("per_host") or 1, False, stage_jobs,
+                            request.get("queue_size"), lambda target_id, state, error=None: self._set_state(jobs[target_id], state, error))
+            except Exception as e:
+                logger.error(f"Daemon backup batch failed: {e}")
+                for job in jobs.values():
+                    if not job["finished_at"]:
+                        self._set_state(job, "failed", str(e))
+
+        self.executor.submit(run)
+        return list(jobs.values())
+
+    def _with_phase(self, job: Dict) -> Dict:
+        run = metrics.active_runs.get((job["kind"], job["target"])) if job["state"] == "running" else None
+        phase = run.current if run else None
+        return {**job, "phase": phase.name if phase else None}
+
+    def _start_scheduler(self) -> None:
+        from scheduler.init import Scheduler
+        limits = self.store.config.get("scheduler", {})
+        self.scheduler = Scheduler(self.store, {}, limits.get("jobs", 4), limits)
+        threading.Thread(target=self.scheduler.run_forever, name="scheduler", daemon=True).start()
+
+    def reload(self) -> int:
+        # The scheduler notices the new store version on its next config check
+        self.store.reload()
+        return len(self.store.targets)
+
+    def handle(self, request: Dict) -> Dict:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "backup":
+            targets = self._targets(request.get("ids"), request.get("tags"), request.get("groups"))
+            return {"ok": True, "jobs": self._start_backups(targets, request)}
+        if op == "restore":
+            target = self._targets([request["id"]])[0]
+            return {"ok": True, "jobs": [self._start_job("restore", target, perform_restore, request["file"], True, False, request.get("members"))]}
+        if op == "status":
+            job_id = request.get("job")
+            self._evict()
+            if job_id and job_id not in self.jobs:
+                raise ValueError(f"No job with id: {job_id}")
+            jobs = [self.jobs[job_id]] if job_id else list(self.jobs.values())
+            return {"ok": True, "jobs": [self._with_phase(job) for job in jobs]}
+        if op == "reload":
+            return {"ok": True, "targets": self.reload()}
+        if op == "shutdown":
+            self.stopping.set()
+            return {"ok": True}
+        raise ValueError(f"Unknown op: {op}")
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    response = self.handle(json.loads(line))
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        self.stopping = asyncio.Event()
+        SOCKET_PATH.unlink(missing_ok=True)
+        # Bind under an owner-only umask: a chmod after bind leaves a window where others can connect.
+        # No jobs run yet, so nothing else creates files while the umask is narrowed.
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self._serve_client, path=str(SOCKET_PATH))
+        finally:
+            os.umask(umask)
+        if self.schedule:
+            self._start_scheduler()
+        logger.info(f"Daemon listening on {SOCKET_PATH}")
+        async with server:
+            await self.stopping.wait()
+        if self.scheduler:
+            self.scheduler.stop(wait=False)
+        self.executor.shutdown(wait=True)
+        SOCKET_PATH.unlink(missing_ok=True)
+        logger.info("Daemon stopped")
+
+
+def run_daemon(jobs: int = 4, schedule: bool = False) -> None:
+    try:
+        asyncio.run(BackupDaemon(jobs, schedule).serve())
+    except KeyboardInterrupt:
+        SOCKET_PATH.unlink(missing_ok=True)
+        logger.info("Daemon stopped")
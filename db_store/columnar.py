@@ -0,0 +1,141 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+from dep_manage.init import DEPENDENCY_GROUPS, install_dependencies, load_requirements
+
+# backup.data_format -> file suffix of each table's data; "sql" keeps INSERTs in the dump itself
+COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+ROW_GROUP_ROWS = 64 * 1024  # rows buffered per Parquet row group / Arrow record batch
+CODEC = "zstd"
+
+# information_schema.columns.data_type, in PostgreSQL's and MySQL's spellings; anything else is stored as text
+INTEGER_TYPES = {"smallint", "integer", "bigint", "tinyint", "mediumint", "int", "year"}
+FLOAT_TYPES = {"real", "double precision", "float", "double"}
+DECIMAL_TYPES = {"numeric", "decimal"}
+BINARY_TYPES = {"bytea", "binary", "varbinary", "tinyblob", "blob", "mediumblob", "longblob"}
+
+COLUMNS_QUERY = """
+    SELECT column_name, data_type, numeric_precision, numeric_scale
+    FROM information_schema.columns
+    WHERE table_schema = %s AND table_name = %s
+    ORDER BY ordinal_position
+"""
+
+
+def ensure_pyarrow(fmt: str) -> None:
+    install_dependencies(DEPENDENCY_GROUPS["format"][fmt], load_requirements())
+
+def arrow_type(data_type: str, precision: int = None, scale: int = None):
+    """Arrow type for a column, from its catalog type."""
+    import pyarrow as pa
+    data_type = data_type.lower()
+    if data_type in INTEGER_TYPES:
+        return pa.int64()
+    if data_type in FLOAT_TYPES:
+        return pa.float64()
+    if data_type in DECIMAL_TYPES and precision:
+        # Unconstrained numerics have no fixed scale, so they stay exact as text
+        return pa.decimal128(precision, scale or 0) if precision <= 38 else pa.decimal256(precision, scale or 0)
+    if data_type == "boolean":
+        return pa.bool_()
+    if data_type == "date":
+        return pa.date32()
+    if data_type == "timestamp with time zone":
+        return pa.timestamp("us", tz="UTC")
+    if data_type in ("timestamp without time zone", "timestamp", "datetime"):
+        return pa.timestamp("us")
+    if data_type in BINARY_TYPES:
+        return pa.binary()
+    return pa.string()
+
+def table_columns(cursor, schema: str, table: str) -> List[Tuple[str, str, object]]:
+    """(name, catalog type, Arrow type) of a table's columns, in SELECT * order. Works on PostgreSQL and MySQL."""
+    cursor.execute(COLUMNS_QUERY, (schema, table))
+    return [(name, data_type, arrow_type(data_type, precision, scale)) for name, data_type, precision, scale in cursor.fetchall()]
+
+def is_text(arrow_type) -> bool:
+    import pyarrow as pa
+    return pa.types.is_string(arrow_type)
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8")  # strict: replacing undecodable bytes would corrupt the backup
+    return str(value)
+
+
+class ColumnarWriter:
+    """Streams cursor rows into a Parquet or Arrow IPC file (zstd), a row group at a time."""
+
+    def __init__(self, path: Path, fmt: str, columns: List[Tuple[str, object]], metadata: Dict[str, str] = None):
+        import pyarrow as pa
+        self.schema = pa.schema([pa.field(name, type) for name, type in columns], metadata=metadata)
+        self.table = (metadata or {}).get("table", path.stem)
+        self.rows: List[tuple] = []
+        self.nbytes = 0  # Arrow bytes handed to the writer so far
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema, compression=CODEC)
+        else:
+            self.writer = pa.ipc.new_file(str(path), self.schema, options=pa.ipc.IpcWriteOptions(compression=CODEC))
+
+    def write_rows(self, rows: List[tuple]) -> None:
+        self.rows.extend(rows)
+        if len(self.rows) >= ROW_GROUP_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        import pyarrow as pa
+        if not self.rows:
+            return
+        arrays = []
+        for index, field in enumerate(self.schema):
+            values = [row[index] for row in self.rows]
+            try:
+                if is_text(field.type):
+                    values = [_text(v) for v in values]
+                elif pa.types.is_binary(field.type):
+                    values = [bytes(v) if isinstance(v, (bytearray, memoryview)) else v for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            except ValueError as e:  # non-UTF-8 text, NaN/infinite decimals (ArrowInvalid is a ValueError)
+                raise ValueError(f"Can't store {self.table}.{field.name} as {field.type}: {e}; use data_format 'sql' for this target") from None
+        batch = pa.record_batch(arrays, schema=self.schema)
+        self.writer.write_batch(batch)
+        self.nbytes += batch.nbytes
+        self.rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.writer.close()  # don't flush the rows that just failed again
+
+
+def read_columnar(path: Path, batch_rows: int = ROW_GROUP_ROWS) -> Tuple[str, List[str], Iterator[List[tuple]]]:
+    """(table, column names, batches of row tuples) of a data file written by ColumnarWriter."""
+    import pyarrow as pa
+    if path.suffix == COLUMNAR_FORMATS["parquet"]:
+        import pyarrow.parquet as pq
+        source = pq.ParquetFile(path)
+        schema = source.schema_arrow
+        batches = source.iter_batches(batch_size=batch_rows)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        schema = reader.schema
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+    def rows():
+        for batch in batches:
+            yield list(zip(*(column.to_pylist() for column in batch.columns)))
+
+    return schema.metadata[b"table"].decode(), schema.names, rows()
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Callable, Dict
+from configs.init import logger
+
+
+def _connect_postgresql(db_config: Dict, dbname: str):
+    import psycopg
+    return psycopg.connect(
+        dbname=dbname,
+        user=db_config.get("user", ""),
+        password=db_config.get("password", ""),
+        host=db_config["host"],
+        port=db_config["port"],
+        autocommit=True
+    )
+
+def _check_postgresql(conn) -> bool:
+    if conn.closed:
+        return False
+    conn.execute("SELECT 1")
+    return True
+
+def _connect_mysql(db_config: Dict, dbname: str):
+    import mysql.connector
+    params = {
+        "host": db_config["host"],
+        "port": db_config["port"],
+        "user": db_config["user"],
+        "password": db_config["password"],
+    }
+    if dbname:
+        params["database"] = dbname
+    return mysql.connector.connect(**params)
+
+def _check_mysql(conn) -> bool:
+    conn.ping(reconnect=False)
+    return True
+
+def _reset_mysql(conn) -> None:
+    # Restores leave autocommit off and FOREIGN_KEY_CHECKS changed; don't leak that into the next run
+    conn.rollback()
+    conn.reset_session()
+    conn.autocommit = False
+
+def _connect_mongodb(db_config: Dict, dbname: str):
+    import pymongo
+    conn_params = {
+        'host': db_config["host"],
+        'port': db_config["port"],
+    }
+    if db_config.get("user") and db_config.get("password"):
+        conn_params.update({
+            'username': db_config["user"],
+            'password': db_config["password"],
+            'authSource': db_config.get("authSource", "admin")
+        })
+    return pymongo.MongoClient(**conn_params)
+
+# kind -> (connect, health check, reset before reuse, shared between concurrent users)
+DRIVERS = {
+    "postgresql": (_connect_postgresql, _check_postgresql, None, False),
+    "mysql": (_connect_mysql, _check_mysql, _reset_mysql, False),
+    # MongoClient is itself a thread-safe pool; one per target is shared by every run
+    "mongodb": (_connect_mongodb, lambda client: True, None, True),
+}
+
+
+class ConnectionPool:
+    def __init__(self, connect: Callable, check: Callable, reset: Callable = None,
+                 shared: bool = False, max_idle: int = 4):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.shared = shared
+        self.max_idle = max_idle
+        self.idle = []  # (last used, connection), most recent last
+        self.leased = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                _, conn = self.idle[-1] if self.shared else self.idle.pop()
+                self.leased += 1
+            try:
+                if self.check(conn):
+                    return conn
+            except Exception as e:
+                logger.info(f"Discarding unhealthy pooled connection: {e}")
+            with self.lock:
+                self.leased -= 1
+                if self.shared and self.idle and self.idle[-1][1] is conn:
+                    self.idle.pop()
+            _close(conn)
+        conn = self.connect()
+        with self.lock:
+            self.leased += 1
+            if self.shared:
+                self.idle.append((time.monotonic(), conn))
+        return conn
+
+    def release(self, conn) -> None:
+        if self.shared:
+            with self.lock:
+                self.leased -= 1
+                self.idle = [(time.monotonic(), c) for _, c in self.idle]
+                if not (self.closed and self.leased == 0):
+                    return
+            _close(conn)
+            return
+        try:
+            if self.reset:
+                self.reset(conn)
+        except Exception as e:
+            logger.info(f"Discarding pooled connection that failed to reset: {e}")
+            with self.lock:
+                self.leased -= 1
+            _close(conn)
+            return
+        with self.lock:
+            self.leased -= 1
+            if not self.closed and len(self.idle) < self.max_idle:
+                self.idle.append((time.monotonic(), conn))
+                return
+        _close(conn)
+
+    def evict_idle(self, idle_timeout: float) -> int:
+        cutoff = time.monotonic() - idle_timeout
+        with self.lock:
+            if self.shared and self.leased:
+                return 0
+            expired = [c for used, c in self.idle if used < cutoff]
+            self.idle = [(used, c) for used, c in self.idle if used >= cutoff]
+        for conn in expired:
+            _close(conn)
+        return len(expired)
+
+    def close_all(self) -> None:
+        with self.lock:
+            self.closed = True
+            conns = [] if self.shared and self.leased else [c for _, c in self.idle]
+            self.idle = []
+        for conn in conns:
+            _close(conn)
+
+
+def _close(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionManager:
+    """Per-target connection reuse for long-running processes (scheduler, daemon).
+
+    Disabled by default so one-shot CLI runs open and close connections exactly as before.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.idle_timeout = 300
+        self.max_idle = 4
+        self.pools = {}
+        self.leases = {}
+        self.lock = threading.Lock()
+        self.reaper = None
+
+    def enable(self, idle_timeout: int = 300, max_idle: int = 4) -> None:
+        with self.lock:
+            self.enabled = True
+            self.idle_timeout = idle_timeout
+            self.max_idle = max_idle
+            if not self.reaper:
+                self.reaper = threading.Thread(target=self._reap, name="connection-reaper", daemon=True)
+                self.reaper.start()
+        logger.info(f"Connection pooling enabled (idle timeout {idle_timeout}s)")
+
+    def _reap(self) -> None:
+        while True:
+            time.sleep(max(1, self.idle_timeout / 2))
+            with self.lock:
+                pools = list(self.pools.items())
+            for key, pool in pools:
+                evicted = pool.evict_idle(self.idle_timeout)
+                if evicted:
+                    logger.info(f"Evicted {evicted} idle connection(s) for {key[1]}")
+
+    def _key(self, kind: str, target: Dict, dbname: str) -> tuple:
+        # Include connection settings so an edited target never reuses stale credentials
+        settings = hashlib.sha256(json.dumps(target["database"], sort_keys=True).encode()).hexdigest()
+        return kind, target["id"], dbname, settings
+
+    def acquire(self, kind: str, target: Dict, dbname: str = None):
+        """Return a connection for target; dbname defaults to the target's database ("" for a server-level MySQL connection)."""
+        connect, check, reset, shared = DRIVERS[kind]
+        db_config = target["database"]
+        dbname = db_config["name"] if dbname is None else dbname
+        if not self.enabled:
+            return connect(db_config, dbname)
+        key = self._key(kind, target, dbname)
+        with self.lock:
+            pool = self.pools.get(key)
+            if not pool:
+                pool = self.pools[key] = ConnectionPool(
+                    lambda: connect(db_config, dbname), check, reset, shared, self.max_idle
+                )
+        conn = pool.acquire()
+        with self.lock:
+            lease = self.leases.setdefault(id(conn), [pool, 0])
+            lease[1] += 1
+        return conn
+
+    def release(self, conn) -> None:
+        if conn is None:
+            return
+        pool = None
+        with self.lock:
+            lease = self.leases.get(id(conn))
+            if lease:
+                pool = lease[0]
+                lease[1] -= 1
+                if not lease[1]:
+                    del self.leases[id(conn)]
+        if pool:
+            pool.release(conn)
+        else:
+            _close(conn)
+
+    def evict(self, kind: str, target: Dict, dbname: str = None) -> None:
+        """Close idle pooled connections for a target (e.g. before its database is dropped)."""
+        dbname = target["database"]["name"] if dbname is None else dbname
+        with self.lock:
+            pool = self.pools.pop(self._key(kind, target, dbname), None)
+        if pool:
+            pool.close_all()
+
+
+connections = ConnectionManager()
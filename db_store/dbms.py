@@ -1,9 +1,49 @@
+import shutil
+import threading
+import time
 from abc import ABC, abstractmethod
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from fnmatch import fnmatchcase
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple
 from dep_manage.init import install_dependencies
 
+PARTITION_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+
+
+def partition_ranges(low, high, interval) -> List[Tuple[str, object, object]]:
+    """(label, start, end) half-open ranges covering low..high: calendar days, months or years, or
+    steps of an integer interval for numeric columns."""
+    if low is None:
+        return []
+    if not isinstance(low, (date, int, float, Decimal)):
+        raise ValueError(f"Can't partition {type(low).__name__} values; use a date/time or numeric column")
+    ranges = []
+    if isinstance(interval, int):
+        start = low - low % interval
+        while start <= high:
+            ranges.append((f"{start}-{start + interval - 1}", start, start + interval))
+            start += interval
+        return ranges
+    if not isinstance(low, datetime):
+        low, high = (datetime(d.year, d.month, d.day) if isinstance(d, date) else d for d in (low, high))
+    start = low.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval != "day":
+        start = start.replace(day=1, month=1 if interval == "year" else start.month)
+    while start <= high:
+        if interval == "day":
+            end = start + timedelta(days=1)
+        elif interval == "month":
+            end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            end = start.replace(year=start.year + 1)
+        ranges.append((start.strftime(PARTITION_FORMATS[interval]), start, end))
+        start = end
+    return ranges
+
+
 class Handler(ABC):
     required_deps: list = []
 
@@ -12,16 +52,173 @@ class Handler(ABC):
         install_dependencies(cls.required_deps, requirements)
 
 class DBMSHandler(Handler):
+    parallel_dump = False  # whether backup() honours plan["workers"]
+    fetch_size = 1000  # rows per round trip unless the plan picks another
+    writes_data_files = False  # whether backup() can add data_files (restore then loads them with restore_data_file)
+
+    def __init__(self):
+        # Data written by backup() next to the dump (partition ranges, columnar table data); perform_backup
+        # archives each file on its own and perform_restore loads them after the dump
+        self.data_files: List[Path] = []
+
     @abstractmethod
-    def backup(self, target: Dict) -> Path:
+    def backup(self, target: Dict, plan: Dict = None) -> Path:
         pass
 
     @abstractmethod
     def restore(self, target: Dict, backup_file: Path) -> None:
         pass
 
+    @abstractmethod
+    def estimate(self, target: Dict) -> Dict:
+        """Cheap size statistics: {"bytes": on-disk size, "rows": row/document count or None, "tables": {name: bytes}}."""
+        pass
+
     def get_backup_filename(self, target: Dict, ext: str) -> Path:
         backup_dir = Path(target["backup"]["local_path"])
         backup_dir.mkdir(parents=True, exist_ok=True)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return backup_dir / f"{target['database']['type']}_{target['id']}_{target['database']['name']}_{timestamp}.{ext}"
\ No newline at end of file
+        return backup_dir / f"{target['database']['type']}_{target['id']}_{target['database']['name']}_{timestamp}.{ext}"
+
+    def select_tables(self, target: Dict, tables: List[str], schema: str) -> List[str]:
+        """Tables or collections kept by backup.filters include/exclude; patterns match "name" or "schema.name"."""
+        filters = target["backup"].get("filters", {})
+        include, exclude = filters.get("include"), filters.get("exclude", [])
+        return [table for table in tables if (not include or _matches(include, table, schema)) and not _matches(exclude, table, schema)]
+
+    def data_excluded(self, target: Dict, table: str, schema: str) -> bool:
+        """Whether backup.filters.exclude_data keeps the table's schema but none of its rows."""
+        return _matches(target["backup"].get("filters", {}).get("exclude_data", []), table, schema)
+
+    def data_filtered(self, target: Dict, table: str, schema: str) -> bool:
+        """Whether the filters leave out some of the table's rows: exclude_data, a where filter, or partitioning
+        (its ranges are separate archives)."""
+        return self.data_excluded(target, table, schema) or bool(self.row_filter(target, table) or self.partitioning(target, table))
+
+    def row_filter(self, target: Dict, table: str):
+        """backup.filters.where[table]: a SQL condition, or a MongoDB query."""
+        return target["backup"].get("filters", {}).get("where", {}).get(table)
+
+    def partitioning(self, target: Dict, table: str) -> Optional[Dict]:
+        """backup.filters.partition[table]: {"column": ..., "interval": "day"/"month"/"year" or a number}."""
+        return target["backup"].get("filters", {}).get("partition", {}).get(table)
+
+    def data_format(self, target: Dict) -> str:
+        """backup.data_format: "sql" (INSERTs in the dump), or "parquet"/"arrow" files per table next to a schema-only dump."""
+        return target["backup"].get("data_format", "sql")
+
+    def table_file(self, backup_file: Path, table: str, suffix: str = None) -> Path:
+        return backup_file.with_name(f"{backup_file.stem}.{table}{suffix or backup_file.suffix}")
+
+    def partition_file(self, backup_file: Path, table: str, label: str, suffix: str = None) -> Path:
+        return backup_file.with_name(f"{backup_file.stem}.{table}.{label}{suffix or backup_file.suffix}")
+
+    def keep_data_file(self, path: Path, rows: int) -> None:
+        if rows:
+            self.data_files.append(path)
+        else:
+            path.unlink()
+
+    def filtered_estimate(self, target: Dict, stats: Dict[str, Tuple[int, int]], schema: str) -> Dict:
+        """estimate() result from {table: (bytes, rows)}, counting only tables whose data the filters keep."""
+        kept = [table for table in self.select_tables(target, list(stats), schema) if not self.data_excluded(target, table, schema)]
+        return {"bytes": sum(stats[t][0] for t in kept), "rows": sum(stats[t][1] for t in kept), "tables": {t: stats[t][0] for t in kept}}
+
+    def restore_data_file(self, target: Dict, data_file: Path) -> None:
+        raise ValueError(f"{type(self).__name__} doesn't write separate data files")
+
+    def finish_restore(self, target: Dict, backup_file: Path) -> None:
+        """Run after restore() and every restore_data_file(): schema that is cheaper to build once the data is in."""
+
+    def dump_tables_parallel(self, tables: List[str], backup_file: Path, f, workers: int,
+                             connect: Callable, release: Callable, dump_table: Callable) -> None:
+        """Run dump_table(conn, table, part_file) -> rows on worker threads, one connection each,
+        and append the part files to f in table order so the dump matches a sequential one."""
+        from operations import metrics, throttle
+        stream = throttle.current()
+        run = metrics.current()
+        local = threading.local()
+        opened = []
+
+        def work(index: int, table: str):
+            if not hasattr(local, "conn"):
+                local.conn = connect()
+                opened.append(local.conn)
+            part = backup_file.with_name(f"{backup_file.name}.part{index}")
+            phase = metrics.Phase("data", {"table": table})
+            with throttle.attached(stream), metrics.profiled(run), part.open("w", encoding=f.encoding) as pf:
+                rows = dump_table(local.conn, table, pf)
+                phase.add(bytes=pf.tell(), rows=rows)
+            phase.duration = time.perf_counter() - phase.started
+            return part, phase
+
+        parts = [backup_file.with_name(f"{backup_file.name}.part{i}") for i in range(len(tables))]
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dump") as executor:
+                futures = [executor.submit(work, i, table) for i, table in enumerate(tables)]
+                for future in futures:
+                    try:
+                        part, phase = future.result()
+                    except Exception:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+                    with part.open("r", encoding=f.encoding) as pf:
+                        shutil.copyfileobj(pf, f)
+                    part.unlink()
+                    metrics.completed(phase)
+        finally:
+            for conn in opened:
+                release(conn)
+            for part in parts:
+                part.unlink(missing_ok=True)
+
+    def dump_data_files(self, tables: List[str], workers: int, connect: Callable, release: Callable,
+                        path_for: Callable, dump_file: Callable) -> None:
+        """Run dump_file(conn, table, path_for(table)) -> rows for each table, on up to workers threads with
+        one connection each, keeping the files that got rows. If any table fails, none of the files are kept."""
+        from operations import metrics, throttle
+        stream = throttle.current()
+        run = metrics.current()
+        local = threading.local()
+        opened = []
+        lock = threading.Lock()
+        paths = {table: path_for(table) for table in tables}
+
+        def work(table: str):
+            if not hasattr(local, "conn"):
+                local.conn = connect()
+                with lock:
+                    opened.append(local.conn)
+            phase = metrics.Phase("data", {"table": table})
+            with throttle.attached(stream), metrics.profiled(run):
+                rows = dump_file(local.conn, table, paths[table])
+            phase.add(bytes=paths[table].stat().st_size, rows=rows)
+            phase.duration = time.perf_counter() - phase.started
+            return rows, phase
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="dump") as executor:
+                futures = {table: executor.submit(work, table) for table in tables}
+                for table, future in futures.items():
+                    try:
+                        rows, phase = future.result()
+                    except Exception:
+                        for pending in futures.values():
+                            pending.cancel()
+                        raise
+                    self.keep_data_file(paths[table], rows)
+                    metrics.completed(phase)
+        except Exception:
+            # The executor has waited for running workers, so every file here is finished with
+            written = set(paths.values())
+            self.data_files = [path for path in self.data_files if path not in written]
+            for path in written:
+                path.unlink(missing_ok=True)
+            raise
+        finally:
+            for conn in opened:
+                release(conn)
+
+def _matches(patterns: List[str], table: str, schema: str) -> bool:
+    return any(fnmatchcase(table, pattern) or fnmatchcase(f"{schema}.{table}", pattern) for pattern in patterns)
@@ -1,21 +1,34 @@
-from db_store.postgresql import PostgreSQLHandler
-from db_store.mysql import MySQLHandler
-from db_store.mongodb import MongoDBHandler
-from db_store.sqlite import SQLiteHandler
-from db_store.storage_handler import StorageHandler, LocalStorageHandler, S3StorageHandler
+import importlib
 from db_store.dbms import DBMSHandler
+from db_store.storage_handler import StorageHandler
 
+# Handler modules (and their drivers) are only imported when a target of that type is used
+DBMS_HANDLERS = {
+    "postgresql": ("db_store.postgresql", "PostgreSQLHandler"),
+    "mysql": ("db_store.mysql", "MySQLHandler"),
+    "mongodb": ("db_store.mongodb", "MongoDBHandler"),
+    "sqlite": ("db_store.sqlite", "SQLiteHandler"),
+    "sqlite_fleet": ("db_store.sqlite_fleet", "SQLiteFleetHandler"),
+}
+STORAGE_HANDLERS = {
+    "none": ("db_store.storage_handler", "LocalStorageHandler"),
+    "local": ("db_store.storage_handler", "LocalStorageHandler"),
+    "s3": ("db_store.storage_handler", "S3StorageHandler"),
+}
+
+
+def _load(path: tuple):
+    module, name = path
+    return getattr(importlib.import_module(module), name)
 
 def get_dbms_handler(db_type: str) -> DBMSHandler:
-    handlers = {"postgresql": PostgreSQLHandler, "mysql": MySQLHandler, "mongodb": MongoDBHandler, "sqlite": SQLiteHandler}
-    handler = handlers.get(db_type.lower())
+    handler = DBMS_HANDLERS.get(db_type.lower())
     if not handler:
         raise ValueError(f"Unsupported DBMS: {db_type}")
-    return handler()
+    return _load(handler)()
 
 def get_storage_handler(storage_type: str) -> StorageHandler:
-    handlers = {"none": LocalStorageHandler, "local": LocalStorageHandler, "s3": S3StorageHandler}
-    handler = handlers.get(storage_type.lower())
+    handler = STORAGE_HANDLERS.get(storage_type.lower())
     if not handler:
         raise ValueError(f"Unsupported storage type: {storage_type}")
-    return handler()
+    return _load(handler)()
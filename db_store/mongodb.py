@@ -5,11 +5,14 @@ from typing import Dict
 from dep_manage.init import load_requirements
 from configs.init import logger
 from dep_manage.init import DEPENDENCY_GROUPS
-from db_store.dbms import DBMSHandler
+from db_store.connections import connections
+from operations import metrics, throttle
+from db_store.dbms import DBMSHandler, partition_ranges
 
 
 class MongoDBHandler(DBMSHandler):
     required_deps = DEPENDENCY_GROUPS["database"]["mongodb"]
+    writes_data_files = True
 
     def _validate_config(self, db_config: Dict) -> None:
         """Validate database configuration."""
@@ -22,30 +25,80 @@ class MongoDBHandler(DBMSHandler):
         if not isinstance(db_config["port"], int):
             raise ValueError("Port must be an integer")
 
-    def backup(self, target: Dict) -> Path:
+    def estimate(self, target: Dict) -> Dict:
+        self.ensure_deps(load_requirements())
+        client = connections.acquire("mongodb", target)
+        try:
+            db = client[target["database"]["name"]]
+            stats = {name: db.command("collStats", name) for name in db.list_collection_names()}
+        finally:
+            connections.release(client)
+        return self.filtered_estimate(target, {name: (s.get("size", 0), s.get("count", 0)) for name, s in stats.items()}, target["database"]["name"])
+
+    def _query(self, target: Dict, col_name: str, extra: Dict = None) -> Dict:
+        """The collection's configured query (extended JSON, so dates work) AND extra."""
+        from bson.json_util import loads
+        query = self.row_filter(target, col_name) or {}
+        if query:
+            query = loads(query if isinstance(query, str) else json.dumps(query))
+        if extra:
+            query = {"$and": [query, extra]} if query else extra
+        return query
+
+    def _data_query(self, target: Dict, col_name: str) -> Dict:
+        """Documents that go in the main archive: for partitioned collections, those without a partition value."""
+        spec = self.partitioning(target, col_name)
+        if not spec:
+            return self._query(target, col_name)
+        value_type = "number" if isinstance(spec["interval"], int) else "date"
+        return self._query(target, col_name, {spec["column"]: {"$not": {"$type": value_type}}})
+
+    def _read_collection(self, collection, query: Dict, batch_size: int, p) -> list:
+        from bson.json_util import dumps
+        docs = []
+        batch_bytes = 0
+        for doc in collection.find(query, batch_size=batch_size):
+            text = dumps(doc)
+            docs.append(json.loads(text))
+            batch_bytes += len(text)
+            if len(docs) % batch_size == 0:
+                throttle.read(batch_bytes, batch_size)
+                p.add(bytes=batch_bytes)
+                batch_bytes = 0
+        throttle.read(batch_bytes, len(docs) % batch_size)
+        p.add(bytes=batch_bytes, docs=len(docs))
+        return docs
+
+    def _dump_partitions(self, db, target: Dict, col_name: str, backup_file: Path, batch_size: int, metadata: Dict) -> None:
+        """Write each range of a partitioned collection's field to its own archive, stored separately."""
+        spec = self.partitioning(target, col_name)
+        field = spec["column"]
+        value_type = "number" if isinstance(spec["interval"], int) else "date"
+        query = self._query(target, col_name, {field: {"$type": value_type}})
+        bounds = [next(db[col_name].find(query, {field: 1}).sort(field, order).limit(1), {}).get(field) for order in (1, -1)]
+        for label, start, end in partition_ranges(*bounds, spec["interval"]):
+            path = self.partition_file(backup_file, col_name, label)
+            with metrics.phase("data", collection=col_name, partition=label) as p:
+                docs = self._read_collection(db[col_name], self._query(target, col_name, {field: {"$gte": start, "$lt": end}}), batch_size, p)
+            if docs:
+                with path.open("wb") as f:
+                    f.write(json.dumps({"metadata": dict(metadata, partition=label), "collections": {col_name: docs}}, ensure_ascii=False).encode("utf-8"))
+                self.data_files.append(path)
+
+    def backup(self, target: Dict, plan: Dict = None) -> Path:
         """Create a 1:1 MongoDB backup with metadata."""
         self.ensure_deps(load_requirements())
         import pymongo
-        from bson.json_util import dumps
         from pymongo.errors import PyMongoError
         db_config = target.get("database", {})
         self._validate_config(db_config)
 
         backup_file = self.get_backup_filename(target, "archive")
+        batch_size = (plan or {}).get("fetch_size", self.fetch_size)
 
         try:
-            conn_params = {
-                'host': db_config["host"],
-                'port': db_config["port"],
-            }
-            if db_config.get("user") and db_config.get("password"):
-                conn_params.update({
-                    'username': db_config["user"],
-                    'password': db_config["password"],
-                    'authSource': db_config.get("authSource", "admin")
-                })
-
-            client = pymongo.MongoClient(**conn_params)
+            with metrics.phase("connect"):
+                client = connections.acquire("mongodb", target)
             try:
                 db = client[db_config["name"]]
                 backup_data = {
@@ -58,20 +111,29 @@ class MongoDBHandler(DBMSHandler):
                     'collections': {}
                 }
 
-                for col_name in db.list_collection_names():
-                    collection = db[col_name]
-                    backup_data['collections'][col_name] = [
-                        json.loads(dumps(doc)) for doc in collection.find({})
-                    ]
-
-                with backup_file.open('wb') as f:
+                all_collections = db.list_collection_names()
+                collections = self.select_tables(target, all_collections, db_config["name"])
+                if len(collections) < len(all_collections):
+                    logger.info(f"Filters keep {len(collections)} of {len(all_collections)} collections")
+                for col_name in collections:
+                    if self.data_excluded(target, col_name, db_config["name"]):
+                        backup_data['collections'][col_name] = []
+                        continue
+                    with metrics.phase("data", collection=col_name) as p:
+                        docs = self._read_collection(db[col_name], self._data_query(target, col_name), batch_size, p)
+                    backup_data['collections'][col_name] = docs
+                    if self.partitioning(target, col_name):
+                        self._dump_partitions(db, target, col_name, backup_file, batch_size, backup_data['metadata'])
+
+                with metrics.phase("write") as p, backup_file.open('wb') as f:
                     f.write(json.dumps(backup_data, ensure_ascii=False).encode('utf-8'))
+                    p.add(bytes=f.tell())
 
                 logger.info(f"MongoDB backup created: {backup_file}")
                 return backup_file
 
             finally:
-                client.close()
+                connections.release(client)
 
         except PyMongoError as e:
             logger.error(f"MongoDB backup failed: {e}")
@@ -83,7 +145,6 @@ class MongoDBHandler(DBMSHandler):
     def restore(self, target: Dict, backup_file: Path) -> None:
         """Restore MongoDB database, skipping collections that match backup data."""
         self.ensure_deps(load_requirements())
-        import pymongo
         from pymongo.errors import PyMongoError
         from bson.json_util import loads, dumps
         db_config = target.get("database", {})
@@ -93,18 +154,8 @@ class MongoDBHandler(DBMSHandler):
             raise FileNotFoundError(f"Backup file not found: {backup_file}")
 
         try:
-            conn_params = {
-                'host': db_config["host"],
-                'port': db_config["port"],
-            }
-            if db_config.get("user") and db_config.get("password"):
-                conn_params.update({
-                    'username': db_config["user"],
-                    'password': db_config["password"],
-                    'authSource': db_config.get("authSource", "admin")
-                })
-
-            client = pymongo.MongoClient(**conn_params)
+            with metrics.phase("connect"):
+                client = connections.acquire("mongodb", target)
             try:
                 db = client[db_config["name"]]
 
@@ -135,10 +186,13 @@ class MongoDBHandler(DBMSHandler):
                             logger.info(f"Clearing and restoring collection {col_name}")
                             collection.delete_many({})
 
+                    if not backup_docs and col_name not in existing_collections:
+                        db.create_collection(col_name)  # kept without its documents by exclude_data
                     if backup_docs:
                         try:
                             # Restore documents using bson.json_util.loads to handle BSON types
                             collection.insert_many(loads(json.dumps(backup_docs)))
+                            metrics.add(docs=len(backup_docs))
                         except PyMongoError as e:
                             logger.error(f"Failed to restore collection {col_name}: {e}")
                             raise
@@ -146,7 +200,7 @@ class MongoDBHandler(DBMSHandler):
                 logger.info(f"MongoDB database restored: {db_config['name']}")
 
             finally:
-                client.close()
+                connections.release(client)
 
         except PyMongoError as e:
             logger.error(f"MongoDB restore failed: {e}")
@@ -154,3 +208,20 @@ class MongoDBHandler(DBMSHandler):
         except (IOError, json.JSONDecodeError) as e:
             logger.error(f"Restore file operation failed: {e}")
             raise
+
+    def restore_data_file(self, target: Dict, data_file: Path) -> None:
+        """Add one partition's documents to the collections restore() just loaded."""
+        self.ensure_deps(load_requirements())
+        from bson.json_util import loads
+        client = connections.acquire("mongodb", target)
+        try:
+            db = client[target["database"]["name"]]
+            with data_file.open("rb") as f:
+                backup_data = json.loads(f.read().decode("utf-8"))
+            for col_name, docs in backup_data["collections"].items():
+                if docs:
+                    db[col_name].insert_many(loads(json.dumps(docs)))
+                    metrics.add(docs=len(docs))
+        finally:
+            connections.release(client)
+        logger.info(f"MongoDB partition restored: {data_file.name}")
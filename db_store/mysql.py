@@ -1,30 +1,134 @@
 #import logging
+from contextlib import closing
 from pathlib import Path
 from typing import Dict
 from dep_manage.init import load_requirements
 from configs.init import logger
+from operations import metrics, throttle
 from dep_manage.init import DEPENDENCY_GROUPS
-from db_store.dbms import DBMSHandler
+from db_store.columnar import COLUMNAR_FORMATS, ColumnarWriter, ensure_pyarrow, is_text, read_columnar, table_columns
+from db_store.connections import connections
+from db_store.dbms import DBMSHandler, partition_ranges
 
 
 class MySQLHandler(DBMSHandler):
     required_deps = DEPENDENCY_GROUPS["database"]["mysql"]
+    writes_data_files = True
+    parallel_dump = True
 
-    def backup(self, target: Dict) -> Path:
+    def estimate(self, target: Dict) -> Dict:
+        self.ensure_deps(load_requirements())
+        connection = connections.acquire("mysql", target)
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT TABLE_NAME, DATA_LENGTH, TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'",
+                (target["database"]["name"],)
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            connections.release(connection)
+        return self.filtered_estimate(target, {r[0]: (r[1] or 0, r[2] or 0) for r in rows}, target["database"]["name"])
+
+    def _dump_schema(self, cursor, table_name: str, f) -> None:
+        cursor.execute(f"SHOW CREATE TABLE `{table_name}`")
+        create_table = cursor.fetchone()[1]
+        f.write(f"{create_table};\n\n")
+
+    def _where(self, target: Dict, table_name: str, extra: str = None, params: bool = False) -> str:
+        """The table's configured row filter AND extra, or "" for every row. With params, the filter's
+        % signs are escaped so the query can be run with %s parameters (which extra may use)."""
+        row_filter = self.row_filter(target, table_name)
+        if row_filter and params:
+            row_filter = row_filter.replace("%", "%%")
+        conditions = [f"({row_filter})"] if row_filter else []
+        if extra:
+            conditions.append(extra)
+        return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    def _data_where(self, target: Dict, table_name: str) -> str:
+        """Rows that go in the main dump: partitioned tables only keep rows without a partition value there."""
+        spec = self.partitioning(target, table_name)
+        return self._where(target, table_name, f"{_quote(spec['column'])} IS NULL" if spec else None)
+
+    def _dump_table(self, cursor, table_name: str, f, fetch_size: int, where: str = "", params: tuple = ()) -> int:
+        """Write INSERTs for one table (the rows matching where) to f; returns the row count."""
+        count = 0
+        # The unbuffered cursor streams the result set, so read limits pace the server
+        cursor.execute(f"SELECT * FROM `{table_name}`{where}", params or None)
+        columns = [desc[0] for desc in cursor.description]
+        while rows := cursor.fetchmany(fetch_size):
+            mark = f.tell()
+            for row in rows:
+                values = ', '.join([f"'{str(v).replace('\'', '\\\'')}'" if v is not None else 'NULL' for v in row])
+                f.write(f"INSERT INTO `{table_name}` (`{'`, `'.join(columns)}`) VALUES ({values});\n")
+            count += len(rows)
+            throttle.read(f.tell() - mark, len(rows))
+        if count:
+            f.write("\n")
+        return count
+
+    def _dump_table_columnar(self, cursor, target: Dict, table_name: str, path: Path, fetch_size: int, where: str = "", params: tuple = ()) -> int:
+        """Stream one table's rows (those matching where) into a Parquet/Arrow file; returns the row count."""
+        columns = table_columns(cursor, target["database"]["name"], table_name)
+        # Columns stored as text are cast by the server, so TIME, JSON, BIT etc. keep a form INSERT reads back
+        select = ", ".join(f"CAST(`{name}` AS CHAR)" if is_text(arrow_type) else f"`{name}`" for name, _, arrow_type in columns)
+        count = 0
+        with ColumnarWriter(path, self.data_format(target), [(name, arrow_type) for name, _, arrow_type in columns], {"table": table_name}) as writer:
+            cursor.execute(f"SELECT {select} FROM `{table_name}`{where}", params or None)
+            while rows := cursor.fetchmany(fetch_size):
+                mark = writer.nbytes
+                writer.write_rows(rows)
+                count += len(rows)
+                throttle.read(writer.nbytes - mark, len(rows))
+        return count
+
+    def _dump_file(self, cursor, target: Dict, table_name: str, path: Path, fetch_size: int, where: str = "", params: tuple = ()) -> int:
+        """Write the rows matching where to their own file: INSERTs, or columnar data by its suffix."""
+        if path.suffix != ".sql":
+            return self._dump_table_columnar(cursor, target, table_name, path, fetch_size, where, params)
+        with path.open("w") as f:
+            return self._dump_table(cursor, table_name, f, fetch_size, where, params)
+
+    def _data_file(self, target: Dict, table_name: str, backup_file: Path) -> Path:
+        """Where a table's data goes in columnar backups."""
+        return self.table_file(backup_file, table_name, COLUMNAR_FORMATS[self.data_format(target)])
+
+    def _dump_data_file(self, connection, target: Dict, table_name: str, path: Path, fetch_size: int) -> int:
+        """Write a table's data file for columnar backups; returns the row count."""
+        with closing(connection.cursor()) as cursor:
+            return self._dump_table_columnar(cursor, target, table_name, path, fetch_size, self._data_where(target, table_name))
+
+    def _dump_partitions(self, cursor, target: Dict, table_name: str, backup_file: Path, fetch_size: int) -> None:
+        """Dump each range of a partitioned table's column into its own file, archived separately."""
+        spec = self.partitioning(target, table_name)
+        column = _quote(spec["column"])
+        cursor.execute(f"SELECT MIN({column}), MAX({column}) FROM `{table_name}`{self._where(target, table_name, f'{column} IS NOT NULL')}")
+        low, high = cursor.fetchone()
+        cursor.fetchall()
+        for label, start, end in partition_ranges(low, high, spec["interval"]):
+            path = self.partition_file(backup_file, table_name, label, COLUMNAR_FORMATS.get(self.data_format(target)))
+            where = self._where(target, table_name, f"{column} >= %s AND {column} < %s", params=True)
+            with metrics.phase("data", table=table_name, partition=label) as p:
+                rows = self._dump_file(cursor, target, table_name, path, fetch_size, where, (start, end))
+                p.add(bytes=path.stat().st_size, rows=rows)
+            self.keep_data_file(path, rows)
+
+    def backup(self, target: Dict, plan: Dict = None) -> Path:
         self.ensure_deps(load_requirements())
-        import mysql.connector
         from mysql.connector import Error
-        db_config = target["database"]
         backup_file = self.get_backup_filename(target, "sql")
+        fetch_size = (plan or {}).get("fetch_size", self.fetch_size)
+        data_format = self.data_format(target)
+        if data_format != "sql":
+            ensure_pyarrow(data_format)
 
+        connection = None
         try:
-            connection = mysql.connector.connect(
-                host=db_config["host"],
-                port=db_config["port"],
-                user=db_config["user"],
-                password=db_config["password"],
-                database=db_config["name"]
-            )
+            with metrics.phase("connect"):
+                connection = connections.acquire("mysql", target)
 
             with open(backup_file, "w") as f:
                 cursor = connection.cursor()
@@ -33,20 +137,53 @@ class MySQLHandler(DBMSHandler):
                 tables = cursor.fetchall()
 
                 # Generate SQL dump
-                for table in tables:
-                    table_name = table[0]
-                    cursor.execute(f"SHOW CREATE TABLE `{table_name}`")
-                    create_table = cursor.fetchone()[1]
-                    f.write(f"{create_table};\n\n")
-
-                    cursor.execute(f"SELECT * FROM `{table_name}`")
-                    rows = cursor.fetchall()
-                    if rows:
-                        columns = [desc[0] for desc in cursor.description]
-                        for row in rows:
-                            values = ', '.join([f"'{str(v).replace('\'', '\\\'')}'" if v is not None else 'NULL' for v in row])
-                            f.write(f"INSERT INTO `{table_name}` (`{'`, `'.join(columns)}`) VALUES ({values});\n")
-                        f.write("\n")
+                all_tables = [table[0] for table in tables]
+                table_names = self.select_tables(target, all_tables, target["database"]["name"])
+                if len(table_names) < len(all_tables):
+                    logger.info(f"Filters keep {len(table_names)} of {len(all_tables)} tables")
+                data_tables = [t for t in table_names if not self.data_excluded(target, t, target["database"]["name"])]
+                workers = min((plan or {}).get("workers", 1), len(data_tables))
+                if data_format != "sql":
+                    # Schema-only dump; each table's rows go in a columnar file of their own
+                    for table_name in table_names:
+                        with metrics.phase("schema", table=table_name):
+                            self._dump_schema(cursor, table_name, f)
+                    if workers > 1:
+                        connect, release = lambda: connections.acquire("mysql", target), connections.release
+                    else:
+                        connect, release = lambda: connection, lambda _: None
+                    self.dump_data_files(
+                        data_tables, workers, connect, release,
+                        lambda table_name: self._data_file(target, table_name, backup_file),
+                        lambda worker_conn, table_name, path: self._dump_data_file(worker_conn, target, table_name, path, fetch_size),
+                    )
+                elif workers > 1:
+                    # Schemas first, then each table's data from its own connection
+                    for table_name in table_names:
+                        with metrics.phase("schema", table=table_name):
+                            self._dump_schema(cursor, table_name, f)
+
+                    def dump_table(worker_conn, table_name: str, out) -> int:
+                        with closing(worker_conn.cursor()) as worker_cursor:
+                            return self._dump_table(worker_cursor, table_name, out, fetch_size, self._data_where(target, table_name))
+
+                    self.dump_tables_parallel(
+                        data_tables, backup_file, f, workers,
+                        lambda: connections.acquire("mysql", target), connections.release, dump_table,
+                    )
+                else:
+                    for table_name in table_names:
+                        with metrics.phase("schema", table=table_name):
+                            self._dump_schema(cursor, table_name, f)
+                        if table_name not in data_tables:
+                            continue
+                        with metrics.phase("data", table=table_name) as p:
+                            start = f.tell()
+                            rows = self._dump_table(cursor, table_name, f, fetch_size, self._data_where(target, table_name))
+                            p.add(bytes=f.tell() - start, rows=rows)
+                for table_name in data_tables:
+                    if self.partitioning(target, table_name):
+                        self._dump_partitions(cursor, target, table_name, backup_file, fetch_size)
 
                 cursor.close()
 
@@ -57,39 +194,32 @@ class MySQLHandler(DBMSHandler):
             logger.error(f"Backup failed: {e}")
             raise
         finally:
-            if connection.is_connected():
-                connection.close()
+            connections.release(connection)
 
     def restore(self, target: Dict, backup_file: Path, force: bool = False) -> None:
         self.ensure_deps(load_requirements())
-        import mysql.connector
         from mysql.connector import Error
         db_config = target["database"]
 
+        connection = None
+        cursor = None
         try:
-            connection = mysql.connector.connect(
-                host=db_config["host"],
-                port=db_config["port"],
-                user=db_config["user"],
-                password=db_config["password"]
-            )
+            with metrics.phase("connect"):
+                connection = connections.acquire("mysql", target, "")
 
             cursor = connection.cursor()
             if force:
                 logger.info(f"Dropping database `{db_config['name']}` due to --force flag")
+                connections.evict("mysql", target)
                 cursor.execute(f"DROP DATABASE IF EXISTS `{db_config['name']}`")
             cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_config['name']}`")
             cursor.close()
-            connection.close()
+            connections.release(connection)
+            cursor = connection = None
 
             # Connect to the target database
-            connection = mysql.connector.connect(
-                host=db_config["host"],
-                port=db_config["port"],
-                user=db_config["user"],
-                password=db_config["password"],
-                database=db_config["name"]
-            )
+            with metrics.phase("connect"):
+                connection = connections.acquire("mysql", target)
 
             connection.autocommit = False
             cursor = connection.cursor()
@@ -105,33 +235,10 @@ class MySQLHandler(DBMSHandler):
                         table_name = table[0]
                         cursor.execute(f"DROP TABLE `{table_name}`")
 
-                with open(backup_file, "r") as f:
-                    sql_statements = f.read().split(";\n")
-
-                for statement in sql_statements:
-                    statement = statement.strip()
-                    if not statement or statement.startswith("SET FOREIGN_KEY_CHECKS"):
-                        continue
-
-                    # Convert INSERT to INSERT IGNORE to handle duplicates
-                    if statement.startswith("INSERT INTO"):
-                        statement = statement.replace("INSERT INTO", "INSERT IGNORE INTO", 1)
-
-                    try:
-                        cursor.execute(statement)
-                    except mysql.connector.errors.ProgrammingError as e:
-                        if e.errno == 1050:  # Table already exists
-                            logger.warning(f"Skipping table creation: {e}")
-                            continue
-                        elif e.errno == 1062:  # Duplicate entry
-                            logger.warning(f"Skipping duplicate entry: {e}")
-                            continue
-                        else:
-                            logger.error(f"Statement failed: {statement[:100]}... {e}")
-                            raise
-
+                inserted = self._execute_file(cursor, backup_file)
                 cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
                 connection.commit()
+                metrics.add(rows=inserted)
                 logger.info(f"MySQL database restored: {db_config['name']}")
 
             except Exception as e:
@@ -143,6 +250,71 @@ class MySQLHandler(DBMSHandler):
             logger.error(f"Restore failed: {e}")
             raise
         finally:
-            if connection.is_connected():
+            if cursor:
                 cursor.close()
-                connection.close()
+            connections.release(connection)
+
+    def restore_data_file(self, target: Dict, data_file: Path) -> None:
+        """Load a partition's INSERTs, or a columnar file's rows, into the database restore() just recreated."""
+        connection = connections.acquire("mysql", target)
+        connection.autocommit = False
+        try:
+            with closing(connection.cursor()) as cursor:
+                try:
+                    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+                    inserted = self._execute_file(cursor, data_file) if data_file.suffix == ".sql" else self._insert_columnar(cursor, data_file)
+                    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+            metrics.add(rows=inserted)
+        finally:
+            connections.release(connection)
+        logger.info(f"MySQL data restored: {data_file.name}")
+
+    def _insert_columnar(self, cursor, data_file: Path) -> int:
+        ensure_pyarrow(data_file.suffix[1:])
+        # executemany sends each batch as one multi-row INSERT, so keep batches well under max_allowed_packet
+        table_name, columns, batches = read_columnar(data_file, self.fetch_size)
+        statement = f"INSERT IGNORE INTO `{table_name}` (`{'`, `'.join(columns)}`) VALUES ({', '.join(['%s'] * len(columns))})"
+        count = 0
+        for rows in batches:
+            cursor.executemany(statement, rows)
+            count += len(rows)
+        return count
+
+    def _execute_file(self, cursor, backup_file: Path) -> int:
+        """Run a dump's statements; returns the number of INSERTs."""
+        import mysql.connector
+        with open(backup_file, "r") as f:
+            sql_statements = f.read().split(";\n")
+
+        inserted = 0
+        for statement in sql_statements:
+            statement = statement.strip()
+            if not statement or statement.startswith("SET FOREIGN_KEY_CHECKS"):
+                continue
+
+            # Convert INSERT to INSERT IGNORE to handle duplicates
+            if statement.startswith("INSERT INTO"):
+                statement = statement.replace("INSERT INTO", "INSERT IGNORE INTO", 1)
+                inserted += 1
+
+            try:
+                cursor.execute(statement)
+            except mysql.connector.errors.ProgrammingError as e:
+                if e.errno == 1050:  # Table already exists
+                    logger.warning(f"Skipping table creation: {e}")
+                    continue
+                elif e.errno == 1062:  # Duplicate entry
+                    logger.warning(f"Skipping duplicate entry: {e}")
+                    continue
+                else:
+                    logger.error(f"Statement failed: {statement[:100]}... {e}")
+                    raise
+        return inserted
+
+
+def _quote(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
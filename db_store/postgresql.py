@@ -1,189 +1,382 @@
 from pathlib import Path
 from typing import Dict
-from db_store.dbms import DBMSHandler
+from db_store.columnar import COLUMNAR_FORMATS, ColumnarWriter, ensure_pyarrow, is_text, read_columnar, table_columns
+from db_store.connections import connections
+from db_store.dbms import DBMSHandler, partition_ranges
 from dep_manage.init import load_requirements
 from configs.init import logger
+from operations import metrics, throttle
+
+POST_DATA = "-- Post-data"  # dump statements after this line run once the data files are loaded
 
 
 class PostgreSQLHandler(DBMSHandler):
     required_deps = ["psycopg[binary]"]
+    writes_data_files = True
+    parallel_dump = True
 
-    def backup(self, target: Dict) -> Path:
+    def estimate(self, target: Dict) -> Dict:
         self.ensure_deps(load_requirements())
+        conn = connections.acquire("postgresql", target)
+        try:
+            rows = conn.execute("""
+                SELECT c.relname, pg_total_relation_size(c.oid), GREATEST(c.reltuples, 0)::bigint
+                FROM pg_class c
+                WHERE c.relkind = 'r' AND c.relnamespace = 'public'::regnamespace
+            """).fetchall()
+        finally:
+            connections.release(conn)
+        return self.filtered_estimate(target, {r[0]: (r[1], r[2]) for r in rows}, "public")
+
+    def _use_snapshot(self, conn, snapshot: str = None) -> None:
+        from psycopg import sql
+        if snapshot:
+            conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            conn.execute(sql.SQL("SET TRANSACTION SNAPSHOT {}").format(sql.Literal(snapshot)))
+
+    def _where(self, target: Dict, table: str, extra=None):
+        """The table's configured row filter AND extra, or None for every row."""
+        from psycopg import sql
+        conditions = []
+        if self.row_filter(target, table):
+            conditions.append(sql.SQL("({})").format(sql.SQL(self.row_filter(target, table))))
+        if extra is not None:
+            conditions.append(extra)
+        return sql.SQL(" AND ").join(conditions) if conditions else None
+
+    def _select(self, table: str, where=None, columns=None):
+        from psycopg import sql
+        query = sql.SQL("SELECT {} FROM {}").format(columns or sql.SQL("*"), sql.Identifier(table))
+        return query if where is None else sql.SQL("{} WHERE {}").format(query, where)
+
+    def _dump_table(self, conn, table: str, f, fetch_size: int, snapshot: str = None, where=None) -> int:
+        """Write INSERTs for one table (the rows matching where) to f; returns the row count."""
+        from psycopg import sql
+        count = 0
+        query = self._select(table, where)
+        # Server-side cursor so rows arrive in batches and read limits pace the server, not just our disk
+        with conn.transaction():
+            self._use_snapshot(conn, snapshot)
+            with conn.cursor(name=f"dump_{table}") as data_cursor:
+                data_cursor.execute(query)
+                while rows := data_cursor.fetchmany(fetch_size):
+                    mark = f.tell()
+                    col_names = [sql.Identifier(desc.name).as_string(conn) for desc in data_cursor.description]
+                    for row in rows:
+                        values = [sql.Literal(v).as_string(conn) if v is not None else 'NULL' for v in row]
+                        f.write(sql.SQL("INSERT INTO {} ({}) VALUES ({});\n").format(
+                            sql.Identifier(table),
+                            sql.SQL(", ").join(map(sql.SQL, col_names)),
+                            sql.SQL(", ").join(map(sql.SQL, values))
+                        ).as_string(conn))
+                    count += len(rows)
+                    throttle.read(f.tell() - mark, len(rows))
+        if count:
+            f.write("\n")
+        return count
+
+    def _dump_table_columnar(self, conn, target: Dict, table: str, path: Path, fetch_size: int, snapshot: str = None, where=None) -> int:
+        """Stream one table's rows (those matching where) into a Parquet/Arrow file; returns the row count."""
         import psycopg
         from psycopg import sql
+        count = 0
+        with conn.transaction():
+            self._use_snapshot(conn, snapshot)
+            with conn.cursor() as cursor:
+                columns = table_columns(cursor, "public", table)
+            # Columns stored as text are cast by the server, so arrays, JSON, intervals etc. keep the
+            # text form COPY reads back
+            select = sql.SQL(", ").join(
+                sql.SQL("{}::text").format(sql.Identifier(name)) if is_text(arrow_type) else sql.Identifier(name)
+                for name, _, arrow_type in columns
+            )
+            with conn.cursor(name=f"dump_{table}") as data_cursor, ColumnarWriter(
+                    path, self.data_format(target), [(name, arrow_type) for name, _, arrow_type in columns], {"table": table}) as writer:
+                data_cursor.execute(self._select(table, where, select))
+                try:
+                    while rows := data_cursor.fetchmany(fetch_size):
+                        mark = writer.nbytes
+                        writer.write_rows(rows)
+                        count += len(rows)
+                        throttle.read(writer.nbytes - mark, len(rows))
+                except psycopg.DataError as e:
+                    # e.g. 'infinity' dates and timestamps, which have no Python or Arrow value
+                    raise ValueError(f"Can't store {table} as {self.data_format(target)}: {e}; use data_format 'sql' for this target") from None
+        return count
+
+    def _dump_file(self, conn, target: Dict, table: str, path: Path, fetch_size: int, snapshot: str = None, where=None) -> int:
+        """Write the rows matching where to their own file: INSERTs, or columnar data by its suffix."""
+        if path.suffix != ".sql":
+            return self._dump_table_columnar(conn, target, table, path, fetch_size, snapshot, where)
+        with path.open("w", encoding="utf-8") as f:
+            f.write(f"-- PostgreSQL Backup: {path.stem}\n\n")
+            return self._dump_table(conn, table, f, fetch_size, snapshot, where)
+
+    def _data_file(self, target: Dict, table: str, backup_file: Path) -> Path:
+        """Where a table's data goes in columnar backups."""
+        return self.table_file(backup_file, table, COLUMNAR_FORMATS[self.data_format(target)])
+
+    def _dump_data_file(self, conn, target: Dict, table: str, path: Path, fetch_size: int, snapshot: str = None) -> int:
+        """Write a table's data file for columnar backups; returns the row count."""
+        return self._dump_table_columnar(conn, target, table, path, fetch_size, snapshot, self._data_where(target, table))
+
+    def _data_where(self, target: Dict, table: str):
+        """Rows that go in the main dump: partitioned tables only keep rows without a partition value there."""
+        from psycopg import sql
+        spec = self.partitioning(target, table)
+        return self._where(target, table, sql.SQL("{} IS NULL").format(sql.Identifier(spec["column"])) if spec else None)
+
+    def _dump_partitions(self, conn, target: Dict, table: str, backup_file: Path, fetch_size: int, snapshot: str = None) -> None:
+        """Dump each range of a partitioned table's column into its own file, archived separately."""
+        from psycopg import sql
+        spec = self.partitioning(target, table)
+        column = sql.Identifier(spec["column"])
+        with conn.transaction():
+            self._use_snapshot(conn, snapshot)
+            low, high = conn.execute(sql.SQL("SELECT min({0}), max({0}) FROM {1} WHERE {2}").format(
+                column, sql.Identifier(table), self._where(target, table, sql.SQL("{} IS NOT NULL").format(column))
+            )).fetchone()
+        for label, start, end in partition_ranges(low, high, spec["interval"]):
+            path = self.partition_file(backup_file, table, label, COLUMNAR_FORMATS.get(self.data_format(target)))
+            where = self._where(target, table, sql.SQL("{0} >= {1} AND {0} < {2}").format(column, sql.Literal(start), sql.Literal(end)))
+            with metrics.phase("data", table=table, partition=label) as p:
+                rows = self._dump_file(conn, target, table, path, fetch_size, snapshot, where)
+                p.add(bytes=path.stat().st_size, rows=rows)
+            self.keep_data_file(path, rows)
+
+    def backup(self, target: Dict, plan: Dict = None) -> Path:
+        self.ensure_deps(load_requirements())
+        from psycopg import sql
 
         db_config = target["database"]
         backup_file = self.get_backup_filename(target, "sql")
+        fetch_size = (plan or {}).get("fetch_size", self.fetch_size)
+        data_format = self.data_format(target)
+        if data_format != "sql":
+            ensure_pyarrow(data_format)
 
         conn = None
         cursor = None
         try:
-            conn = psycopg.connect(
-                dbname=db_config["name"],
-                user=db_config.get("user", ""),
-                password=db_config.get("password", ""),
-                host=db_config["host"],
-                port=db_config["port"],
-                autocommit=True
-            )
+            with metrics.phase("connect"):
+                conn = connections.acquire("postgresql", target)
             cursor = conn.cursor()
 
             with open(backup_file, "w", encoding="utf-8") as f:
                 f.write("-- PostgreSQL Backup\n")
                 f.write(f"-- Database: {db_config['name']}\n\n")
 
-                # === Sequences ===
-                f.write("-- Sequences\n")
-                cursor.execute("""
-                    SELECT schemaname, sequencename
-                    FROM pg_sequences
-                    WHERE schemaname = 'public'
-                    ORDER BY sequencename
-                """)
-                sequences = cursor.fetchall()
-
-                for schema, seq_name in sequences:
-                    seq_id = sql.Identifier(seq_name)
-                    cursor.execute(sql.SQL("""
-                        SELECT start_value, increment_by, max_value, min_value, cache_size, cycle
+                with metrics.phase("schema"):
+                    # === Sequences ===
+                    f.write("-- Sequences\n")
+                    cursor.execute("""
+                        SELECT schemaname, sequencename
                         FROM pg_sequences
-                        WHERE schemaname = 'public' AND sequencename = {}
-                    """).format(sql.Literal(seq_name)))
-                    start, inc, maxv, minv, cache, cycle = cursor.fetchone()
-
-                    cursor.execute(sql.SQL("SELECT last_value, is_called FROM {}").format(seq_id))
-                    last_value, is_called = cursor.fetchone()
-
-                    f.write(f"""CREATE SEQUENCE IF NOT EXISTS {seq_id.as_string(cursor)}
+                        WHERE schemaname = 'public'
+                        ORDER BY sequencename
+                    """)
+                    sequences = cursor.fetchall()
+
+                    for schema, seq_name in sequences:
+                        seq_id = sql.Identifier(seq_name)
+                        cursor.execute(sql.SQL("""
+                            SELECT start_value, increment_by, max_value, min_value, cache_size, cycle
+                            FROM pg_sequences
+                            WHERE schemaname = 'public' AND sequencename = {}
+                        """).format(sql.Literal(seq_name)))
+                        start, inc, maxv, minv, cache, cycle = cursor.fetchone()
+
+                        cursor.execute(sql.SQL("SELECT last_value, is_called FROM {}").format(seq_id))
+                        last_value, is_called = cursor.fetchone()
+
+                        f.write(f"""CREATE SEQUENCE IF NOT EXISTS {seq_id.as_string(cursor)}
     START WITH {start}
     INCREMENT BY {inc}
     MINVALUE {minv}
     MAXVALUE {maxv}
     CACHE {cache}
     {"CYCLE" if cycle else "NO CYCLE"};\n""")
-                    f.write(f"SELECT setval({sql.Literal(seq_name).as_string(cursor)}, {last_value}, {str(is_called).lower()});\n\n")
-
-                # === Tables ===
-                f.write("-- Tables\n")
-                cursor.execute("""
-                    SELECT table_name
-                    FROM information_schema.tables
-                    WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
-                    ORDER BY table_name
-                """)
-                tables = [row[0] for row in cursor.fetchall()]
-
-                for table in tables:
-                    cursor.execute(sql.SQL("""
-                        SELECT a.attname, pg_catalog.format_type(a.atttypid, a.atttypmod),
-                               NOT a.attnotnull AS is_nullable,
-                               pg_get_expr(ad.adbin, ad.adrelid) AS default_value
-                        FROM pg_attribute a
-                        LEFT JOIN pg_attrdef ad ON a.attrelid = ad.adrelid AND a.attnum = ad.adnum
-                        WHERE a.attrelid = 'public.{}'::regclass AND a.attnum > 0 AND NOT a.attisdropped
-                        ORDER BY a.attnum
-                    """).format(sql.Identifier(table)))
-                    columns = cursor.fetchall()
-
-                    col_defs = []
-                    for name, type_str, is_nullable, default_val in columns:
-                        col_id = sql.Identifier(name).as_string(cursor)
-                        col_def = f"{col_id} {type_str}"
-                        if default_val is not None:
-                            col_def += f" DEFAULT {default_val}"
-                        if not is_nullable:
-                            col_def += " NOT NULL"
-                        col_defs.append(col_def)
-
-                    f.write(sql.SQL("CREATE TABLE IF NOT EXISTS {} (\n  {}\n);\n\n").format(
-                        sql.Identifier(table),
-                        sql.SQL(",\n  ").join(map(sql.SQL, col_defs))
-                    ).as_string(cursor))
-
-                # === Constraints ===
-                f.write("-- Constraints\n")
-                for table in tables:
-                    cursor.execute(sql.SQL("""
-                        SELECT conname, pg_get_constraintdef(c.oid, true)
-                        FROM pg_constraint c
-                        JOIN pg_class t ON c.conrelid = t.oid
-                        WHERE t.relname = {} AND t.relnamespace = 'public'::regnamespace
-                        ORDER BY conname
-                    """).format(sql.Literal(table)))
-                    for name, defn in cursor.fetchall():
-                        f.write(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {};\n").format(
+                        f.write(f"SELECT setval({sql.Literal(seq_name).as_string(cursor)}, {last_value}, {str(is_called).lower()});\n\n")
+
+                    # === Tables ===
+                    f.write("-- Tables\n")
+                    cursor.execute("""
+                        SELECT table_name
+                        FROM information_schema.tables
+                        WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
+                        ORDER BY table_name
+                    """)
+                    all_tables = [row[0] for row in cursor.fetchall()]
+                    tables = self.select_tables(target, all_tables, "public")
+                    if len(tables) < len(all_tables):
+                        logger.info(f"Filters keep {len(tables)} of {len(all_tables)} tables")
+
+                    for table in tables:
+                        cursor.execute(sql.SQL("""
+                            SELECT a.attname, pg_catalog.format_type(a.atttypid, a.atttypmod),
+                                   NOT a.attnotnull AS is_nullable,
+                                   pg_get_expr(ad.adbin, ad.adrelid) AS default_value
+                            FROM pg_attribute a
+                            LEFT JOIN pg_attrdef ad ON a.attrelid = ad.adrelid AND a.attnum = ad.adnum
+                            WHERE a.attrelid = 'public.{}'::regclass AND a.attnum > 0 AND NOT a.attisdropped
+                            ORDER BY a.attnum
+                        """).format(sql.Identifier(table)))
+                        columns = cursor.fetchall()
+
+                        col_defs = []
+                        for name, type_str, is_nullable, default_val in columns:
+                            col_id = sql.Identifier(name).as_string(cursor)
+                            col_def = f"{col_id} {type_str}"
+                            if default_val is not None:
+                                col_def += f" DEFAULT {default_val}"
+                            if not is_nullable:
+                                col_def += " NOT NULL"
+                            col_defs.append(col_def)
+
+                        f.write(sql.SQL("CREATE TABLE IF NOT EXISTS {} (\n  {}\n);\n\n").format(
                             sql.Identifier(table),
-                            sql.Identifier(name),
-                            sql.SQL(defn)
+                            sql.SQL(",\n  ").join(map(sql.SQL, col_defs))
                         ).as_string(cursor))
-                    f.write("\n")
 
                 # === Table Data ===
                 f.write("-- Table Data\n")
-                for table in tables:
-                    cursor.execute(sql.SQL("SELECT * FROM {}").format(sql.Identifier(table)))
-                    rows = cursor.fetchall()
-                    if not rows:
-                        continue
-                    col_names = [sql.Identifier(desc.name).as_string(cursor) for desc in cursor.description]
-                    for row in rows:
-                        values = [sql.Literal(v).as_string(cursor) if v is not None else 'NULL' for v in row]
-                        f.write(sql.SQL("INSERT INTO {} ({}) VALUES ({});\n").format(
-                            sql.Identifier(table),
-                            sql.SQL(", ").join(map(sql.SQL, col_names)),
-                            sql.SQL(", ").join(map(sql.SQL, values))
-                        ).as_string(cursor))
+                data_tables = [table for table in tables if not self.data_excluded(target, table, "public")]
+                partitioned = [table for table in data_tables if self.partitioning(target, table)]
+                workers = min((plan or {}).get("workers", 1), len(data_tables))
+                if data_format != "sql":
+                    f.write(f"-- In {data_format} files next to this dump: {', '.join(data_tables)}\n\n")
+                if workers > 1:
+                    # Workers read one exported snapshot, so the parallel dump is as consistent as a serial one
+                    with conn.transaction():
+                        conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                        snapshot = conn.execute("SELECT pg_export_snapshot()").fetchone()[0]
+                        if data_format != "sql":
+                            self.dump_data_files(
+                                data_tables, workers, lambda: connections.acquire("postgresql", target), connections.release,
+                                lambda table: self._data_file(target, table, Path(backup_file)),
+                                lambda worker_conn, table, path: self._dump_data_file(worker_conn, target, table, path, fetch_size, snapshot),
+                            )
+                        else:
+                            self.dump_tables_parallel(
+                                data_tables, Path(backup_file), f, workers,
+                                lambda: connections.acquire("postgresql", target), connections.release,
+                                lambda worker_conn, table, out: self._dump_table(
+                                    worker_conn, table, out, fetch_size, snapshot, self._data_where(target, table)),
+                            )
+                        if partitioned:
+                            worker_conn = connections.acquire("postgresql", target)
+                            try:
+                                for table in partitioned:
+                                    self._dump_partitions(worker_conn, target, table, Path(backup_file), fetch_size, snapshot)
+                            finally:
+                                connections.release(worker_conn)
+                else:
+                    if data_format != "sql":
+                        self.dump_data_files(data_tables, 1, lambda: conn, lambda _: None,
+                                             lambda table: self._data_file(target, table, Path(backup_file)),
+                                             lambda worker_conn, table, path: self._dump_data_file(worker_conn, target, table, path, fetch_size))
+                    else:
+                        for table in data_tables:
+                            with metrics.phase("data", table=table) as p:
+                                start = f.tell()
+                                rows = self._dump_table(conn, table, f, fetch_size, where=self._data_where(target, table))
+                                p.add(bytes=f.tell() - start, rows=rows)
+                    for table in partitioned:
+                        self._dump_partitions(conn, target, table, Path(backup_file), fetch_size)
+
+                # Constraints, indexes and triggers come after the data (restore applies them only once
+                # every data file is loaded), so rows are checked and indexed once, in bulk
+                f.write(f"{POST_DATA}\n")
+                with metrics.phase("schema", section="post-data"):
+                    # === Constraints ===
+                    f.write("-- Constraints\n")
+                    for table in tables:
+                        cursor.execute(sql.SQL("""
+                            SELECT conname, pg_get_constraintdef(c.oid, true), r.relname
+                            FROM pg_constraint c
+                            JOIN pg_class t ON c.conrelid = t.oid
+                            LEFT JOIN pg_class r ON c.confrelid = r.oid
+                            WHERE t.relname = {} AND t.relnamespace = 'public'::regnamespace
+                            ORDER BY conname
+                        """).format(sql.Literal(table)))
+                        for name, defn, referenced in cursor.fetchall():
+                            if referenced and referenced not in tables:
+                                logger.warning(f"Skipping {table}.{name}: it references {referenced}, which the filters exclude")
+                                continue
+                            if referenced and (self.data_filtered(target, table, "public") or self.data_filtered(target, referenced, "public")):
+                                # Rows of one side were filtered, so existing rows may not match; still enforce the key for new ones
+                                logger.warning(f"Adding {table}.{name} as NOT VALID: {table} or {referenced} has filtered data")
+                                defn += " NOT VALID"
+                            f.write(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {};\n").format(
+                                sql.Identifier(table),
+                                sql.Identifier(name),
+                                sql.SQL(defn)
+                            ).as_string(cursor))
+                        f.write("\n")
+
+                    # === Indexes ===
+                    f.write("-- Indexes\n")
+                    cursor.execute("""
+                        SELECT indexdef
+                        FROM pg_indexes
+                        WHERE schemaname = 'public' AND indexname NOT LIKE '%_pkey' AND tablename = ANY(%s)
+                        ORDER BY indexname
+                    """, (tables,))
+                    for (index_def,) in cursor.fetchall():
+                        f.write(f"{index_def};\n")
                     f.write("\n")
 
-                # === Indexes ===
-                f.write("-- Indexes\n")
-                cursor.execute("""
-                    SELECT indexdef
-                    FROM pg_indexes
-                    WHERE schemaname = 'public' AND indexname NOT LIKE '%_pkey'
-                    ORDER BY indexname
-                """)
-                for (index_def,) in cursor.fetchall():
-                    f.write(f"{index_def};\n")
-                f.write("\n")
-
-                # === Views ===
-                f.write("-- Views\n")
-                cursor.execute("""
-                    SELECT 'CREATE OR REPLACE VIEW ' || quote_ident(viewname) || ' AS ' || definition
-                    FROM pg_views
-                    WHERE schemaname = 'public'
-                    ORDER BY viewname
-                """)
-                for (view_def,) in cursor.fetchall():
-                    f.write(f"{view_def};\n")
-                f.write("\n")
-
-                # === Triggers ===
-                f.write("-- Triggers\n")
-                cursor.execute("""
-                    SELECT pg_get_triggerdef(t.oid)
-                    FROM pg_trigger t
-                    JOIN pg_class c ON t.tgrelid = c.oid
-                    WHERE c.relnamespace = 'public'::regnamespace AND NOT t.tgisinternal
-                    ORDER BY t.tgname
-                """)
-                for (trigger_def,) in cursor.fetchall():
-                    f.write(f"{trigger_def};\n")
-                f.write("\n")
-
-                # === Functions ===
-                f.write("-- Functions\n")
-                cursor.execute("""
-                    SELECT pg_get_functiondef(p.oid)
-                    FROM pg_proc p
-                    WHERE p.pronamespace = 'public'::regnamespace
-                    ORDER BY p.proname
-                """)
-                for (func_def,) in cursor.fetchall():
-                    f.write(f"{func_def};\n")
-                f.write("\n")
+                    # === Views ===
+                    f.write("-- Views\n")
+                    # Each view with the tables and views it selects from (through its rewrite rule)
+                    cursor.execute("""
+                        SELECT v.relname, 'CREATE OR REPLACE VIEW ' || quote_ident(v.relname) || ' AS ' || pg_get_viewdef(v.oid),
+                               array_remove(array_agg(DISTINCT dep.relname), NULL)
+                        FROM pg_class v
+                        JOIN pg_rewrite r ON r.ev_class = v.oid
+                        LEFT JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid
+                            AND d.refclassid = 'pg_class'::regclass AND d.refobjid <> v.oid
+                        LEFT JOIN pg_class dep ON dep.oid = d.refobjid AND dep.relkind IN ('r', 'p', 'v', 'm', 'f')
+                            AND dep.relnamespace = 'public'::regnamespace
+                        WHERE v.relkind = 'v' AND v.relnamespace = 'public'::regnamespace
+                        GROUP BY v.oid, v.relname
+                        ORDER BY v.relname
+                    """)
+                    views = {name: (view_def, set(deps)) for name, view_def, deps in cursor.fetchall()}
+                    dumped = set(tables)
+                    # Views on other views go after them; a view on anything the filters exclude would fail on restore
+                    while ready := [name for name, (_, deps) in views.items() if deps <= dumped]:
+                        for name in ready:
+                            f.write(f"{views.pop(name)[0]};\n")
+                            dumped.add(name)
+                    for name, (_, deps) in views.items():
+                        logger.warning(f"Skipping view {name}: it selects from {', '.join(sorted(deps - dumped))}, which the filters exclude")
+                    f.write("\n")
+
+                    # === Triggers ===
+                    f.write("-- Triggers\n")
+                    cursor.execute("""
+                        SELECT pg_get_triggerdef(t.oid)
+                        FROM pg_trigger t
+                        JOIN pg_class c ON t.tgrelid = c.oid
+                        WHERE c.relnamespace = 'public'::regnamespace AND NOT t.tgisinternal AND c.relname = ANY(%s)
+                        ORDER BY t.tgname
+                    """, (tables,))
+                    for (trigger_def,) in cursor.fetchall():
+                        f.write(f"{trigger_def};\n")
+                    f.write("\n")
+
+                    # === Functions ===
+                    f.write("-- Functions\n")
+                    cursor.execute("""
+                        SELECT pg_get_functiondef(p.oid)
+                        FROM pg_proc p
+                        WHERE p.pronamespace = 'public'::regnamespace
+                        ORDER BY p.proname
+                    """)
+                    for (func_def,) in cursor.fetchall():
+                        f.write(f"{func_def};\n")
+                    f.write("\n")
 
             logger.info(f"PostgreSQL backup created: {backup_file}")
             return backup_file
@@ -195,13 +388,11 @@ class PostgreSQLHandler(DBMSHandler):
         finally:
             if cursor:
                 cursor.close()
-            if conn:
-                conn.close()
+            connections.release(conn)
 
     def restore(self, target: Dict, backup_file: Path) -> None:
         self.ensure_deps(load_requirements())
         from psycopg import sql
-        import psycopg
 
         db_config = target["database"]
         target_db = db_config["name"]
@@ -211,14 +402,8 @@ class PostgreSQLHandler(DBMSHandler):
         cursor = None
         try:
             # Connect to admin database to drop and recreate target database
-            conn = psycopg.connect(
-                dbname=admin_db,
-                user=db_config.get("user", ""),
-                password=db_config.get("password", ""),
-                host=db_config["host"],
-                port=db_config["port"],
-                autocommit=True
-            )
+            with metrics.phase("connect"):
+                conn = connections.acquire("postgresql", target, admin_db)
             cursor = conn.cursor()
 
             # Terminate active connections to the target database
@@ -228,46 +413,20 @@ class PostgreSQLHandler(DBMSHandler):
                 WHERE pg_stat_activity.datname = {} AND pid <> pg_backend_pid()
             """).format(sql.Literal(target_db)))
 
-            # Drop and recreate the target database
+            # Drop and recreate the target database; pooled connections to it are about to be terminated
+            connections.evict("postgresql", target)
             cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(target_db)))
             cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(target_db)))
             cursor.close()
-            conn.close()
+            connections.release(conn)
+            cursor = conn = None
 
             # Connect to the new database
-            conn = psycopg.connect(
-                dbname=target_db,
-                user=db_config.get("user", ""),
-                password=db_config.get("password", ""),
-                host=db_config["host"],
-                port=db_config["port"],
-                autocommit=True
-            )
+            with metrics.phase("connect"):
+                conn = connections.acquire("postgresql", target)
             cursor = conn.cursor()
 
-            # Parse and execute SQL statements
-            with open(backup_file, "r", encoding="utf-8") as f:
-                statements = []
-                buffer = ""
-                for line in f:
-                    stripped = line.strip()
-                    if not stripped or stripped.startswith("--"):
-                        continue
-                    buffer += line
-                    if stripped.endswith(";"):
-                        statements.append(buffer.strip())
-                        buffer = ""
-
-            # Execute statements, skipping redundant primary key constraints
-            for stmt in statements:
-                try:
-                    if "ADD CONSTRAINT" in stmt.upper() and "_pkey" in stmt:
-                        continue  # Skip primary key constraints to avoid duplicates
-                    cursor.execute(stmt)
-                except Exception as e:
-                    logger.error(f"SQL execution failed:\n{stmt}\nError: {e}")
-                    raise
-
+            metrics.add(rows=self._execute_file(cursor, backup_file))
             logger.info(f"PostgreSQL database restored: {target_db}")
 
         except Exception as e:
@@ -277,5 +436,74 @@ class PostgreSQLHandler(DBMSHandler):
         finally:
             if cursor:
                 cursor.close()
-            if conn:
-                conn.close()
\ No newline at end of file
+            connections.release(conn)
+
+    def restore_data_file(self, target: Dict, data_file: Path) -> None:
+        """Load a partition's INSERTs, or COPY a columnar file's rows, into the database restore() just recreated."""
+        conn = connections.acquire("postgresql", target)
+        try:
+            with conn.cursor() as cursor:
+                if data_file.suffix == ".sql":
+                    metrics.add(rows=self._execute_file(cursor, data_file))
+                else:
+                    metrics.add(rows=self._copy_columnar(cursor, data_file))
+        finally:
+            connections.release(conn)
+        logger.info(f"PostgreSQL data restored: {data_file.name}")
+
+    def finish_restore(self, target: Dict, backup_file: Path) -> None:
+        """Apply the dump's constraints, indexes, views, triggers and functions once all data is in."""
+        conn = connections.acquire("postgresql", target)
+        try:
+            with conn.cursor() as cursor:
+                self._execute_file(cursor, backup_file, post_data=True)
+        finally:
+            connections.release(conn)
+        logger.info(f"PostgreSQL post-data restored: {target['database']['name']}")
+
+    def _copy_columnar(self, cursor, data_file: Path) -> int:
+        from psycopg import sql
+        ensure_pyarrow(data_file.suffix[1:])
+        table, columns, batches = read_columnar(data_file)
+        count = 0
+        with cursor.copy(sql.SQL("COPY {} ({}) FROM STDIN").format(
+                sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns)))) as copy:
+            for rows in batches:
+                for row in rows:
+                    copy.write_row(row)
+                count += len(rows)
+        return count
+
+    def _execute_file(self, cursor, backup_file: Path, post_data: bool = False) -> int:
+        """Run a dump's statements before its post-data line (or, with post_data, after it); returns the number of INSERTs."""
+        # Parse and execute SQL statements
+        with open(backup_file, "r", encoding="utf-8") as f:
+            statements = []
+            buffer = ""
+            in_post_data = False
+            for line in f:
+                stripped = line.strip()
+                if stripped == POST_DATA and not buffer:
+                    in_post_data = True
+                    continue
+                if not stripped or stripped.startswith("--"):
+                    continue
+                buffer += line
+                if stripped.endswith(";"):
+                    if in_post_data == post_data:
+                        statements.append(buffer.strip())
+                    buffer = ""
+
+        # Execute statements, skipping redundant primary key constraints
+        inserted = 0
+        for stmt in statements:
+            try:
+                if "ADD CONSTRAINT" in stmt.upper() and "_pkey" in stmt:
+                    continue  # Skip primary key constraints to avoid duplicates
+                cursor.execute(stmt)
+                if stmt.startswith("INSERT"):
+                    inserted += 1
+            except Exception as e:
+                logger.error(f"SQL execution failed:\n{stmt}\nError: {e}")
+                raise
+        return inserted
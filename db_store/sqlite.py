@@ -1,28 +1,227 @@
+import hashlib
+import json
+import os
 import shutil
+import time
+from contextlib import closing
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 from db_store.dbms import DBMSHandler
 from dep_manage.init import load_requirements
-from configs.init import logger
+from configs.init import CONFIG_DIR, logger
 from dep_manage.init import DEPENDENCY_GROUPS
+from operations import metrics, throttle
+
+PAGE_STATE_DIR = CONFIG_DIR / "sqlite_pages"  # page hashes of each incremental target's last full backup
+PAGE_DIGEST_SIZE = 16
+DEFAULT_STEP_PAGES = 1024
+DEFAULT_STEP_SLEEP = 0.005  # seconds between steps, when writers can take the database lock
+DEFAULT_FULL_EVERY = 7  # with incremental backups, every 7th backup is a full one
+MAX_RESTARTS = 3  # stepped copies restarted by other connections' writes before finishing in one step
+DELTA_MAX_CHANGED = 0.5  # a delta of more than half the pages saves little over a full backup
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _page_hashes(path: Path, page_size: int) -> Iterator[bytes]:
+    with path.open("rb") as f:
+        while block := f.read(256 * page_size):
+            view = memoryview(block)
+            for offset in range(0, len(view), page_size):
+                yield hashlib.blake2b(view[offset:offset + page_size], digest_size=PAGE_DIGEST_SIZE).digest()
+
+def _changed_pages(old: bytes, new: bytes) -> List[int]:
+    """0-based indexes of pages whose hash differs, or that old doesn't have."""
+    changed = []
+    span = 4096 * PAGE_DIGEST_SIZE  # compare runs of hashes first; most of a large database doesn't change
+    for start in range(0, len(new), span):
+        if new[start:start + span] == old[start:start + span]:
+            continue
+        for offset in range(start, min(start + span, len(new)), PAGE_DIGEST_SIZE):
+            if new[offset:offset + PAGE_DIGEST_SIZE] != old[offset:offset + PAGE_DIGEST_SIZE]:
+                changed.append(offset // PAGE_DIGEST_SIZE)
+    return changed
+
 
 class SQLiteHandler(DBMSHandler):
     required_deps = DEPENDENCY_GROUPS["database"]["sqlite"]
+    throttled_step = 1024 * 1024  # bytes copied per backup step when read-limited
 
-    def backup(self, target: Dict) -> Path:
+    def estimate(self, target: Dict) -> Dict:
+        import sqlite3
+        # Read-only URI so estimating never creates a missing database file
+        with closing(sqlite3.connect(f"{Path(target['database']['path']).resolve().as_uri()}?mode=ro", uri=True)) as conn:
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        return {"bytes": page_count * page_size, "rows": None, "tables": dict.fromkeys(tables, 0)}
+
+    def backup(self, target: Dict, plan: Dict = None) -> Path:
         self.ensure_deps(load_requirements())
-        db_config = target["database"]
         backup_file = self.get_backup_filename(target, "db")
-        import sqlite3
-        with sqlite3.connect(db_config["path"]) as src, sqlite3.connect(backup_file) as dst:
-            src.backup(dst)
+        with metrics.phase("data") as p:
+            page_size = self.copy_stepped(target, target["database"]["path"], backup_file)
+            p.add(bytes=backup_file.stat().st_size)
+        if target["backup"].get("incremental"):
+            with metrics.phase("delta"):
+                backup_file = self._delta_or_full(target, backup_file, page_size)
         logger.info(f"SQLite backup created: {backup_file}")
         return backup_file
 
+    def copy_stepped(self, target: Dict, source, backup_file: Path) -> int:
+        """Copy source with the online backup API a batch of pages at a time, sleeping in between so
+        the application's writers get the lock. Returns the page size."""
+        import sqlite3
+        step_pages = target["backup"].get("step_pages", DEFAULT_STEP_PAGES)
+        step_sleep = target["backup"].get("step_sleep", DEFAULT_STEP_SLEEP)
+        with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(backup_file)) as dst:
+            page_size = src.execute("PRAGMA page_size").fetchone()[0]
+            if throttle.reading_limited():
+                step_pages = min(step_pages, max(1, self.throttled_step // page_size))
+            copied = restarts = 0
+
+            def progress(status, remaining, total):
+                nonlocal copied, restarts
+                done = total - remaining
+                if copied and done <= copied and status in (sqlite3.SQLITE_OK, sqlite3.SQLITE_DONE):
+                    # A step that copied pages without getting further: another connection wrote to
+                    # the database, so SQLite started the copy over
+                    restarts += 1
+                    if restarts > MAX_RESTARTS:
+                        raise _Restarted()
+                    copied = 0
+                throttle.expect(total * page_size)
+                throttle.read((done - copied) * page_size)
+                copied = done
+                if remaining and step_sleep:
+                    time.sleep(step_sleep)
+
+            try:
+                src.backup(dst, pages=step_pages, progress=progress)
+            except _Restarted:
+                logger.warning(f"SQLite backup of {target['id']} restarted {MAX_RESTARTS} times by concurrent writes; finishing in one step")
+                src.backup(dst)
+        return page_size
+
+    def _state_path(self, target: Dict) -> Path:
+        return PAGE_STATE_DIR / f"{target['id']}.pages"
+
+    def _base_state(self, target: Dict, page_size: int) -> Optional[Tuple[Dict, bytes]]:
+        """The last full backup's page hashes, if the next backup may be a delta against it."""
+        path = self._state_path(target)
+        if not path.exists():
+            return None
+        with path.open("rb") as f:
+            meta = json.loads(f.readline())
+            hashes = f.read()
+        if meta["page_size"] != page_size:
+            logger.info(f"Page size of {target['id']} changed; taking a full backup")
+            return None
+        if meta["deltas"] + 1 >= target["backup"].get("full_every", DEFAULT_FULL_EVERY):
+            return None
+        from db_store.dbms_handler import get_storage_handler
+        from operations.checksum import MANIFEST_SUFFIX
+        try:
+            # The manifest is stored last, so it's there only if the full backup made it to storage
+            get_storage_handler(target["backup"]["cloud"]["type"]).size(meta["base"] + MANIFEST_SUFFIX, target)
+        except FileNotFoundError:
+            logger.info(f"Full backup {meta['base']} of {target['id']} isn't in storage; taking a full backup")
+            return None
+        return meta, hashes
+
+    def _save_state(self, target: Dict, meta: Dict, hashes: bytes) -> None:
+        PAGE_STATE_DIR.mkdir(exist_ok=True)
+        path = self._state_path(target)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("wb") as f:
+            f.write(json.dumps(meta).encode() + b"\n")
+            f.write(hashes)
+        tmp_path.replace(path)
+
+    def _delta_or_full(self, target: Dict, snapshot: Path, page_size: int) -> Path:
+        """Replace the fresh copy with the pages changed since the last full backup, when that's worth it."""
+        hashes = b"".join(_page_hashes(snapshot, page_size))
+        page_count = len(hashes) // PAGE_DIGEST_SIZE
+        state = self._base_state(target, page_size)
+        if state:
+            meta, base_hashes = state
+            changed = _changed_pages(base_hashes, hashes)
+            if len(changed) <= DELTA_MAX_CHANGED * page_count:
+                delta_file = self._write_delta(target, snapshot, changed, page_size, page_count, meta)
+                snapshot.unlink()
+                meta["deltas"] += 1
+                self._save_state(target, meta, base_hashes)
+                logger.info(f"SQLite delta of {target['id']}: {len(changed)} of {page_count} pages changed since {meta['base']}")
+                return delta_file
+            logger.info(f"{len(changed)} of {page_count} pages of {target['id']} changed; taking a full backup")
+        # compress_backup archives the copy as <name>.zip
+        self._save_state(target, {
+            "base": snapshot.name + ".zip",
+            "digest": hashlib.sha256(hashes).hexdigest(),
+            "page_size": page_size,
+            "deltas": 0,
+        }, hashes)
+        return snapshot
+
+    def _write_delta(self, target: Dict, snapshot: Path, changed: List[int], page_size: int, page_count: int, meta: Dict) -> Path:
+        import sqlite3
+        delta_file = self.get_backup_filename(target, "delta")
+        with closing(sqlite3.connect(delta_file)) as conn, snapshot.open("rb") as f:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value)")
+            conn.execute("CREATE TABLE pages (pgno INTEGER PRIMARY KEY, data BLOB)")
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("base", meta["base"]), ("base_digest", meta["digest"]), ("page_size", page_size), ("page_count", page_count),
+            ])
+
+            def pages():
+                for index in changed:
+                    f.seek(index * page_size)
+                    yield index + 1, f.read(page_size)
+
+            conn.executemany("INSERT INTO pages VALUES (?, ?)", pages())
+            conn.commit()
+        return delta_file
+
+    def delta_base(self, delta_file: Path) -> str:
+        """Archive name of the full backup a delta was taken against."""
+        import sqlite3
+        with closing(sqlite3.connect(f"{delta_file.resolve().as_uri()}?mode=ro", uri=True)) as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'base'").fetchone()[0]
+
+    def apply_delta(self, base_file: Path, delta_file: Path) -> Path:
+        """Rebuild the database image a delta was taken from, on top of its full backup."""
+        import sqlite3
+        with closing(sqlite3.connect(f"{delta_file.resolve().as_uri()}?mode=ro", uri=True)) as conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            page_size = meta["page_size"]
+            if hashlib.sha256(b"".join(_page_hashes(base_file, page_size))).hexdigest() != meta["base_digest"]:
+                raise ValueError(f"{base_file.name} isn't the full backup {delta_file.name} was taken against")
+            image = delta_file.with_suffix(".db")
+            shutil.copyfile(base_file, image)
+            with image.open("r+b") as f:
+                for pgno, data in conn.execute("SELECT pgno, data FROM pages"):
+                    f.seek((pgno - 1) * page_size)
+                    f.write(data)
+                f.truncate(meta["page_count"] * page_size)
+        logger.info(f"Applied {delta_file.name} to {base_file.name}")
+        return image
+
     def restore(self, target: Dict, backup_file: Path) -> None:
         self.ensure_deps(load_requirements())
-        db_config = target["database"]
-        target_path = Path(db_config["path"])
+        self.restore_file(backup_file, Path(target["database"]["path"]))
+
+    def restore_file(self, backup_file: Path, target_path: Path) -> None:
+        import sqlite3
         target_path.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(backup_file, target_path)
+        if target_path.exists():
+            # Through the backup API the live database's locking and WAL apply: open connections wait
+            # for the copy and then see the restored pages, instead of a file replaced under them
+            with closing(sqlite3.connect(backup_file)) as src, closing(sqlite3.connect(target_path, timeout=60)) as dst:
+                src.backup(dst)
+        else:
+            tmp_path = target_path.with_name(f".{target_path.name}.{os.getpid()}.restore")
+            shutil.copyfile(backup_file, tmp_path)
+            os.replace(tmp_path, target_path)
         logger.info(f"SQLite database restored to {target_path}")
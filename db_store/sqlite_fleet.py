@@ -0,0 +1,43 @@
+import glob
+from itertools import takewhile
+from pathlib import Path
+from typing import Dict, List, Tuple
+from db_store.sqlite import SQLiteHandler
+
+SIDECAR_SUFFIXES = ("-wal", "-shm", "-journal")
+
+
+def glob_base(pattern: str) -> Path:
+    """Directory a fleet's pattern is rooted at; archive members are named relative to it."""
+    parts = Path(pattern).parts
+    static = list(takewhile(lambda part: not any(c in part for c in "*?["), parts))
+    if len(static) == len(parts):
+        static = static[:-1]
+    return Path(*static) if static else Path(".")
+
+
+class SQLiteFleetHandler(SQLiteHandler):
+    """Many SQLite databases (one per tenant) matched by the glob in database.path, discovered on
+    every run. operations.fleet packs them into shard archives on a process pool."""
+
+    def discover(self, target: Dict) -> List[Tuple[Path, str, int]]:
+        """(path, archive member name, size) of every database the pattern matches, sorted by name."""
+        pattern = target["database"]["path"]
+        base = glob_base(pattern)
+        files = []
+        for match in glob.glob(pattern, recursive=True):
+            path = Path(match)
+            if path.name.endswith(SIDECAR_SUFFIXES) or not path.is_file():
+                continue
+            files.append((path, path.relative_to(base).as_posix(), path.stat().st_size))
+        return sorted(files, key=lambda entry: entry[1])
+
+    def estimate(self, target: Dict) -> Dict:
+        files = self.discover(target)
+        return {"bytes": sum(size for _, _, size in files), "rows": None, "tables": {name: size for _, name, size in files}}
+
+    def backup(self, target: Dict, plan: Dict = None) -> Path:
+        raise ValueError("SQLite fleets are backed up into shard archives by operations.fleet, not one dump")
+
+    def restore(self, target: Dict, backup_file: Path) -> None:
+        raise ValueError("SQLite fleets are restored from their index by operations.fleet")
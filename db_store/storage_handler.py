@@ -1,11 +1,20 @@
 from abc import abstractmethod
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 from dep_manage.init import load_requirements
 from configs.init import logger
 from dep_manage.init import DEPENDENCY_GROUPS
 import shutil
+from functools import lru_cache
 from db_store.dbms import Handler
+from operations import throttle
+
+
+@lru_cache(maxsize=32)
+def _s3_client(access_key: str, secret_key: str):
+    # Clients are thread-safe and expensive to build; long-running processes reuse them
+    import boto3
+    return boto3.client("s3", aws_access_key_id=access_key, aws_secret_access_key=secret_key)
 
 
 class StorageHandler(Handler):
@@ -17,6 +26,23 @@ class StorageHandler(Handler):
     def retrieve(self, file_path: str, target: Dict, local_path: Path) -> Path:
         pass
 
+    @abstractmethod
+    def list_backups(self, prefix: str, target: Dict) -> List[str]:
+        pass
+
+    @abstractmethod
+    def delete(self, names: List[str], target: Dict) -> None:
+        pass
+
+    @abstractmethod
+    def size(self, name: str, target: Dict) -> int:
+        """Size in bytes of a stored backup; FileNotFoundError if it doesn't exist."""
+        pass
+
+    @abstractmethod
+    def read_range(self, name: str, target: Dict, start: int = 0, length: int = None) -> bytes:
+        pass
+
 class LocalStorageHandler(StorageHandler):
     required_deps = DEPENDENCY_GROUPS["storage"]["local"]
 
@@ -34,21 +60,44 @@ class LocalStorageHandler(StorageHandler):
         logger.info(f"Backup retrieved locally: {dest_path}")
         return dest_path
 
+    def list_backups(self, prefix: str, target: Dict) -> List[str]:
+        backup_dir = Path(target["backup"]["local_path"])
+        if not backup_dir.is_dir():
+            return []
+        return [p.name for p in backup_dir.glob(f"{prefix}*") if p.is_file()]
+
+    def delete(self, names: List[str], target: Dict) -> None:
+        backup_dir = Path(target["backup"]["local_path"])
+        for name in names:
+            (backup_dir / name).unlink(missing_ok=True)
+        logger.info(f"Deleted {len(names)} backups from {backup_dir}")
+
+    def size(self, name: str, target: Dict) -> int:
+        return (Path(target["backup"]["local_path"]) / name).stat().st_size
+
+    def read_range(self, name: str, target: Dict, start: int = 0, length: int = None) -> bytes:
+        with (Path(target["backup"]["local_path"]) / name).open("rb") as f:
+            f.seek(start)
+            return f.read(-1 if length is None else length)
+
 class S3StorageHandler(StorageHandler):
     required_deps = DEPENDENCY_GROUPS["storage"]["s3"]
+    delete_batch_size = 1000  # S3 DeleteObjects limit
+
+    def _client(self, s3_config: Dict):
+        return _s3_client(s3_config["access_key"], s3_config["secret_key"])
 
     def store(self, file_path: Path, target: Dict) -> None:
         self.ensure_deps(load_requirements())
-        import boto3
         from botocore.exceptions import ClientError
         s3_config = target["backup"]["cloud"]["s3"]
         try:
-            s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=s3_config["access_key"],
-                aws_secret_access_key=s3_config["secret_key"],
-            )
-            s3_client.upload_file(str(file_path), s3_config["bucket"], file_path.name)
+            s3_client = self._client(s3_config)
+            callback = throttle.upload_callback(target, f"{target['id']} upload", file_path.stat().st_size)
+            try:
+                s3_client.upload_file(str(file_path), s3_config["bucket"], file_path.name, Callback=callback)
+            finally:
+                callback.progress.close()
             logger.info(f"Backup uploaded to S3: s3://{s3_config['bucket']}/{file_path.name}")
         except ClientError as e:
             logger.error(f"S3 upload failed: {e}")
@@ -59,20 +108,69 @@ class S3StorageHandler(StorageHandler):
 
     def retrieve(self, file_path: str, target: Dict, local_path: Path) -> Path:
         self.ensure_deps(load_requirements())
-        import boto3
         from botocore.exceptions import ClientError
         s3_config = target["backup"]["cloud"]["s3"]
         file_name = Path(file_path).name
         dest_path = local_path / file_name
         try:
-            s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=s3_config["access_key"],
-                aws_secret_access_key=s3_config["secret_key"],
-            )
+            s3_client = self._client(s3_config)
             s3_client.download_file(s3_config["bucket"], file_name, str(dest_path))
             logger.info(f"Backup retrieved from S3: {dest_path}")
             return dest_path
         except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(f"Backup not found: s3://{s3_config['bucket']}/{file_name}")
             logger.error(f"S3 download failed: {e}")
             raise
+
+    def size(self, name: str, target: Dict) -> int:
+        self.ensure_deps(load_requirements())
+        from botocore.exceptions import ClientError
+        s3_config = target["backup"]["cloud"]["s3"]
+        try:
+            return self._client(s3_config).head_object(Bucket=s3_config["bucket"], Key=name)["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(f"Backup not found: s3://{s3_config['bucket']}/{name}")
+            raise
+
+    def read_range(self, name: str, target: Dict, start: int = 0, length: int = None) -> bytes:
+        self.ensure_deps(load_requirements())
+        from botocore.exceptions import ClientError
+        s3_config = target["backup"]["cloud"]["s3"]
+        byte_range = f"bytes={start}-" + ("" if length is None else str(start + length - 1))
+        try:
+            response = self._client(s3_config).get_object(Bucket=s3_config["bucket"], Key=name, Range=byte_range)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(f"Backup not found: s3://{s3_config['bucket']}/{name}")
+            raise
+        return response["Body"].read()
+
+    def list_backups(self, prefix: str, target: Dict) -> List[str]:
+        self.ensure_deps(load_requirements())
+        s3_config = target["backup"]["cloud"]["s3"]
+        paginator = self._client(s3_config).get_paginator("list_objects_v2")
+        names = []
+        for page in paginator.paginate(Bucket=s3_config["bucket"], Prefix=prefix):
+            names.extend(obj["Key"] for obj in page.get("Contents", []))
+        return names
+
+    def delete(self, names: List[str], target: Dict) -> None:
+        self.ensure_deps(load_requirements())
+        from botocore.exceptions import ClientError
+        s3_config = target["backup"]["cloud"]["s3"]
+        s3_client = self._client(s3_config)
+        try:
+            for i in range(0, len(names), self.delete_batch_size):
+                batch = names[i:i + self.delete_batch_size]
+                response = s3_client.delete_objects(
+                    Bucket=s3_config["bucket"],
+                    Delete={"Objects": [{"Key": name} for name in batch], "Quiet": True},
+                )
+                for error in response.get("Errors", []):
+                    logger.error(f"S3 delete failed for {error['Key']}: {error.get('Message')}")
+                logger.info(f"Deleted {len(batch) - len(response.get('Errors', []))} backups from s3://{s3_config['bucket']}")
+        except ClientError as e:
+            logger.error(f"S3 delete failed: {e}")
+            raise
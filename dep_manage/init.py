@@ -1,18 +1,33 @@
 from pathlib import Path
+import hashlib
 import importlib
-import subprocess
-from typing import Dict
+import importlib.util
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Set
 import sys
-from configs.init import logger
+from configs.init import CONFIG_DIR, logger
 
 REQUIREMENTS_FILE = Path(__file__).parent.parent / "requirements.txt"
+DEPS_CACHE_FILE = CONFIG_DIR / "deps_cache.json"
 
 # Dependencies
 DEPENDENCY_GROUPS = {
     "database": {"postgresql": ["psycopg[binary]"], "mysql": ["mysql-connector-python"], "mongodb": ["pymongo"], "sqlite": []},
     "storage": {"local": [], "s3": ["boto3"]},
+    "format": {"sql": [], "parquet": ["pyarrow"], "arrow": ["pyarrow"]},
 }
 
+# Distribution name -> importable module, where they differ
+IMPORT_NAMES = {"psycopg[binary]": "psycopg", "mysql-connector-python": "mysql.connector"}
+
+_satisfied: Set[str] = None
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
 def load_requirements() -> Dict[str, str]:
     if not REQUIREMENTS_FILE.exists():
         raise FileNotFoundError(f"requirements.txt not found at {REQUIREMENTS_FILE}")
@@ -25,11 +40,44 @@ def load_requirements() -> Dict[str, str]:
                 requirements[package] = line
     return requirements
 
-def install_dependencies(dep_list: list, requirements: Dict[str, str]) -> None:
-    for dep in dep_list:
-        full_dep = requirements.get(dep, dep)
+def _cache_key() -> str:
+    digest = hashlib.sha256(f"{sys.executable}\0{sys.version}\0".encode())
+    digest.update(REQUIREMENTS_FILE.read_bytes())
+    return digest.hexdigest()
+
+def _load_satisfied() -> Set[str]:
+    """Dependencies already verified for this interpreter and requirements.txt, persisted across runs."""
+    global _satisfied
+    if _satisfied is None:
+        _satisfied = set()
         try:
-            importlib.import_module(dep.replace("-", "_"))
-        except ImportError:
-            logger.info(f"Installing {full_dep}...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", full_dep])
\ No newline at end of file
+            cache = json.loads(DEPS_CACHE_FILE.read_text())
+            if cache.get("key") == _cache_key():
+                _satisfied = set(cache.get("satisfied", []))
+        except (OSError, ValueError):
+            pass
+    return _satisfied
+
+def _is_importable(module: str) -> bool:
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ModuleNotFoundError:
+        return False
+
+def install_dependencies(dep_list: list, requirements: Dict[str, str]) -> None:
+    with _lock:
+        satisfied = _load_satisfied()
+        missing = [dep for dep in dep_list if dep not in satisfied]
+        if not missing:
+            return
+        for dep in missing:
+            full_dep = requirements.get(dep, dep)
+            if not _is_importable(IMPORT_NAMES.get(dep, dep.replace("-", "_"))):
+                import subprocess
+                logger.info(f"Installing {full_dep}...")
+                subprocess.check_call([sys.executable, "-m", "pip", "install", full_dep])
+                importlib.invalidate_caches()
+            satisfied.add(dep)
+        tmp_file = DEPS_CACHE_FILE.with_suffix(f".{os.getpid()}.tmp")
+        tmp_file.write_text(json.dumps({"key": _cache_key(), "satisfied": sorted(satisfied)}))
+        tmp_file.replace(DEPS_CACHE_FILE)
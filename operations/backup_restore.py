@@ -1,28 +1,105 @@
+import json
 import os
-import tempfile
-import zipfile
 from glob import glob
 from pathlib import Path
-from typing import Dict, Optional
-from db_store.dbms_handler import get_dbms_handler, get_storage_handler
+from typing import Dict, List, Optional
 from configs.init import logger
 from configs.init import validate_config
+from operations import metrics, throttle
+
+# zipfile, hashlib, the handlers and the planner are imported where they're used, so CLI
+# startup (list, daemon requests, queueing backups) doesn't pay for them
+
+COPY_CHUNK = 1024 * 1024
+
+# backup.compression -> zip method; archives stay .zip, so restore reads any of them
+COMPRESSION_CODECS = {
+    "stored": "ZIP_STORED",
+    "deflate": "ZIP_DEFLATED",
+    "bzip2": "ZIP_BZIP2",
+    "lzma": "ZIP_LZMA",
+}
 
 
 def find_latest_backup(target: Dict, local_path: Path) -> Optional[Path]:
-    pattern = f"{target['database']['type']}_{target['id']}_{target['database']['name']}*.zip"
+    # A fleet run is restored from its index, which names the shard archives
+    suffix = "index.json" if target["database"]["type"] == "sqlite_fleet" else "zip"
+    pattern = f"{target['database']['type']}_{target['id']}_{target['database']['name']}*.{suffix}"
     files = sorted(glob(str(local_path / pattern)), key=os.path.getmtime, reverse=True)
     return Path(files[0]) if files else None
 
-def perform_backup(target: Dict) -> None:
+def zip_method(codec: str) -> int:
+    import zipfile
+    return getattr(zipfile, COMPRESSION_CODECS[codec])
+
+def attach_profiler(run: metrics.RunMetrics) -> None:
+    from operations.profiling import RunProfiler
+    run.profiler = RunProfiler(run)
+
+def perform_backup(target: Dict, profile: bool = False) -> None:
     validate_config(target)
+    if target["database"]["type"] == "sqlite_fleet":
+        from operations.fleet import perform_fleet_backup
+        perform_fleet_backup(target)
+        prune_after_backup(target)
+        return
+    with metrics.track("backup", target) as run:
+        if profile:
+            attach_profiler(run)
+        dumps = dump_target(target, run)
+        archives = compress_dumps(target, dumps, run.plan)
+        upload_archives(target, archives)
+    prune_after_backup(target)
+
+def dump_target(target: Dict, run: metrics.RunMetrics) -> List[Path]:
+    """Plan and dump; returns the dump files, partitions first and the main dump last."""
+    from db_store.dbms_handler import get_dbms_handler
+    from operations.planner import plan_backup
     dbms_handler = get_dbms_handler(target["database"]["type"])
-    backup_file = dbms_handler.backup(target)
-    backup_file = compress_backup(backup_file)
+    run.handler = type(dbms_handler).__name__
+    with metrics.phase("plan"):
+        run.plan = plan_backup(target, dbms_handler)
+    plan = run.plan or {}
+    # ETA until the handler knows better: the planned dump size, else the last successful dump's
+    expected = plan.get("dump_bytes") or metrics.previous_bytes("backup", target["id"], "dump")
+    with metrics.phase("dump", handler=run.handler) as p, throttle.stream(f"{target['id']} dump", target, expected):
+        backup_file = dbms_handler.backup(target, run.plan)
+        dumps = dbms_handler.data_files + [backup_file]
+        p.add(bytes=sum(dump.stat().st_size for dump in dumps))
+    return dumps
+
+def compress_dumps(target: Dict, dumps: List[Path], plan: Optional[Dict]) -> List[Path]:
+    from db_store.columnar import COLUMNAR_FORMATS
+    with metrics.phase("compress") as p:
+        p.add(bytes=sum(dump.stat().st_size for dump in dumps))
+        codec = target["backup"].get("compression", "deflate")
+        level = (plan or {}).get("compression_level")
+        # Parquet/Arrow files are zstd-compressed inside already; zip only stores them
+        data_archives = [compress_backup(dump, "stored" if dump.suffix in COLUMNAR_FORMATS.values() else codec, level) for dump in dumps[:-1]]
+        # The main archive's manifest names its data archives, so restore loads exactly those
+        extra = {"data_files": [archive.name for archive in data_archives]} if data_archives else None
+        return data_archives + [compress_backup(dumps[-1], codec, level, extra)]
+
+def upload_archives(target: Dict, archives: List[Path]) -> None:
+    from db_store.dbms_handler import get_storage_handler
+    from operations.checksum import manifest_path
     storage_handler = get_storage_handler(target["backup"]["cloud"]["type"])
-    storage_handler.store(backup_file, target)
+    with metrics.phase("upload") as p:
+        # Partitions first: the main archive's manifest, stored last, marks a complete backup
+        for archive in archives:
+            storage_handler.store(archive, target)
+            storage_handler.store(manifest_path(archive), target)
+            p.add(bytes=archive.stat().st_size)
 
-def perform_restore(target: Dict, backup_file: str, force: bool = False) -> None:
+def prune_after_backup(target: Dict) -> None:
+    if target["backup"].get("retention"):
+        from operations.retention import prune_backups
+        try:
+            prune_backups(target)
+        except Exception as e:
+            logger.error(f"Post-backup prune failed for {target['id']}: {e}")
+
+def perform_restore(target: Dict, backup_file: str, force: bool = False, profile: bool = False, members: List[str] = None) -> None:
     validate_config(target)
     db_type = target["database"]["type"]
     expected_ext = ".db" if db_type == "sqlite" else ".sql" if db_type in ["postgresql", "mysql"] else ".archive"
@@ -31,25 +108,93 @@ def perform_restore(target: Dict, backup_file: str, force: bool = False) -> None
         if confirm != "y":
             logger.info("Restore cancelled.")
             return
-    with tempfile.TemporaryDirectory() as tmp_dir:
+    if db_type == "sqlite_fleet":
+        from operations.fleet import perform_fleet_restore
+        perform_fleet_restore(target, backup_file, members)
+        return
+    import tempfile
+    from db_store.dbms_handler import get_dbms_handler, get_storage_handler
+    with metrics.track("restore", target) as run, tempfile.TemporaryDirectory() as tmp_dir:
+        if profile:
+            attach_profiler(run)
         tmp_path = Path(tmp_dir)
         storage_handler = get_storage_handler(target["backup"]["cloud"]["type"])
-        local_backup = storage_handler.retrieve(backup_file, target, tmp_path)
-        decompressed_file = decompress_backup(local_backup, tmp_path)
-        if decompressed_file.suffix != expected_ext:
+        with metrics.phase("download") as p:
+            local_backup = storage_handler.retrieve(backup_file, target, tmp_path)
+            p.add(bytes=local_backup.stat().st_size)
+        with metrics.phase("decompress") as p:
+            decompressed_file = decompress_backup(local_backup, tmp_path)
+            p.add(bytes=decompressed_file.stat().st_size)
+        if decompressed_file.suffix != expected_ext and not (db_type == "sqlite" and decompressed_file.suffix == ".delta"):
             raise ValueError(f"Invalid backup file for {db_type}: expected {expected_ext}, got {decompressed_file.suffix}")
         dbms_handler = get_dbms_handler(db_type)
-        dbms_handler.restore(target, decompressed_file)
+        run.handler = type(dbms_handler).__name__
+        if decompressed_file.suffix == ".delta":
+            # A delta holds only the pages changed since a full backup; fetch that one and rebuild the image
+            base = dbms_handler.delta_base(decompressed_file)
+            with metrics.phase("download", archive=base) as p:
+                base_backup = storage_handler.retrieve(str(Path(backup_file).with_name(base)), target, tmp_path)
+                p.add(bytes=base_backup.stat().st_size)
+            with metrics.phase("decompress", archive=base) as p:
+                base_file = decompress_backup(base_backup, tmp_path)
+                p.add(bytes=base_file.stat().st_size)
+            with metrics.phase("apply") as p:
+                decompressed_file = dbms_handler.apply_delta(base_file, decompressed_file)
+                p.add(bytes=decompressed_file.stat().st_size)
+        # Looked up before the database is touched; read from the manifest next to backup_file
+        data_files = find_data_files(storage_handler, target, backup_file, tmp_path) if dbms_handler.writes_data_files else []
+        with metrics.phase("load", handler=run.handler) as p:
+            dbms_handler.restore(target, decompressed_file)
+            p.add(bytes=decompressed_file.stat().st_size)
+        for name in data_files:
+            with metrics.phase("download", archive=name) as p:
+                data_backup = storage_handler.retrieve(str(Path(backup_file).with_name(name)), target, tmp_path)
+                p.add(bytes=data_backup.stat().st_size)
+            with metrics.phase("decompress", archive=name) as p:
+                data_file = decompress_backup(data_backup, tmp_path)
+                p.add(bytes=data_file.stat().st_size)
+            with metrics.phase("load", handler=run.handler, archive=name) as p:
+                dbms_handler.restore_data_file(target, data_file)
+                p.add(bytes=data_file.stat().st_size)
+            data_backup.unlink()
+            data_file.unlink()
+        with metrics.phase("load", handler=run.handler, section="post-data"):
+            dbms_handler.finish_restore(target, decompressed_file)
+
+def find_data_files(storage_handler, target: Dict, backup_file: str, tmp_path: Path) -> List[str]:
+    """Names of the data archives (partition ranges, columnar table data) stored with a backup, from its manifest."""
+    from operations.checksum import MANIFEST_SUFFIX
+    try:
+        manifest_file = storage_handler.retrieve(backup_file + MANIFEST_SUFFIX, target, tmp_path)
+    except FileNotFoundError:
+        return []  # made before manifests, or stored without one
+    names = json.loads(manifest_file.read_text())["content"].get("data_files", [])
+    manifest_file.unlink()
+    return names
 
-def compress_backup(file_path: Path) -> Path:
+def compress_backup(file_path: Path, codec: str = "deflate", level: int = None, extra: Dict = None) -> Path:
+    """Zip file_path, hashing the dump and the archive in the same pass, and write the archive's manifest."""
+    import hashlib
+    import zipfile
+    from operations.checksum import ChecksumWriter, write_manifest
     compressed_file = file_path.with_suffix(file_path.suffix + ".zip")
-    with zipfile.ZipFile(compressed_file, "w", zipfile.ZIP_DEFLATED) as zf:
-        zf.write(file_path, file_path.name)
+    size = file_path.stat().st_size
+    content = hashlib.sha256()
+    with compressed_file.open("wb") as raw:
+        out = ChecksumWriter(raw)
+        with zipfile.ZipFile(out, "w", zip_method(codec), compresslevel=level) as zf, \
+                zf.open(file_path.name, "w", force_zip64=size * 1.05 > zipfile.ZIP64_LIMIT) as member, \
+                file_path.open("rb") as src:
+            while chunk := src.read(COPY_CHUNK):
+                content.update(chunk)
+                member.write(chunk)
+    write_manifest(compressed_file, out.finish(), {"name": file_path.name, "size": size, "sha256": content.hexdigest(), **(extra or {})}, codec)
     file_path.unlink()
     logger.info(f"Backup compressed: {compressed_file}")
     return compressed_file
 
 def decompress_backup(compressed_file: Path, extract_path: Path) -> Path:
+    import zipfile
     with zipfile.ZipFile(compressed_file, "r") as zf:
         zf.extractall(extract_path)
     extracted_file = extract_path / compressed_file.name.replace(".zip", "")
@@ -0,0 +1,44 @@
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+from configs.init import logger
+from operations.backup_restore import perform_backup
+
+
+def host_key(target: Dict) -> str:
+    """Key used to cap concurrent dumps against the same database server."""
+    db_config = target["database"]
+    if db_config["type"] in ["sqlite", "sqlite_fleet"]:
+        return "sqlite:local"
+    return f"{db_config['host']}:{db_config['port']}"
+
+def run_backups(targets: List[Dict], jobs: int = 4, per_host: int = 1, profile: bool = False,
+                stage_jobs: Dict[str, int] = None, queue_size: int = None, notify: Callable = None) -> Tuple[List[str], Dict[str, str]]:
+    """Back up targets concurrently; returns (succeeded ids, {failed id: error}).
+
+    Targets go through operations.pipeline, where jobs is the number of concurrent dumps and
+    stage_jobs sets the compress and upload workers. notify(target_id, state, error=None) is
+    called as each target starts running and when it succeeds or fails.
+    """
+    notify = notify or (lambda target_id, state, error=None: None)
+    if not profile:
+        from operations.pipeline import DEFAULT_QUEUE_SIZE, BackupPipeline
+        workers = {"dump": jobs, "compress": min(jobs, os.cpu_count() or 1), "upload": jobs, **(stage_jobs or {})}
+        return BackupPipeline(workers, per_host, queue_size or DEFAULT_QUEUE_SIZE, notify).run(targets)
+    # Only one cProfile profiler can be active per process, and concurrent runs would skew each
+    # other's timings, so profiled backups run whole and one at a time
+    succeeded, failed = [], {}
+    for target in targets:
+        logger.info(f"Backing up target: {target['id']}")
+        started = time.monotonic()
+        notify(target["id"], "running")
+        try:
+            perform_backup(target, profile)
+            succeeded.append(target["id"])
+            logger.info(f"Backup of {target['id']} finished in {time.monotonic() - started:.1f}s")
+            notify(target["id"], "succeeded")
+        except Exception as e:
+            failed[target["id"]] = str(e)
+            logger.error(f"Backup of {target['id']} failed: {e}")
+            notify(target["id"], "failed", str(e))
+    return succeeded, failed
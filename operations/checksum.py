@@ -0,0 +1,70 @@
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+CHUNK_SIZE = 8 * 2**20  # granularity of archive chunk hashes, and of parallel/range reads in verify
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+class ChecksumWriter:
+    """Write-through file wrapper that hashes the stream as it's written: one sha256 over
+    everything plus one per CHUNK_SIZE chunk.
+
+    It has no seek(), so zipfile writes sequentially (using data descriptors) instead of going
+    back to patch headers, and the hashes match the bytes that end up on disk.
+    """
+
+    def __init__(self, fp, chunk_size: int = CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.chunk = hashlib.sha256()
+        self.chunk_fill = 0
+        self.chunks: List[str] = []
+
+    def write(self, data) -> int:
+        self.fp.write(data)
+        self.digest.update(data)
+        view = memoryview(data)
+        while view:
+            take = min(len(view), self.chunk_size - self.chunk_fill)
+            self.chunk.update(view[:take])
+            self.chunk_fill += take
+            view = view[take:]
+            if self.chunk_fill == self.chunk_size:
+                self.chunks.append(self.chunk.hexdigest())
+                self.chunk = hashlib.sha256()
+                self.chunk_fill = 0
+        self.size += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.size
+
+    def flush(self) -> None:
+        self.fp.flush()
+
+    def finish(self) -> Dict:
+        if self.chunk_fill:
+            self.chunks.append(self.chunk.hexdigest())
+            self.chunk_fill = 0
+        return {"size": self.size, "sha256": self.digest.hexdigest(), "chunk_size": self.chunk_size, "chunks": self.chunks}
+
+
+def manifest_path(archive: Path) -> Path:
+    return archive.with_name(archive.name + MANIFEST_SUFFIX)
+
+def write_manifest(archive: Path, archive_sums: Dict, content: Dict, codec: str) -> Path:
+    """Store the checksums next to the archive; verify reads them back from wherever the archive went."""
+    path = manifest_path(archive)
+    path.write_text(json.dumps({
+        "archive": archive.name,
+        "created_at": datetime.now().isoformat(),
+        "codec": codec,
+        **archive_sums,
+        "content": content,
+    }, indent=1))
+    return path
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+from configs.init import logger
+from db_store.dbms_handler import get_dbms_handler, get_storage_handler
+from dep_manage.init import load_requirements
+from operations import metrics, throttle
+from operations.backup_restore import COPY_CHUNK, zip_method
+from operations.checksum import ChecksumWriter, manifest_path, write_manifest
+
+DEFAULT_SHARD_BYTES = 2**30  # source bytes per shard archive
+INDEX_SUFFIX = ".index.json"
+
+
+def plan_shards(files: List[Tuple[Path, str, int]], shard_bytes: int, workers: int) -> List[List[Tuple[Path, str, int]]]:
+    """Split the (name-sorted) files into contiguous shards of similar size: enough to stay under
+    shard_bytes each, and at least one per worker."""
+    total = sum(size for _, _, size in files)
+    count = max(1, math.ceil(total / shard_bytes), min(workers, len(files)))
+    per_shard = max(1, total / count)
+    shards, current, cumulative = [], [], 0
+    for entry in files:
+        current.append(entry)
+        cumulative += entry[2]
+        if cumulative >= per_shard * (len(shards) + 1) and len(shards) < count - 1:
+            shards.append(current)
+            current = []
+    if current:
+        shards.append(current)
+    return shards
+
+def pack_shard(target: Dict, shard_file: str, files: List[Tuple[str, str]]) -> Dict:
+    """Worker process: copy each database with the backup API and stream it into one shard archive."""
+    handler = get_dbms_handler("sqlite_fleet")
+    codec = target["backup"].get("compression", "deflate")
+    shard_file = Path(shard_file)
+    entries, failed = [], []
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory(dir=shard_file.parent) as tmp_dir, shard_file.open("wb") as raw:
+        out = ChecksumWriter(raw)
+        copy = Path(tmp_dir) / "copy.db"
+        with zipfile.ZipFile(out, "w", zip_method(codec), compresslevel=target["backup"].get("compression_level")) as zf:
+            for source, name in files:
+                if not os.path.exists(source):
+                    logger.info(f"{source} disappeared since discovery, skipping")
+                    continue
+                try:
+                    with throttle.stream(f"{target['id']} {name}", target, unit=""):
+                        handler.copy_stepped(target, source, copy)
+                except Exception as e:
+                    failed.append({"path": name, "source": source, "error": str(e)})
+                    copy.unlink(missing_ok=True)
+                    continue
+                size = copy.stat().st_size
+                digest = hashlib.sha256()
+                with zf.open(name, "w", force_zip64=size * 1.05 > zipfile.ZIP64_LIMIT) as member, copy.open("rb") as src:
+                    while chunk := src.read(COPY_CHUNK):
+                        digest.update(chunk)
+                        member.write(chunk)
+                copy.unlink()
+                entries.append({"path": name, "source": str(Path(source).resolve()), "size": size, "sha256": digest.hexdigest()})
+    sums = out.finish()
+    nbytes = sum(entry["size"] for entry in entries)
+    write_manifest(shard_file, sums, {"name": shard_file.name, "files": len(entries), "size": nbytes}, codec)
+    return {"shard": shard_file.name, "files": entries, "failed": failed, "bytes": nbytes,
+            "archive_bytes": sums["size"], "seconds": time.monotonic() - started}
+
+def write_index(index_file: Path, index: Dict) -> None:
+    with index_file.open("wb") as raw:
+        out = ChecksumWriter(raw)
+        out.write(json.dumps(index, indent=1).encode())
+    write_manifest(index_file, out.finish(), {"name": index_file.name, "files": len(index["files"])}, "none")
+
+def perform_fleet_backup(target: Dict) -> None:
+    """Back up every database of a fleet target into a few shard archives plus an index of where
+    each database went. The index is stored last, so a stored index means a complete run."""
+    handler = get_dbms_handler("sqlite_fleet")
+    handler.ensure_deps(load_requirements())
+    with metrics.track("backup", target) as run:
+        run.handler = type(handler).__name__
+        with metrics.phase("discover") as p:
+            files = handler.discover(target)
+            p.add(bytes=sum(size for _, _, size in files))
+        if not files:
+            raise ValueError(f"No databases match {target['database']['path']}")
+        workers = target["backup"].get("max_workers", os.cpu_count() or 1)
+        shards = plan_shards(files, target["backup"].get("shard_bytes", DEFAULT_SHARD_BYTES), workers)
+        stem = handler.get_backup_filename(target, "index")
+        stem = stem.with_name(stem.stem)
+        processes = min(workers, len(shards))
+        logger.info(f"Fleet {target['id']}: {len(files)} databases in {len(shards)} shard(s) on {processes} worker(s)")
+        storage = get_storage_handler(target["backup"]["cloud"]["type"])
+        index = {"target": target["id"], "pattern": target["database"]["path"], "created_at": datetime.now().isoformat(),
+                 "shards": [], "files": [], "failed": []}
+        # Spawned workers start unthrottled: each gets an even share of the read limits, so together they stay within them
+        read_share = math.ceil(throttle.global_rate("read") / processes)
+        target_rate = throttle.parse_rate(target["backup"].get("read_rate", 0))
+        worker_target = dict(target, backup=dict(target["backup"], read_rate=math.ceil(target_rate / processes)))
+        # spawn, not fork: the daemon runs backups on threads, and forking those can copy held locks
+        with metrics.phase("dump", handler=run.handler) as p, ProcessPoolExecutor(
+                max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                initializer=throttle.configure, initargs=(read_share,)) as executor:
+            futures = [
+                executor.submit(pack_shard, worker_target, str(stem.with_name(f"{stem.name}.shard-{i:04d}.zip")),
+                                [(str(path), name) for path, name, _ in shard])
+                for i, shard in enumerate(shards, 1)
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                p.add(bytes=result["bytes"])
+                shard_file = stem.parent / result["shard"]
+                # Upload while the other shards are still being packed
+                with metrics.phase("upload", archive=result["shard"]) as u:
+                    storage.store(shard_file, target)
+                    storage.store(manifest_path(shard_file), target)
+                    u.add(bytes=result["archive_bytes"])
+                index["shards"].append(result["shard"])
+                index["files"].extend(dict(entry, shard=result["shard"]) for entry in result["files"])
+                index["failed"].extend(result["failed"])
+                logger.info(f"Packed {result['shard']}: {len(result['files'])} databases in {result['seconds']:.1f}s")
+        index["shards"].sort()
+        index["files"].sort(key=lambda entry: entry["path"])
+        index_file = stem.with_name(stem.name + INDEX_SUFFIX)
+        write_index(index_file, index)
+        with metrics.phase("upload", archive=index_file.name) as p:
+            storage.store(index_file, target)
+            storage.store(manifest_path(index_file), target)
+            p.add(bytes=index_file.stat().st_size)
+        if index["failed"]:
+            first = index["failed"][0]
+            raise ValueError(f"{len(index['failed'])} of {len(files)} databases failed (first: {first['path']}: {first['error']})")
+
+def perform_fleet_restore(target: Dict, index_name: str, members: List[str] = None) -> None:
+    """Restore the fleet databases listed in an index (all, or just members) to their original paths."""
+    handler = get_dbms_handler("sqlite_fleet")
+    with metrics.track("restore", target) as run, tempfile.TemporaryDirectory() as tmp_dir:
+        run.handler = type(handler).__name__
+        tmp_path = Path(tmp_dir)
+        storage = get_storage_handler(target["backup"]["cloud"]["type"])
+        with metrics.phase("download", archive=Path(index_name).name):
+            index = json.loads(storage.retrieve(index_name, target, tmp_path).read_text())
+        entries = [entry for entry in index["files"] if not members or entry["path"] in members]
+        missing = set(members or []) - {entry["path"] for entry in entries}
+        if missing:
+            raise ValueError(f"Not in {Path(index_name).name}: {', '.join(sorted(missing))}")
+        by_shard = defaultdict(list)
+        for entry in entries:
+            by_shard[entry["shard"]].append(entry)
+        for shard, shard_entries in sorted(by_shard.items()):
+            with metrics.phase("download", archive=shard) as p:
+                shard_file = storage.retrieve(str(Path(index_name).with_name(shard)), target, tmp_path)
+                p.add(bytes=shard_file.stat().st_size)
+            with zipfile.ZipFile(shard_file) as zf:
+                for entry in shard_entries:
+                    with metrics.phase("load", database=entry["path"]) as p:
+                        extracted = Path(zf.extract(entry["path"], tmp_path / "files"))
+                        if _sha256(extracted) != entry["sha256"]:
+                            raise ValueError(f"{entry['path']} in {shard} doesn't match the index's sha256")
+                        handler.restore_file(extracted, Path(entry["source"]))
+                        p.add(bytes=entry["size"])
+                        extracted.unlink()
+            shard_file.unlink()
+        logger.info(f"Restored {len(entries)} fleet databases of {target['id']} from {Path(index_name).name}")
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(COPY_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,283 @@
+import fcntl
+import itertools
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from configs.init import CONFIG_DIR, logger
+
+METRICS_FILE = Path(os.environ.get("DB_BACKUP_METRICS_FILE", CONFIG_DIR / "metrics.jsonl"))
+# Point this into node_exporter's --collector.textfile.directory
+PROM_FILE = Path(os.environ.get("DB_BACKUP_PROM_FILE", CONFIG_DIR / "db_backup.prom"))
+
+HISTORY_TAIL = 1024 * 1024  # bytes of METRICS_FILE searched for a target's previous run
+# Past this size METRICS_FILE is renamed to METRICS_FILE.1 (replacing the one before) and started afresh
+METRICS_MAX_BYTES = int(os.environ.get("DB_BACKUP_METRICS_MAX_BYTES", 64 * 2**20))
+ROTATED_METRICS_FILE = METRICS_FILE.with_name(METRICS_FILE.name + ".1")
+
+_local = threading.local()
+_write_lock = threading.Lock()
+active_runs: Dict[tuple, "RunMetrics"] = {}
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is the process-wide high-water mark, reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Phase:
+    def __init__(self, name: str, labels: Dict):
+        self.name = name
+        self.labels = labels
+        self.bytes = 0
+        self.rows = 0
+        self.docs = 0
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def add(self, bytes: int = 0, rows: int = 0, docs: int = 0) -> None:
+        self.bytes += bytes
+        self.rows += rows
+        self.docs += docs
+
+    def record(self) -> Dict:
+        items = self.rows or self.docs
+        return {
+            "phase": self.name,
+            **self.labels,
+            "duration": round(self.duration, 6),
+            "bytes": self.bytes,
+            "rows": self.rows,
+            "docs": self.docs,
+            "items_per_sec": round(items / self.duration, 1) if items and self.duration else 0.0,
+            "bytes_per_sec": round(self.bytes / self.duration, 1) if self.bytes and self.duration else 0.0,
+        }
+
+
+class RunMetrics:
+    """Phase timings and volumes for one backup or restore of one target."""
+
+    def __init__(self, operation: str, target: Dict):
+        self.operation = operation
+        self.target = target
+        self.handler = None
+        self.plan = None
+        self.phases: List[Phase] = []
+        self.current: Optional[Phase] = None
+        self.profiler = None  # operations.profiling.RunProfiler when --profile is given
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, **labels):
+        phase = Phase(name, labels)
+        parent, self.current = self.current, phase
+        profiled = self.profiler is not None and parent is None
+        if profiled:
+            self.profiler.enter(phase)
+        try:
+            yield phase
+        finally:
+            phase.duration = time.perf_counter() - phase.started
+            if profiled:
+                self.profiler.exit(phase)
+            self.current = parent
+            self.phases.append(phase)
+
+    def completed(self, phase: Phase) -> None:
+        """Add a phase timed in another thread, e.g. one table of a parallel dump."""
+        with self.lock:
+            self.phases.append(phase)
+
+    def summary(self, status: str, error: str = None) -> Dict:
+        return {
+            "timestamp": self.started_at,
+            "operation": self.operation,
+            "target": self.target["id"],
+            "db_type": self.target["database"]["type"],
+            "handler": self.handler,
+            "plan": self.plan,
+            "status": status,
+            "error": error,
+            "duration": round(time.perf_counter() - self.started, 6),
+            # The whole process's high-water mark so far, including concurrent runs, not this run's own
+            "process_peak_rss": peak_rss_bytes(),
+            "phases": [p.record() for p in self.phases],
+        }
+
+
+class _NullPhase(Phase):
+    def add(self, bytes: int = 0, rows: int = 0, docs: int = 0) -> None:
+        pass
+
+
+def current() -> Optional[RunMetrics]:
+    return getattr(_local, "run", None)
+
+@contextmanager
+def phase(name: str, **labels):
+    """Time a phase of the current run; a no-op when called outside track()."""
+    run = current()
+    if run is None:
+        yield _NullPhase(name, labels)
+        return
+    with run.phase(name, **labels) as p:
+        yield p
+
+def completed(phase: Phase) -> None:
+    run = current()
+    if run is not None:
+        run.completed(phase)
+
+def add(bytes: int = 0, rows: int = 0, docs: int = 0) -> None:
+    """Count work against the innermost open phase of the current run."""
+    run = current()
+    if run is not None and run.current is not None:
+        run.current.add(bytes, rows, docs)
+
+def start(operation: str, target: Dict) -> RunMetrics:
+    """Begin a run that isn't bound to one thread's block, e.g. one passing through pipeline stages."""
+    run = RunMetrics(operation, target)
+    active_runs[(operation, target["id"])] = run
+    return run
+
+def finish(run: RunMetrics, status: str, error: str = None) -> None:
+    active_runs.pop((run.operation, run.target["id"]), None)
+    if run.profiler:
+        run.profiler.finish(status)
+    try:
+        write_metrics(run.summary(status, error))
+    except OSError as e:
+        logger.error(f"Failed to write metrics: {e}")
+
+@contextmanager
+def profiled(run: Optional[RunMetrics]):
+    """Include this worker thread in run's profile, when the run is being profiled."""
+    if run is None or run.profiler is None:
+        yield
+        return
+    with run.profiler.worker():
+        yield
+
+@contextmanager
+def attached(run: Optional[RunMetrics]):
+    """Make a run current in this thread, so phase() and add() count against it."""
+    previous = current()
+    _local.run = run
+    try:
+        yield run
+    finally:
+        _local.run = previous
+
+@contextmanager
+def track(operation: str, target: Dict):
+    """Collect phase metrics for everything this thread does inside the block and write them out."""
+    run = start(operation, target)
+    _local.run = run
+    status, error = "succeeded", None
+    try:
+        yield run
+    except Exception as e:
+        status, error = "failed", str(e)
+        raise
+    finally:
+        _local.run = None
+        finish(run, status, error)
+
+def previous_run(operation: str, target_id: str) -> Optional[Dict]:
+    """The target's last successful run of operation, from the tail of METRICS_FILE (or of the
+    rotated file, if the current one was started since)."""
+    for path in [METRICS_FILE, ROTATED_METRICS_FILE]:
+        try:
+            with path.open("rb") as f:
+                f.seek(max(0, f.seek(0, os.SEEK_END) - HISTORY_TAIL))
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+        for line in reversed(lines):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # partial first line of the tail
+            if record["operation"] == operation and record["target"] == target_id and record["status"] == "succeeded":
+                return record
+    return None
+
+def phase_totals(record: Dict, phase: str) -> tuple:
+    """(bytes, seconds) summed over a recorded run's phases with this name."""
+    phases = [p for p in record["phases"] if p["phase"] == phase]
+    return sum(p["bytes"] for p in phases), sum(p["duration"] for p in phases)
+
+def previous_bytes(operation: str, target_id: str, phase: str) -> Optional[int]:
+    """Bytes moved by a phase in the target's last successful run."""
+    record = previous_run(operation, target_id)
+    return (phase_totals(record, phase)[0] or None) if record else None
+
+
+def _prom_labels(**labels) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+
+def _prom_lines(record: Dict) -> List[str]:
+    base = {"target": record["target"], "operation": record["operation"]}
+    lines = [
+        f"db_backup_last_run_timestamp_seconds{{{_prom_labels(**base)}}} {record['timestamp']:.0f}",
+        f"db_backup_last_run_success{{{_prom_labels(**base)}}} {int(record['status'] == 'succeeded')}",
+        f"db_backup_run_duration_seconds{{{_prom_labels(**base)}}} {record['duration']:.3f}",
+        f"db_backup_process_peak_rss_bytes{{{_prom_labels(**base)}}} {record['process_peak_rss']}",
+    ]
+    # Per-table phases are summed; the JSON lines file keeps the per-table detail
+    totals = {}
+    for p in record["phases"]:
+        t = totals.setdefault(p["phase"], {"duration": 0.0, "bytes": 0, "rows": 0, "docs": 0})
+        for key in t:
+            t[key] += p[key]
+    for name, t in totals.items():
+        labels = _prom_labels(**base, phase=name)
+        lines.append(f"db_backup_phase_duration_seconds{{{labels}}} {t['duration']:.3f}")
+        lines.append(f"db_backup_phase_bytes{{{labels}}} {t['bytes']}")
+        lines.append(f"db_backup_phase_rows{{{labels}}} {t['rows'] + t['docs']}")
+    return lines
+
+def write_metrics(record: Dict) -> None:
+    with _write_lock:
+        _append_record(record)
+        _write_prom(record)
+
+def _append_record(record: Dict) -> None:
+    # Pipeline threads, the daemon and cron runs all append: each record is one write() to an O_APPEND
+    # descriptor, and the flock keeps a rotation from renaming the file between another writer's size check and write
+    line = (json.dumps(record) + "\n").encode()
+    with METRICS_FILE.with_suffix(".lock").open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if METRICS_FILE.exists() and METRICS_FILE.stat().st_size + len(line) > METRICS_MAX_BYTES:
+                METRICS_FILE.replace(ROTATED_METRICS_FILE)
+            fd = os.open(METRICS_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _write_prom(record: Dict) -> None:
+    # The textfile holds the latest run of every target; replace this target/operation's series
+    own = f'{{target="{record["target"]}",operation="{record["operation"]}"'
+    with PROM_FILE.with_suffix(".lock").open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            existing = PROM_FILE.read_text().splitlines() if PROM_FILE.exists() else []
+            kept = [line for line in existing if line and not line.startswith("#") and own not in line]
+            # Earlier versions wrote a per-run db_backup_peak_rss_bytes; drop it rather than leave it stale
+            kept = [line for line in kept if not line.startswith("db_backup_peak_rss_bytes{")]
+            families = itertools.groupby(sorted(kept + _prom_lines(record)), key=lambda line: line.split("{", 1)[0])
+            tmp_path = PROM_FILE.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text("".join(f"# TYPE {name} gauge\n" + "".join(f"{line}\n" for line in lines) for name, lines in families))
+            tmp_path.replace(PROM_FILE)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+from configs.init import logger, validate_config
+from operations import metrics
+from operations.backup_restore import compress_dumps, dump_target, perform_backup, prune_after_backup, upload_archives
+from operations.batch import host_key
+
+DEFAULT_QUEUE_SIZE = 2  # finished dumps (or archives) waiting per stage; bounds local disk in use
+
+
+class BackupJob:
+    def __init__(self, target: Dict):
+        self.target = target
+        self.run: Optional[metrics.RunMetrics] = None
+        self.files: List = []  # dumps, then archives
+        self.started = None
+
+
+class BackupPipeline:
+    """Backs targets up in stages with their own worker threads: dump -> compress -> upload.
+
+    Stages hand jobs on through bounded queues, so one target's archive uploads while the next
+    one compresses and a third dumps; a full queue makes the stage before it wait instead of
+    filling the disk. Checksums are computed while compressing (the archive is hashed as it's
+    written), so they don't get a pass of their own. Per-host limits only hold during the dump.
+    """
+
+    STAGES = ("dump", "compress", "upload")
+
+    def __init__(self, workers: Dict[str, int], per_host: int = 1, queue_size: int = DEFAULT_QUEUE_SIZE, notify: Callable = None):
+        self.notify = notify or (lambda target_id, state, error=None: None)  # per-target "running"/"succeeded"/"failed"
+        self.workers = {stage: max(1, workers.get(stage, 1)) for stage in self.STAGES}
+        self.per_host = max(1, per_host)
+        self.queue_size = max(1, queue_size)
+        self.lock = threading.Lock()
+        self.succeeded: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.busy = defaultdict(float)  # stage -> worker seconds spent on jobs
+
+    def run(self, targets: List[Dict]) -> Tuple[List[str], Dict[str, str]]:
+        """Back up targets; returns (succeeded ids, {failed id: error})."""
+        by_host = defaultdict(list)
+        for target in targets:
+            by_host[host_key(target)].append(target)
+        self.host_slots = {host: threading.BoundedSemaphore(self.per_host) for host in by_host}
+        # Interleave hosts so dump workers don't pile up waiting on one server's slots
+        queues = list(by_host.values())
+        ordered = [q[i] for i in range(max(map(len, queues), default=0)) for q in queues if i < len(q)]
+        inputs = {"dump": queue.Queue()}
+        for stage in self.STAGES[1:]:
+            inputs[stage] = queue.Queue(maxsize=self.queue_size)
+        for target in ordered:
+            inputs["dump"].put(BackupJob(target))
+        started = time.monotonic()
+        stages = []
+        for index, stage in enumerate(self.STAGES):
+            outbox = inputs[self.STAGES[index + 1]] if index + 1 < len(self.STAGES) else None
+            threads = [threading.Thread(target=self._work, args=(stage, inputs[stage], outbox), name=f"{stage}-{i}", daemon=True)
+                       for i in range(self.workers[stage])]
+            for thread in threads:
+                thread.start()
+            stages.append(threads)
+        for _ in range(self.workers["dump"]):
+            inputs["dump"].put(None)
+        # A stage is told to stop once every worker of the one before it has handed on its last job
+        for index, threads in enumerate(stages):
+            for thread in threads:
+                thread.join()
+            if index + 1 < len(self.STAGES):
+                for _ in range(self.workers[self.STAGES[index + 1]]):
+                    inputs[self.STAGES[index + 1]].put(None)
+        elapsed = time.monotonic() - started
+        if elapsed:
+            usage = ", ".join(f"{stage} {self.busy[stage] / (elapsed * self.workers[stage]):.0%} of {self.workers[stage]}"
+                              for stage in self.STAGES)
+            logger.info(f"Pipeline finished {len(targets)} target(s) in {elapsed:.1f}s; workers busy: {usage}")
+        return self.succeeded, self.failed
+
+    def _work(self, stage: str, inbox: queue.Queue, outbox: Optional[queue.Queue]) -> None:
+        while (job := inbox.get()) is not None:
+            started = time.monotonic()
+            try:
+                done = getattr(self, f"_{stage}")(job)
+            except Exception as e:
+                self._fail(job, e)
+                continue
+            finally:
+                with self.lock:
+                    self.busy[stage] += time.monotonic() - started
+            if done:
+                self._succeed(job)
+            elif outbox is not None:
+                outbox.put(job)  # blocks while the next stage is behind
+
+    def _dump(self, job: BackupJob) -> bool:
+        target = job.target
+        validate_config(target)
+        with self.host_slots[host_key(target)]:
+            logger.info(f"Backing up target: {target['id']}")
+            job.started = time.monotonic()
+            self.notify(target["id"], "running")
+            if target["database"]["type"] == "sqlite_fleet":
+                # Fleets already overlap packing and uploading their shards across processes
+                perform_backup(target)
+                return True
+            job.run = metrics.start("backup", target)
+            with metrics.attached(job.run):
+                job.files = dump_target(target, job.run)
+        return False
+
+    def _compress(self, job: BackupJob) -> bool:
+        with metrics.attached(job.run):
+            job.files = compress_dumps(job.target, job.files, job.run.plan)
+        return False
+
+    def _upload(self, job: BackupJob) -> bool:
+        with metrics.attached(job.run):
+            upload_archives(job.target, job.files)
+        metrics.finish(job.run, "succeeded")
+        prune_after_backup(job.target)
+        return True
+
+    def _succeed(self, job: BackupJob) -> None:
+        target_id = job.target["id"]
+        with self.lock:
+            self.succeeded.append(target_id)
+        logger.info(f"Backup of {target_id} finished in {time.monotonic() - job.started:.1f}s")
+        self.notify(target_id, "succeeded")
+
+    def _fail(self, job: BackupJob, error: Exception) -> None:
+        target_id = job.target["id"]
+        if job.run is not None and (job.run.operation, target_id) in metrics.active_runs:
+            metrics.finish(job.run, "failed", str(error))
+        with self.lock:
+            self.failed[target_id] = str(error)
+        logger.error(f"Backup of {target_id} failed: {error}")
+        self.notify(target_id, "failed", str(error))
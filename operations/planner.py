@@ -0,0 +1,117 @@
+import math
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+from configs.init import logger
+from operations import metrics
+from operations.throttle import human_bytes
+
+# Used until a target has a successful run in metrics.jsonl to learn from
+DEFAULT_DUMP_FACTOR = {"sqlite": 1.0, "sqlite_fleet": 1.0, "postgresql": 1.5, "mysql": 1.5, "mongodb": 1.5}  # dump bytes per byte of on-disk size
+DEFAULT_RATES = {"dump": 20e6, "compress": 30e6, "upload": 10e6}  # bytes/s
+DEFAULT_SQLITE_DUMP_RATE = 200e6
+DEFAULT_ARCHIVE_RATIO = {"stored": 1.0, "deflate": 0.35, "bzip2": 0.3, "lzma": 0.28}
+
+PARALLEL_THRESHOLD = 256 * 2**20  # dumps smaller than this aren't worth extra connections
+BYTES_PER_WORKER = 256 * 2**20
+DEFAULT_MAX_WORKERS = 4
+BATCH_BYTES = 4 * 2**20  # aim for this much data per fetch round trip
+MIN_FETCH, MAX_FETCH = 100, 20_000
+FREE_SPACE_MARGIN = 1.1
+# Largest dump that still gets each zip compression level; bigger dumps trade ratio for CPU time
+COMPRESSION_LEVELS = [(256 * 2**20, 9), (4 * 2**30, 6)]
+FASTEST_LEVEL = 1
+
+
+def _learned(target: Dict) -> Dict:
+    """Dump factor, archive ratio and phase rates observed in the target's last successful backup."""
+    learned = {}
+    record = metrics.previous_run("backup", target["id"])
+    if not record:
+        return learned
+    dump_bytes, _ = metrics.phase_totals(record, "dump")
+    previous_estimate = (record.get("plan") or {}).get("estimated_bytes")
+    if dump_bytes and previous_estimate:
+        learned["dump_factor"] = dump_bytes / previous_estimate
+    compress_in, _ = metrics.phase_totals(record, "compress")
+    archive_bytes, _ = metrics.phase_totals(record, "upload")
+    if compress_in and archive_bytes:
+        learned["archive_ratio"] = archive_bytes / compress_in
+    for phase in DEFAULT_RATES:
+        nbytes, seconds = metrics.phase_totals(record, phase)
+        if nbytes and seconds:
+            learned[f"{phase}_rate"] = nbytes / seconds
+    if "dump_rate" in learned:
+        # Predictions scale by workers, so learn the per-worker rate
+        learned["dump_rate"] /= (record.get("plan") or {}).get("workers", 1)
+    return learned
+
+def choose_workers(handler, target: Dict, dump_bytes: float, tables: int) -> int:
+    if not handler.parallel_dump or dump_bytes < PARALLEL_THRESHOLD or tables < 2:
+        return 1
+    max_workers = target["backup"].get("max_workers", DEFAULT_MAX_WORKERS)
+    return max(1, min(max_workers, tables, math.ceil(dump_bytes / BYTES_PER_WORKER)))
+
+def choose_fetch_size(handler, estimate: Dict) -> int:
+    if not estimate.get("rows"):
+        return handler.fetch_size
+    row_bytes = max(1, estimate["bytes"] / estimate["rows"])
+    return int(min(MAX_FETCH, max(MIN_FETCH, BATCH_BYTES / row_bytes)))
+
+def choose_compression_level(target: Dict, dump_bytes: float):
+    if "compression_level" in target["backup"]:
+        return target["backup"]["compression_level"]
+    if target["backup"].get("compression", "deflate") not in ["deflate", "bzip2"]:
+        return None  # zipfile ignores levels for stored and lzma
+    return next((level for limit, level in COMPRESSION_LEVELS if dump_bytes <= limit), FASTEST_LEVEL)
+
+def plan_backup(target: Dict, handler) -> Optional[Dict]:
+    """Predict dump/archive size and duration from cheap statistics, check free space, and pick
+    workers, fetch size and compression level. Raises ValueError if local_path can't hold the backup."""
+    db_type = target["database"]["type"]
+    try:
+        estimate = handler.estimate(target)
+    except Exception as e:
+        # Statistics are an optimisation; a backup must not fail because they're unavailable
+        logger.warning(f"Size estimate for {target['id']} failed, using defaults: {e}")
+        return None
+    learned = _learned(target)
+    dump_bytes = estimate["bytes"] * learned.get("dump_factor", DEFAULT_DUMP_FACTOR[db_type])
+    codec = target["backup"].get("compression", "deflate")
+    archive_bytes = dump_bytes * learned.get("archive_ratio", DEFAULT_ARCHIVE_RATIO[codec])
+
+    workers = choose_workers(handler, target, dump_bytes, len(estimate["tables"]))
+    rates = {phase: learned.get(f"{phase}_rate", rate) for phase, rate in DEFAULT_RATES.items()}
+    if db_type in ["sqlite", "sqlite_fleet"] and "dump_rate" not in learned:
+        rates["dump"] = DEFAULT_SQLITE_DUMP_RATE
+    duration = dump_bytes / (rates["dump"] * workers) + dump_bytes / rates["compress"]
+    if target["backup"]["cloud"]["type"] != "none":
+        duration += archive_bytes / rates["upload"]
+
+    local_path = Path(target["backup"]["local_path"])
+    local_path.mkdir(parents=True, exist_ok=True)
+    free = shutil.disk_usage(local_path).free
+    # The dump and its archive coexist until compression finishes
+    needed = (dump_bytes + archive_bytes) * FREE_SPACE_MARGIN
+    if needed > free:
+        raise ValueError(f"Not enough free space in {local_path}: backup needs ~{human_bytes(needed)}, {human_bytes(free)} free")
+
+    plan = {
+        "estimated_bytes": estimate["bytes"],
+        "estimated_rows": estimate.get("rows"),
+        "tables": len(estimate["tables"]),
+        "dump_bytes": int(dump_bytes),
+        "archive_bytes": int(archive_bytes),
+        "duration": round(duration, 1),
+        "free_bytes": free,
+        "workers": workers,
+        "fetch_size": choose_fetch_size(handler, estimate),
+        "compression_level": choose_compression_level(target, dump_bytes),
+        "learned": bool(learned),
+    }
+    logger.info(
+        f"Plan for {target['id']}: ~{human_bytes(dump_bytes)} dump, ~{human_bytes(archive_bytes)} archive, "
+        f"~{duration:.0f}s, {workers} worker(s), {plan['fetch_size']} rows per fetch, "
+        f"compression level {plan['compression_level'] if plan['compression_level'] is not None else 'default'}"
+    )
+    return plan
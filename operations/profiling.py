@@ -0,0 +1,112 @@
+import cProfile
+import pstats
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List
+from configs.init import logger
+from operations.metrics import Phase, RunMetrics
+
+TOP_FUNCTIONS = 15
+TOP_ALLOCATIONS = 10
+TRACE_FRAMES = 10
+_IGNORED_FRAMES = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"))
+
+
+def profile_dir(run: RunMetrics) -> Path:
+    """<local_path>/<type>_<id>_<name>_<timestamp>.<operation>.profile, alongside the run's archives."""
+    target = run.target
+    timestamp = datetime.fromtimestamp(run.started_at).strftime("%Y%m%d_%H%M%S")
+    name = f"{target['database']['type']}_{target['id']}_{target['database']['name']}_{timestamp}.{run.operation}.profile"
+    return Path(target["backup"]["local_path"]) / name
+
+
+class RunProfiler:
+    """cProfile stats and tracemalloc snapshots for each top-level phase of one run.
+
+    Attached to a RunMetrics, so segments follow the same phases as metrics.jsonl. Each phase
+    writes <phase>[-<handler>].pstats and .tracemalloc; summary.txt lists the hotspots. Work a
+    phase hands to worker threads (parallel table dumps) is profiled through worker() and merged in.
+    """
+
+    def __init__(self, run: RunMetrics):
+        self.run = run
+        self.out_dir = profile_dir(run)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.sections: List[str] = []
+        self.profile = None
+        self.workers: List[cProfile.Profile] = []
+        self.lock = threading.Lock()
+        self.before = None
+        self.owns_tracemalloc = not tracemalloc.is_tracing()
+        if self.owns_tracemalloc:
+            tracemalloc.start(TRACE_FRAMES)
+
+    def enter(self, phase: Phase) -> None:
+        self.before = tracemalloc.take_snapshot().filter_traces(_IGNORED_FRAMES)
+        tracemalloc.reset_peak()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    @contextmanager
+    def worker(self):
+        """Profile a worker thread of the open phase. Before Python 3.12 cProfile only sees the thread
+        that enabled it; from 3.12 on the phase's own profile already covers every thread."""
+        if self.profile is None or sys.version_info >= (3, 12):
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self.lock:
+                self.workers.append(profile)
+
+    def exit(self, phase: Phase) -> None:
+        self.profile.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(_IGNORED_FRAMES)
+        segment = "-".join(str(v) for v in [phase.name, *phase.labels.values()])
+        stats = pstats.Stats(self.profile)
+        with self.lock:
+            for profile in self.workers:
+                stats.add(profile)
+            self.workers = []
+        stats.dump_stats(self.out_dir / f"{segment}.pstats")
+        after.dump(str(self.out_dir / f"{segment}.tracemalloc"))
+        self.sections.append(self._summarize(segment, phase, stats, after.compare_to(self.before, "lineno"), peak))
+        self.profile = self.before = None
+
+    def _summarize(self, segment: str, phase: Phase, stats: pstats.Stats, growth: list, peak: int) -> str:
+        lines = [f"== {segment}: {phase.duration:.3f}s, peak traced memory {peak / 2**20:.1f} MiB"]
+        lines.append(f"  {'self s':>9} {'cum s':>9} {'calls':>9}  function")
+        hottest = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:TOP_FUNCTIONS]
+        for (filename, lineno, func), (_, calls, tottime, cumtime, _) in hottest:
+            lines.append(f"  {tottime:9.3f} {cumtime:9.3f} {calls:9d}  {func} ({Path(filename).name}:{lineno})")
+        lines.append(f"  {'net KiB':>9} {'blocks':>9}  allocation site")
+        for stat in growth[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size_diff / 1024:9.1f} {stat.count_diff:9d}  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines)
+
+    def finish(self, status: str) -> None:
+        if self.owns_tracemalloc:
+            tracemalloc.stop()
+        run = self.run
+        header = [
+            f"{run.operation} of {run.target['id']} ({run.handler}): {status}",
+            f"Phases profiled with cProfile; allocations traced with tracemalloc ({TRACE_FRAMES} frames).",
+            "Inspect with: python -m pstats <phase>.pstats",
+        ]
+        # Nested phases aren't profiled separately, but their timings show which table or collection dominated
+        nested = sorted((p for p in run.phases if "table" in p.labels or "collection" in p.labels), key=lambda p: p.duration, reverse=True)
+        if nested:
+            header.append("Slowest tables/collections:")
+            header.extend(f"  {p.duration:9.3f}s  {p.name} {' '.join(map(str, p.labels.values()))} ({p.rows or p.docs} rows, {p.bytes} bytes)" for p in nested[:10])
+        (self.out_dir / "summary.txt").write_text("\n\n".join(["\n".join(header), *self.sections]) + "\n")
+        logger.info(f"Profile written to {self.out_dir}")
@@ -0,0 +1,81 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Tuple
+from db_store.dbms_handler import get_storage_handler
+from configs.init import logger
+from operations.checksum import MANIFEST_SUFFIX
+
+DELTA_MARK = ".delta."  # incremental SQLite backups: <prefix><timestamp>.delta.zip
+
+RETENTION_PERIODS = {
+    "hourly": "%Y%m%d%H",
+    "daily": "%Y%m%d",
+    "weekly": "%G%V",
+    "monthly": "%Y%m",
+}
+
+
+def backup_prefix(target: Dict) -> str:
+    return f"{target['database']['type']}_{target['id']}_{target['database']['name']}_"
+
+def parse_backups(names: List[str], target: Dict) -> List[Tuple[datetime, str]]:
+    """Return (timestamp, name) pairs for this target's backups, newest first."""
+    pattern = re.compile(rf"^{re.escape(backup_prefix(target))}(\d{{8}}_\d{{6}})\.")
+    backups = []
+    for name in names:
+        if name.endswith(MANIFEST_SUFFIX):
+            continue  # pruned along with its archive
+        match = pattern.match(name)
+        if match:
+            backups.append((datetime.strptime(match.group(1), "%Y%m%d_%H%M%S"), name))
+    return sorted(backups, reverse=True)
+
+def select_expired(backups: List[Tuple[datetime, str]], retention: Dict) -> List[str]:
+    """Apply grandfather-father-son rules: keep the newest backup of each of the last N periods.
+    The newest backup overall is always kept."""
+    keep = {backups[0][0]} if backups else set()  # timestamps: a fleet run stores its shards and index under one
+    for period, fmt in RETENTION_PERIODS.items():
+        count = retention.get(period, 0)
+        seen = set()
+        for timestamp, name in backups:
+            if len(seen) >= count:
+                break
+            bucket = timestamp.strftime(fmt)
+            if bucket not in seen:
+                seen.add(bucket)
+                keep.add(timestamp)
+    # A kept delta needs the full backup it was taken against: the newest full one before it
+    for timestamp, name in backups:
+        if timestamp in keep and DELTA_MARK in name:
+            base = next((taken for taken, other in backups if taken < timestamp and DELTA_MARK not in other), None)
+            if base:
+                keep.add(base)
+    return [name for timestamp, name in backups if timestamp not in keep]
+
+def prune_backups(target: Dict, dry_run: bool = False) -> List[str]:
+    retention = target["backup"].get("retention")
+    if not retention:
+        logger.info(f"No retention policy for target {target['id']}, skipping prune")
+        return []
+
+    prefix = backup_prefix(target)
+    local_storage = get_storage_handler("local")
+    storages = [local_storage]
+    if target["backup"]["cloud"]["type"] != "none":
+        storages.append(get_storage_handler(target["backup"]["cloud"]["type"]))
+
+    expired = []
+    for storage in storages:
+        listed = storage.list_backups(prefix, target)
+        backups = parse_backups(listed, target)
+        names = select_expired(backups, retention)
+        manifests = set(listed) & {name + MANIFEST_SUFFIX for name in names}
+        kind = type(storage).__name__
+        if dry_run:
+            for name in names:
+                logger.info(f"[dry-run] Would prune {name} ({kind})")
+        elif names:
+            storage.delete(names + sorted(manifests), target)
+        logger.info(f"Pruned {len(names)} of {len(backups)} backups for {target['id']} ({kind})")
+        expired.extend(names)
+    return expired
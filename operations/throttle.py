@@ -0,0 +1,189 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from configs.init import logger
+
+PROGRESS_INTERVAL = 5.0  # seconds between progress log lines
+_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30}
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def parse_rate(value) -> int:
+    """Bytes/s from an int or a string such as "512K", "20M" or "1G"."""
+    text = str(value).strip().upper().removesuffix("/S").removesuffix("B")
+    unit = text[-1:] if text[-1:] in _UNITS else ""
+    try:
+        rate = float(text[:len(text) - len(unit)]) * _UNITS[unit]
+    except ValueError:
+        raise ValueError(f"Invalid rate '{value}' (expected bytes/s, e.g. 50M)") from None
+    if rate < 0:
+        raise ValueError(f"Rate must be non-negative: {value}")
+    return int(rate)
+
+def human_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} B" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+class TokenBucket:
+    """Blocking token bucket; a rate of 0 means unlimited.
+
+    Callers take tokens first and then sleep off any deficit, so concurrent streams queue up
+    behind each other and a chunk larger than the burst size still gets through.
+    """
+
+    def __init__(self, rate: int = 0, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or rate  # one second's worth
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, n: int) -> float:
+        if not self.rate or n <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+# direction ("read" from the database, "upload" to cloud storage) -> process-wide bucket
+_global = {"read": TokenBucket(), "upload": TokenBucket()}
+# (direction, target id) -> bucket, shared by concurrent runs of the same target
+_per_target: Dict[tuple, TokenBucket] = {}
+
+
+def configure(read_bandwidth=0, upload_bandwidth=0) -> None:
+    """Set the global limits shared by every target in this process."""
+    _global["read"] = TokenBucket(parse_rate(read_bandwidth or 0))
+    _global["upload"] = TokenBucket(parse_rate(upload_bandwidth or 0))
+    for direction, bucket in _global.items():
+        if bucket.rate:
+            logger.info(f"Global {direction} limit: {human_bytes(bucket.rate)}/s")
+
+def global_rate(direction: str) -> int:
+    return _global[direction].rate
+
+def _target_bucket(direction: str, target: Dict) -> TokenBucket:
+    rate = parse_rate(target["backup"].get(f"{direction}_rate", 0))
+    key = (direction, target["id"])
+    with _lock:
+        bucket = _per_target.get(key)
+        if bucket is None or bucket.rate != rate:
+            bucket = _per_target[key] = TokenBucket(rate)
+    return bucket
+
+def limit(direction: str, target: Optional[Dict], nbytes: int) -> None:
+    if target is not None:
+        _target_bucket(direction, target).consume(nbytes)
+    _global[direction].consume(nbytes)
+
+
+class Progress:
+    """Bytes, items, rate and ETA of one stream, logged every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, label: str, total: int = None, unit: str = "rows"):
+        self.label = label
+        self.total = total
+        self.unit = unit
+        self.bytes = 0
+        self.items = 0
+        self.started = time.monotonic()
+        self.reported = self.started
+        self.lock = threading.Lock()
+
+    def update(self, nbytes: int, items: int = 0) -> None:
+        with self.lock:
+            self.bytes += nbytes
+            self.items += items
+            now = time.monotonic()
+            if now - self.reported < PROGRESS_INTERVAL:
+                return
+            self.reported = now
+        logger.info(self.describe(now))
+
+    def describe(self, now: float = None) -> str:
+        elapsed = (now or time.monotonic()) - self.started
+        rate = self.bytes / elapsed if elapsed else 0.0
+        done = human_bytes(self.bytes)
+        if self.total:
+            done += f" / {human_bytes(self.total)} ({min(self.bytes / self.total, 1):.0%})"
+        text = f"{self.label}: {done}"
+        if self.items:
+            text += f", {self.items} {self.unit}"
+        text += f", {human_bytes(rate)}/s"
+        if self.total and rate and self.bytes < self.total:
+            eta = int((self.total - self.bytes) / rate)
+            text += f", ETA {eta // 60}m{eta % 60:02d}s"
+        return text
+
+    def close(self) -> None:
+        # Only worth a closing line if the stream ran long enough to report along the way
+        if self.reported != self.started:
+            logger.info(f"{self.describe()} - done in {time.monotonic() - self.started:.1f}s")
+
+
+@contextmanager
+def stream(label: str, target: Dict, total: int = None, unit: str = "rows"):
+    """Make target and a Progress current for this thread, for read() calls in handler loops."""
+    progress = Progress(label, total, unit)
+    previous = getattr(_local, "stream", None)
+    _local.stream = (target, progress)
+    try:
+        yield progress
+    finally:
+        _local.stream = previous
+        progress.close()
+
+def current() -> Optional[tuple]:
+    return getattr(_local, "stream", None)
+
+@contextmanager
+def attached(state: Optional[tuple]):
+    """Share another thread's stream (its target limits and Progress) with a worker thread."""
+    previous = getattr(_local, "stream", None)
+    _local.stream = state
+    try:
+        yield
+    finally:
+        _local.stream = previous
+
+def expect(total: int) -> None:
+    """Set the current stream's total once the handler knows it, enabling ETA."""
+    current = getattr(_local, "stream", None)
+    if current:
+        current[1].total = total
+
+def read(nbytes: int, items: int = 0) -> None:
+    """Account bytes read from the database: wait for the read limits, then report progress."""
+    target, progress = getattr(_local, "stream", None) or (None, None)
+    limit("read", target, nbytes)
+    if progress:
+        progress.update(nbytes, items)
+
+def reading_limited() -> bool:
+    target, _ = getattr(_local, "stream", None) or (None, None)
+    return bool(_global["read"].rate or (target and target["backup"].get("read_rate")))
+
+def upload_callback(target: Dict, label: str, total: int) -> Callable[[int], None]:
+    """boto3 transfer Callback: throttles upload threads and reports progress."""
+    progress = Progress(label, total, unit="")
+
+    def callback(nbytes: int) -> None:
+        limit("upload", target, nbytes)
+        progress.update(nbytes)
+
+    callback.progress = progress
+    return callback
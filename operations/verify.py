@@ -0,0 +1,228 @@
+import hashlib
+import json
+import re
+import sqlite3
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional
+from configs.init import logger
+from db_store.dbms_handler import get_storage_handler
+from operations import metrics
+from operations.backup_restore import decompress_backup
+from operations.checksum import MANIFEST_SUFFIX
+from operations.fleet import INDEX_SUFFIX
+from operations.retention import backup_prefix, parse_backups
+
+# Outside quotes: comment, string start (E'' strings take backslash escapes), dollar quote, statement end
+_SQL_TOKEN = re.compile(r"--|[Ee]'|'|\$[A-Za-z_0-9]*\$|;")
+_QUOTE_BACKSLASH = re.compile(r"\\.|''|'")
+_QUOTE_PLAIN = re.compile(r"''|'")
+
+
+def check_sql_framing(path: Path, backslash_escapes: bool) -> List[str]:
+    """Every string and dollar quote closed and every statement terminated, without parsing SQL."""
+    quote = None  # None, "'", "E'" or a $tag$
+    pending = False  # text seen since the last ';'
+    statements = 0
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for lineno, line in enumerate(f, 1):
+            pos = 0
+            while pos < len(line):
+                if quote is None:
+                    match = _SQL_TOKEN.search(line, pos)
+                    if line[pos:match.start() if match else len(line)].strip():
+                        pending = True
+                    if not match:
+                        break
+                    token, pos = match.group(), match.end()
+                    if token == "--":
+                        break
+                    if token == ";":
+                        statements += 1
+                        pending = False
+                    else:
+                        quote, pending = ("'" if token == "'" else "E'" if token[-1] == "'" else token), True
+                elif quote.startswith("$"):
+                    end = line.find(quote, pos)
+                    if end < 0:
+                        break
+                    quote, pos = None, end + len(quote)
+                else:
+                    pattern = _QUOTE_BACKSLASH if backslash_escapes or quote == "E'" else _QUOTE_PLAIN
+                    while (match := pattern.search(line, pos)) and match.group() != "'":
+                        pos = match.end()
+                    if not match:
+                        break
+                    quote, pos = None, match.end()
+    if quote:
+        return [f"unterminated {quote} quote at end of dump (line {lineno}); the dump looks truncated"]
+    if pending:
+        return [f"last statement isn't terminated (line {lineno}); the dump looks truncated"]
+    if not statements:
+        return ["dump contains no SQL statements"]
+    return []
+
+def check_mongodb_archive(path: Path) -> List[str]:
+    # MongoDB archives are extended JSON (not BSON), so check the document structure instead of BSON lengths
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except ValueError as e:
+        return [f"archive isn't valid JSON: {e}"]
+    problems = []
+    if not isinstance(data.get("metadata"), dict) or "database" not in data["metadata"]:
+        problems.append("archive has no metadata.database")
+    collections = data.get("collections")
+    if not isinstance(collections, dict):
+        return problems + ["archive has no collections object"]
+    problems.extend(f"collection {name} is not a list of documents" for name, docs in collections.items()
+                    if not isinstance(docs, list) or not all(isinstance(d, dict) for d in docs))
+    return problems
+
+def check_sqlite(path: Path) -> List[str]:
+    try:
+        with closing(sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)) as conn:
+            result = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        return [f"not a valid SQLite database: {e}"]
+    return [] if result == ["ok"] else [f"integrity_check: {'; '.join(result[:5])}"]
+
+def check_columnar(path: Path) -> List[str]:
+    """Read every batch of a Parquet/Arrow table file; a truncated or corrupt file fails to decode."""
+    from db_store.columnar import ensure_pyarrow, read_columnar
+    ensure_pyarrow(path.suffix[1:])
+    try:
+        _, _, batches = read_columnar(path)
+        for _ in batches:
+            pass
+    except Exception as e:
+        return [f"can't read {path.suffix[1:]} data: {e}"]
+    return []
+
+STRUCTURE_CHECKS = {
+    ".sql": {"postgresql": lambda p: check_sql_framing(p, False), "mysql": lambda p: check_sql_framing(p, True)},
+    ".archive": {"mongodb": check_mongodb_archive},
+    ".db": {"sqlite": check_sqlite},
+    ".delta": {"sqlite": check_sqlite},
+    ".parquet": {"postgresql": check_columnar, "mysql": check_columnar},
+    ".arrow": {"postgresql": check_columnar, "mysql": check_columnar},
+}
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def verify_chunks(storage, target: Dict, name: str, manifest: Dict, jobs: int) -> List[str]:
+    """Re-hash the stored archive chunk by chunk on parallel (ranged, on S3) reads."""
+    size = storage.size(name, target)
+    if size != manifest["size"]:
+        return [f"size is {size} bytes, manifest says {manifest['size']}"]
+    chunk_size = manifest["chunk_size"]
+
+    def chunk_ok(index: int) -> bool:
+        data = storage.read_range(name, target, index * chunk_size, chunk_size)
+        return hashlib.sha256(data).hexdigest() == manifest["chunks"][index]
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="verify") as executor:
+        results = list(executor.map(chunk_ok, range(len(manifest["chunks"]))))
+    metrics.add(bytes=size)
+    bad = [i for i, ok in enumerate(results) if not ok]
+    if bad:
+        return [f"{len(bad)} of {len(results)} chunks don't match the manifest (first at byte {bad[0] * chunk_size})"]
+    return []
+
+def check_fleet_archive(archive: Path, tmp_path: Path) -> List[str]:
+    """A fleet's index must parse; every database in a shard must extract (checking its CRC) and pass integrity_check."""
+    if archive.name.endswith(INDEX_SUFFIX):
+        try:
+            index = json.loads(archive.read_text())
+        except ValueError as e:
+            return [f"index isn't valid JSON: {e}"]
+        return [] if isinstance(index.get("files"), list) and index.get("shards") else ["index lists no shards or files"]
+    problems = []
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for member in zf.namelist():
+                extracted = Path(zf.extract(member, tmp_path / "files"))
+                metrics.add(bytes=extracted.stat().st_size)
+                problems.extend(f"{member}: {problem}" for problem in check_sqlite(extracted))
+                extracted.unlink()
+    except (zipfile.BadZipFile, OSError) as e:
+        problems.append(f"can't decompress: {e}")
+    return problems
+
+def verify_structure(storage, target: Dict, name: str, manifest: Optional[Dict]) -> List[str]:
+    """Decompress (zip CRCs are checked on the way), compare the dump's hash and check it's well-formed."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        local = Path(target["backup"]["local_path"]) / name
+        archive = local if target["backup"]["cloud"]["type"] == "none" else storage.retrieve(name, target, tmp_path)
+        if target["database"]["type"] == "sqlite_fleet":
+            return check_fleet_archive(archive, tmp_path)
+        try:
+            dump = decompress_backup(archive, tmp_path)
+        except Exception as e:
+            return [f"can't decompress: {e}"]
+        metrics.add(bytes=dump.stat().st_size)
+        problems = []
+        if manifest and _file_sha256(dump) != manifest["content"]["sha256"]:
+            problems.append("decompressed dump doesn't match the manifest's sha256")
+        check = STRUCTURE_CHECKS.get(dump.suffix, {}).get(target["database"]["type"])
+        if check:
+            problems.extend(check(dump))
+        return problems
+
+def verify_backup(target: Dict, name: str, jobs: int = 4, deep: bool = False) -> List[str]:
+    """Problems found in one stored backup; empty means it verified."""
+    storage = get_storage_handler(target["backup"]["cloud"]["type"])
+    try:
+        manifest = json.loads(storage.read_range(name + MANIFEST_SUFFIX, target))
+    except FileNotFoundError:
+        manifest = None
+    problems = []
+    if manifest:
+        with metrics.phase("checksum", archive=name):
+            problems.extend(verify_chunks(storage, target, name, manifest, jobs))
+    else:
+        logger.info(f"{name} has no manifest (made before checksums); checking its structure instead")
+    if (deep or not manifest) and not problems:
+        with metrics.phase("structure", archive=name):
+            problems.extend(verify_structure(storage, target, name, manifest))
+    return problems
+
+def verify_target(target: Dict, names: List[str] = None, latest: bool = False, jobs: int = 4, deep: bool = False) -> Dict[str, List[str]]:
+    """Verify the target's stored backups (or just names); returns {name: problems}. Raises if any failed,
+    so the run's metrics and Prometheus gauges record the failure."""
+    with metrics.track("verify", target):
+        if names is None:
+            storage = get_storage_handler(target["backup"]["cloud"]["type"])
+            backups = parse_backups(storage.list_backups(backup_prefix(target), target), target)
+            if latest:
+                # Every archive of the newest run (a fleet run has several)
+                backups = [backup for backup in backups if backup[0] == backups[0][0]]
+            names = [name for _, name in backups]
+        results = {}
+        for name in names:
+            try:
+                results[name] = verify_backup(target, name, jobs, deep)
+            except FileNotFoundError as e:
+                results[name] = [str(e)]
+            status = "FAILED: " + "; ".join(results[name]) if results[name] else "OK"
+            logger.info(f"Verify {target['id']} {name}: {status}")
+        failed = [name for name, problems in results.items() if problems]
+        if failed:
+            raise VerificationError(f"{len(failed)} of {len(results)} backup(s) of {target['id']} failed verification", results)
+        return results
+
+
+class VerificationError(ValueError):
+    def __init__(self, message: str, results: Dict[str, List[str]]):
+        super().__init__(message)
+        self.results = results
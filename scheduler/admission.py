@@ -0,0 +1,148 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict
+from configs.init import logger
+from operations.backup_restore import find_latest_backup
+from operations.batch import host_key
+from operations.throttle import parse_rate
+
+
+def estimate_backup_bytes(target: Dict) -> int:
+    """Size of the target's latest archive, used as the bytes-in-flight cost of its next run."""
+    latest = find_latest_backup(target, Path(target["backup"]["local_path"]))
+    return os.path.getsize(latest) if latest else 0
+
+
+class AdmissionController:
+    """Queues due backups by priority and deadline and starts them only while resource budgets allow.
+
+    Budgets (0 disables a budget):
+      jobs                 concurrent backups overall
+      per_host             concurrent dumps per database host
+      max_bytes_in_flight  sum of estimated archive sizes of running backups
+      upload_bandwidth     bytes/s shared by running S3 uploads; each reserves its
+                           target's ``upload_rate`` or ``upload_share`` of the total
+    """
+
+    def __init__(self, jobs: int = 4, per_host: int = 1, max_bytes_in_flight: int = 0,
+                 upload_bandwidth: int = 0, upload_share: float = 0.25):
+        self.jobs = max(1, jobs)
+        self.per_host = max(1, per_host)
+        self.max_bytes_in_flight = max_bytes_in_flight
+        self.upload_bandwidth = upload_bandwidth
+        self.upload_share = upload_share
+        self.executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="admitted")
+        self.lock = threading.Lock()
+        self.queue = []
+        self.seq = itertools.count()
+        self.running = 0
+        self.hosts = Counter()
+        self.bytes_in_flight = 0
+        self.upload_reserved = 0
+        self.delays = {"count": 0, "total": 0.0, "max": 0.0}
+        self.closed = False
+
+    def submit(self, target: Dict, fn: Callable[[Dict], None], deadline: float = None) -> None:
+        """Queue fn(target); deadline is an absolute timestamp used to order equal priorities."""
+        now = time.time()
+        job = {
+            "target": target,
+            "fn": fn,
+            "host": host_key(target),
+            "bytes": estimate_backup_bytes(target) if self.max_bytes_in_flight else 0,
+            "upload_rate": self._upload_reservation(target),
+            "queued_at": now,
+            "deadline": deadline if deadline is not None else now + target["backup"].get("deadline", 3600),
+        }
+        with self.lock:
+            if self.closed:
+                logger.info(f"Not queueing {target['id']}: shutting down")
+                return
+            heapq.heappush(self.queue, (-target["backup"].get("priority", 0), job["deadline"], next(self.seq), job))
+            self._dispatch()
+
+    def _upload_reservation(self, target: Dict) -> int:
+        if not self.upload_bandwidth or target["backup"]["cloud"]["type"] == "none":
+            return 0
+        rate = parse_rate(target["backup"].get("upload_rate", 0)) or int(self.upload_bandwidth * self.upload_share)
+        return min(rate, self.upload_bandwidth)
+
+    def _fits(self, job: Dict) -> bool:
+        if self.running >= self.jobs or self.hosts[job["host"]] >= self.per_host:
+            return False
+        if self.running == 0:
+            return True  # an oversized job must still run eventually
+        if self.max_bytes_in_flight and self.bytes_in_flight + job["bytes"] > self.max_bytes_in_flight:
+            return False
+        if self.upload_bandwidth and self.upload_reserved + job["upload_rate"] > self.upload_bandwidth:
+            return False
+        return True
+
+    def _dispatch(self) -> None:
+        # Caller holds self.lock. Admit in priority/deadline order, letting smaller jobs
+        # backfill around ones that don't fit yet.
+        waiting = []
+        while self.queue and self.running < self.jobs:
+            entry = heapq.heappop(self.queue)
+            job = entry[-1]
+            if not self._fits(job):
+                waiting.append(entry)
+                continue
+            self._acquire(job)
+            self.executor.submit(self._run, job)
+        for entry in waiting:
+            heapq.heappush(self.queue, entry)
+
+    def _acquire(self, job: Dict) -> None:
+        self.running += 1
+        self.hosts[job["host"]] += 1
+        self.bytes_in_flight += job["bytes"]
+        self.upload_reserved += job["upload_rate"]
+        delay = time.time() - job["queued_at"]
+        self.delays["count"] += 1
+        self.delays["total"] += delay
+        self.delays["max"] = max(self.delays["max"], delay)
+        target_id = job["target"]["id"]
+        if time.time() > job["deadline"]:
+            logger.warning(f"Backup of {target_id} admitted after its deadline (queued {delay:.1f}s)")
+        else:
+            logger.info(f"Backup of {target_id} admitted after {delay:.1f}s in queue")
+
+    def _release(self, job: Dict) -> None:
+        self.running -= 1
+        self.hosts[job["host"]] -= 1
+        self.bytes_in_flight -= job["bytes"]
+        self.upload_reserved -= job["upload_rate"]
+
+    def _run(self, job: Dict) -> None:
+        try:
+            job["fn"](job["target"])
+        finally:
+            with self.lock:
+                self._release(job)
+                self._dispatch()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            count = self.delays["count"]
+            return {
+                "queued": len(self.queue),
+                "running": self.running,
+                "bytes_in_flight": self.bytes_in_flight,
+                "upload_reserved": self.upload_reserved,
+                "admitted": count,
+                "avg_queue_delay": self.delays["total"] / count if count else 0.0,
+                "max_queue_delay": self.delays["max"],
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self.lock:
+            self.closed = True
+            self.queue.clear()
+        self.executor.shutdown(wait=wait)
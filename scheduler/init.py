@@ -1,36 +1,146 @@
+import heapq
+import random
 import threading
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List
+from datetime import datetime
+from typing import Dict
 from configs.init import logger
+from configs.store import TargetStore
+from db_store.connections import connections
+from operations import throttle
 from operations.backup_restore import perform_backup
+from scheduler.admission import AdmissionController
+from scheduler.cron import CronExpression
 
 
-def schedule_backups(targets: List[Dict], target_id: str = None) -> None:
-    selected_targets = [t for t in targets if target_id is None or t["id"] == target_id]
-    if not selected_targets:
-        raise ValueError(f"No targets found with id: {target_id}")
-
-    def run_scheduler(target: Dict):
-        intervals = {"hourly": timedelta(hours=1), "daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
-        interval = intervals[target["backup"]["schedule"]]
-        next_run = datetime.now() + interval
-        while True:
-            now = datetime.now()
-            if now >= next_run:
-                try:
-                    logger.info(f"Scheduled backup for target {target['id']}")
-                    perform_backup(target)
-                except Exception as e:
-                    logger.error(f"Scheduled backup failed for {target['id']}: {e}")
-                next_run = now + interval
-            time.sleep(60)
-
-    for target in selected_targets:
-        logger.info(f"Starting scheduler for target {target['id']}")
-        threading.Thread(target=run_scheduler, args=(target,), daemon=True).start()
+class Scheduler:
+    """Single timer heap that sleeps until the next due target and hands it to admission control.
+
+    The target store is re-checked every ``config_refresh`` seconds; added, removed or
+    rescheduled targets take effect without a restart.
+    """
+
+    def __init__(self, store: TargetStore, selection: Dict = None, jobs: int = 4, limits: Dict = None):
+        limits = limits or {}
+        self.store = store
+        self.selection = selection or {}
+        self.refresh_interval = max(1, limits.get("config_refresh", 30))
+        self.admission = AdmissionController(
+            jobs=jobs,
+            per_host=limits.get("per_host", 1),
+            max_bytes_in_flight=limits.get("max_bytes_in_flight", 0),
+            upload_bandwidth=throttle.parse_rate(limits.get("upload_bandwidth", 0)),
+            upload_share=limits.get("upload_share", 0.25),
+        )
+        self.targets = {}
+        self.crons = {}
+        self.generations = {}
+        self.heap = []
+        self.running = set()
+        self.cond = threading.Condition()
+        self.stopped = False
+        self.store_version = None
+        self._sync()
+
+    def _sync(self) -> None:
+        """Bring the schedule in line with the store's current targets."""
+        self.store_version = self.store.version
+        current = {t["id"]: t for t in self.store.select(**self.selection)}
+        now = datetime.now()
+        for target_id in set(self.targets) - set(current):
+            logger.info(f"Target {target_id} removed from schedule")
+            del self.targets[target_id], self.crons[target_id], self.generations[target_id]
+        for target_id, target in current.items():
+            old = self.targets.get(target_id)
+            self.targets[target_id] = target
+            if old and (old["backup"]["schedule"], old["backup"].get("jitter")) == (target["backup"]["schedule"], target["backup"].get("jitter")):
+                continue
+            try:
+                self.crons[target_id] = CronExpression(target["backup"]["schedule"])
+                # Bumping the generation invalidates heap entries from the old schedule
+                self.generations[target_id] = self.generations.get(target_id, 0) + 1
+                self._push(target_id, now)
+            except ValueError as e:
+                logger.error(f"Not scheduling {target_id}: {e}")
+                self.targets.pop(target_id)
+                self.crons.pop(target_id, None)
+                self.generations.pop(target_id, None)
+
+    def _push(self, target_id: str, after: datetime) -> None:
+        slot = self.crons[target_id].next_after(after)
+        due = slot.timestamp() + random.uniform(0, self.targets[target_id]["backup"].get("jitter", 0))
+        heapq.heappush(self.heap, (due, target_id, self.generations[target_id], slot))
+        logger.debug(f"Next backup for {target_id} at {datetime.fromtimestamp(due).isoformat(timespec='seconds')}")
+
+    def _run(self, target: Dict) -> None:
+        try:
+            logger.info(f"Scheduled backup for target {target['id']}")
+            perform_backup(target)
+        except Exception as e:
+            logger.error(f"Scheduled backup failed for {target['id']}: {e}")
+        finally:
+            with self.cond:
+                self.running.discard(target["id"])
+
+    def run_forever(self) -> None:
+        next_refresh = time.monotonic() + self.refresh_interval
+        with self.cond:
+            while not self.stopped:
+                if time.monotonic() >= next_refresh:
+                    next_refresh = time.monotonic() + self.refresh_interval
+                    try:
+                        self.store.refresh()
+                    except (OSError, ValueError) as e:
+                        logger.error(f"Config refresh failed, keeping current schedule: {e}")
+                    if self.store.version != self.store_version:
+                        self._sync()
+                wait = next_refresh - time.monotonic()
+                if self.heap:
+                    due, target_id, generation, slot = self.heap[0]
+                    if self.generations.get(target_id) != generation:
+                        heapq.heappop(self.heap)  # stale entry for a removed or rescheduled target
+                        continue
+                    now = datetime.now().timestamp()
+                    wait = min(wait, due - now) if due > now else None
+                if wait is not None:
+                    # Nothing due: sleep until the head is, or until the next refresh
+                    if wait > 0:
+                        self.cond.wait(timeout=wait)
+                    continue
+                heapq.heappop(self.heap)
+                if target_id in self.running:
+                    logger.warning(f"Skipping scheduled backup for {target_id}: previous run still in progress")
+                else:
+                    self.running.add(target_id)
+                    target = self.targets[target_id]
+                    # Admission globs the target's backups for its size estimate; don't hold up finishing runs meanwhile
+                    self.cond.release()
+                    try:
+                        self.admission.submit(target, self._run, slot.timestamp() + target["backup"].get("deadline", 3600))
+                    finally:
+                        self.cond.acquire()
+                # Missed slots (e.g. after a suspend) collapse into this run instead of firing back to back
+                self._push(target_id, max(slot, datetime.now()))
+
+    def stop(self, wait: bool = True) -> None:
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        self.admission.shutdown(wait=wait)
+        logger.info(f"Admission stats: {self.admission.stats()}")
+
+
+def schedule_backups(store: TargetStore, selection: Dict = None, jobs: int = 4, limits: Dict = None) -> None:
+    limits = limits or {}
+    connections.enable(limits.get("pool_idle_timeout", 300), limits.get("pool_size", 4))
+    throttle.configure(limits.get("read_bandwidth", 0), limits.get("upload_bandwidth", 0))
+    scheduler = Scheduler(store, selection, jobs, limits)
+    if not scheduler.targets:
+        raise ValueError("No targets found for the given selection.")
+    logger.info(f"Scheduler started for {len(scheduler.targets)} target(s) with {jobs} worker(s)")
     try:
-        while True:
-            time.sleep(3600)
+        scheduler.run_forever()
     except KeyboardInterrupt:
+        logger.info("Scheduler stopping, waiting for running backups...")
+        scheduler.stop()
         logger.info("Scheduler stopped")
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# configs.init creates ~/.db_backup and logs into it on import; keep tests out of the real one
+os.environ["HOME"] = tempfile.mkdtemp(prefix="db_backup_tests_")
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,102 @@
+import threading
+import pytest
+from scheduler import admission
+from scheduler.admission import AdmissionController
+
+
+def target(target_id: str, host: str = "db1", priority: int = 0, cloud: str = "none") -> dict:
+    return {"id": target_id, "database": {"type": "postgresql", "host": host, "port": 5432},
+            "backup": {"priority": priority, "cloud": {"type": cloud}}}
+
+
+class Jobs:
+    """Job functions that record their start and block until released."""
+
+    def __init__(self):
+        self.started = []
+        self.gates = {}
+        self.cond = threading.Condition()
+
+    def fn(self, target: dict) -> None:
+        with self.cond:
+            self.started.append(target["id"])
+            self.cond.notify_all()
+            gate = self.gates.setdefault(target["id"], threading.Event())
+        gate.wait(5)
+
+    def release(self, *target_ids: str) -> None:
+        with self.cond:
+            for target_id in target_ids:
+                self.gates.setdefault(target_id, threading.Event()).set()
+
+    def wait_started(self, count: int) -> list:
+        with self.cond:
+            assert self.cond.wait_for(lambda: len(self.started) >= count, 5)
+            return list(self.started)
+
+
+@pytest.fixture
+def jobs():
+    return Jobs()
+
+@pytest.fixture
+def make_controller(jobs):
+    """Controllers that are shut down once the test's jobs are all released."""
+    made = []
+
+    def make(**budgets):
+        made.append(AdmissionController(**budgets))
+        return made[-1]
+    yield make
+    jobs.release(*jobs.gates)
+    for controller in made:
+        controller.shutdown()
+
+
+def test_per_host_budget_holds_back_a_second_dump(jobs, make_controller):
+    controller = make_controller(jobs=4, per_host=1)
+    controller.submit(target("a", host="db1"), jobs.fn)
+    controller.submit(target("b", host="db1"), jobs.fn)
+    controller.submit(target("c", host="db2"), jobs.fn)
+    assert sorted(jobs.wait_started(2)) == ["a", "c"]
+    assert controller.stats()["queued"] == 1
+    jobs.release("a")
+    assert jobs.wait_started(3)[-1] == "b"
+
+def test_queue_orders_by_priority_then_deadline(jobs, make_controller):
+    controller = make_controller(jobs=1, per_host=4)
+    controller.submit(target("first"), jobs.fn)
+    jobs.wait_started(1)
+    controller.submit(target("late"), jobs.fn, deadline=200)
+    controller.submit(target("early"), jobs.fn, deadline=100)
+    controller.submit(target("urgent", priority=5), jobs.fn, deadline=300)
+    jobs.release("first", "urgent", "early")
+    assert jobs.wait_started(4) == ["first", "urgent", "early", "late"]
+
+def test_bytes_in_flight_budget_lets_small_jobs_backfill(jobs, make_controller, monkeypatch):
+    sizes = {"big": 80, "huge": 50, "small": 10}
+    monkeypatch.setattr(admission, "estimate_backup_bytes", lambda t: sizes[t["id"]])
+    controller = make_controller(jobs=4, per_host=4, max_bytes_in_flight=100)
+    for target_id in ["big", "huge", "small"]:
+        controller.submit(target(target_id), jobs.fn)
+    assert sorted(jobs.wait_started(2)) == ["big", "small"]
+    assert controller.stats()["bytes_in_flight"] == 90
+    jobs.release("big")
+    assert jobs.wait_started(3)[-1] == "huge"
+
+def test_oversized_job_still_runs_alone(jobs, make_controller, monkeypatch):
+    monkeypatch.setattr(admission, "estimate_backup_bytes", lambda t: 500)
+    controller = make_controller(jobs=4, per_host=4, max_bytes_in_flight=100)
+    controller.submit(target("a"), jobs.fn)
+    controller.submit(target("b"), jobs.fn)
+    assert jobs.wait_started(1) == ["a"]
+    assert controller.stats()["queued"] == 1
+
+def test_upload_bandwidth_is_reserved_per_upload(jobs, make_controller):
+    controller = make_controller(jobs=4, per_host=4, upload_bandwidth=100, upload_share=0.5)
+    for target_id in ["a", "b", "c"]:
+        controller.submit(target(target_id, cloud="s3"), jobs.fn)
+    assert sorted(jobs.wait_started(2)) == ["a", "b"]
+    assert controller.stats()["upload_reserved"] == 100
+    controller.submit(target("local"), jobs.fn)  # stores locally, so it reserves no bandwidth
+    assert jobs.wait_started(3)[-1] == "local"
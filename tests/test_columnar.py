@@ -0,0 +1,48 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+from db_store import columnar
+from db_store.columnar import ColumnarWriter, arrow_type, read_columnar
+
+COLUMNS = [
+    ("id", arrow_type("bigint")),
+    ("price", arrow_type("numeric", 10, 2)),
+    ("note", arrow_type("text")),
+    ("attrs", arrow_type("jsonb")),
+    ("raw", arrow_type("bytea")),
+    ("day", arrow_type("date")),
+    ("at", arrow_type("timestamp with time zone")),
+]
+ROWS = [
+    (1, Decimal("9.99"), "plain", {"a": [1, 2]}, b"\x00\xff", date(2026, 10, 19), datetime(2026, 10, 19, 6, 0, tzinfo=timezone.utc)),
+    (2, None, None, None, memoryview(b"mv"), None, None),
+    (3, Decimal("-1.50"), b"caf\xc3\xa9", [], bytearray(b"ba"), date(1970, 1, 1), datetime(2000, 1, 1, tzinfo=timezone.utc)),
+]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_round_trip(tmp_path, monkeypatch, fmt):
+    monkeypatch.setattr(columnar, "ROW_GROUP_ROWS", 2)  # several row groups / record batches
+    path = tmp_path / f"orders{columnar.COLUMNAR_FORMATS[fmt]}"
+    with ColumnarWriter(path, fmt, COLUMNS, {"table": "orders"}) as writer:
+        writer.write_rows(ROWS[:1])
+        writer.write_rows(ROWS[1:])
+    table, names, batches = read_columnar(path, batch_rows=2)
+    assert table == "orders" and names == [name for name, _ in COLUMNS]
+    assert [row for batch in batches for row in batch] == [
+        ROWS[0][:3] + ('{"a": [1, 2]}', b"\x00\xff") + ROWS[0][5:],
+        (2, None, None, None, b"mv", None, None),
+        (3, Decimal("-1.50"), "café", "[]", b"ba") + ROWS[2][5:],
+    ]
+
+def test_invalid_utf8_text_fails_instead_of_being_replaced(tmp_path):
+    path = tmp_path / "notes.parquet"
+    with pytest.raises(ValueError, match=r"Can't store notes\.body as string: .*use data_format 'sql'"):
+        with ColumnarWriter(path, "parquet", [("body", arrow_type("text"))], {"table": "notes"}) as writer:
+            writer.write_rows([(b"caf\xe9",)])
+
+def test_unconstrained_numeric_stays_exact_as_text():
+    assert arrow_type("numeric") == pa.string()
+    assert arrow_type("decimal", 50, 4) == pa.decimal256(50, 4)
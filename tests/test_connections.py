@@ -0,0 +1,102 @@
+import pytest
+from db_store import connections as connections_module
+from db_store.connections import ConnectionManager, ConnectionPool
+
+
+class Conn:
+    opened = 0
+
+    def __init__(self):
+        Conn.opened += 1
+        self.id = Conn.opened
+        self.healthy = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def check(conn) -> bool:
+    if not conn.healthy:
+        raise ConnectionError("server has gone away")
+    return True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    state = {"now": 100.0}
+    monkeypatch.setattr(connections_module.time, "monotonic", lambda: state["now"])
+    return state
+
+
+def test_released_connection_is_reused():
+    pool = ConnectionPool(Conn, check)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+def test_unhealthy_connection_is_replaced():
+    pool = ConnectionPool(Conn, check)
+    stale = pool.acquire()
+    pool.release(stale)
+    stale.healthy = False
+    fresh = pool.acquire()
+    assert fresh is not stale and stale.closed
+    assert pool.leased == 1 and pool.idle == []
+
+def test_failed_reset_discards_the_connection():
+    def reset(conn):
+        raise RuntimeError("rollback failed")
+    pool = ConnectionPool(Conn, check, reset)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert conn.closed and pool.idle == [] and pool.leased == 0
+
+def test_idle_cap_closes_extra_connections():
+    pool = ConnectionPool(Conn, check, max_idle=1)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert [conn for _, conn in pool.idle] == [first] and second.closed
+
+def test_evicts_only_connections_idle_past_the_timeout(clock):
+    pool = ConnectionPool(Conn, check)
+    old, recent = pool.acquire(), pool.acquire()
+    pool.release(old)
+    clock["now"] += 200
+    pool.release(recent)
+    clock["now"] += 150
+    assert pool.evict_idle(300) == 1
+    assert old.closed and not recent.closed
+    assert [conn for _, conn in pool.idle] == [recent]
+
+def test_shared_connection_isnt_evicted_while_leased(clock):
+    pool = ConnectionPool(Conn, check, shared=True)
+    client = pool.acquire()
+    assert pool.acquire() is client
+    clock["now"] += 1000
+    assert pool.evict_idle(300) == 0
+    pool.release(client)
+    pool.release(client)
+    clock["now"] += 1000
+    assert pool.evict_idle(300) == 1 and client.closed
+
+def test_manager_pools_per_target_settings(monkeypatch):
+    monkeypatch.setitem(connections_module.DRIVERS, "fake", (lambda db_config, dbname: Conn(), check, None, False))
+    manager = ConnectionManager()
+    manager.enabled = True
+    target = {"id": "app", "database": {"type": "fake", "name": "app", "host": "db1"}}
+    conn = manager.acquire("fake", target)
+    manager.release(conn)
+    assert manager.acquire("fake", target) is conn
+    manager.release(conn)
+    # Edited connection settings must never reuse the old connection
+    edited = {**target, "database": {**target["database"], "host": "db2"}}
+    assert manager.acquire("fake", edited) is not conn
+
+def test_manager_disabled_opens_a_connection_each_time(monkeypatch):
+    monkeypatch.setitem(connections_module.DRIVERS, "fake", (lambda db_config, dbname: Conn(), check, None, False))
+    manager = ConnectionManager()
+    target = {"id": "app", "database": {"type": "fake", "name": "app"}}
+    conn = manager.acquire("fake", target)
+    manager.release(conn)
+    assert conn.closed and manager.acquire("fake", target) is not conn
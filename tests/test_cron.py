@@ -0,0 +1,37 @@
+from datetime import datetime
+import pytest
+from scheduler.cron import CronExpression
+
+MONDAY = datetime(2026, 10, 19, 6, 30)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("daily", datetime(2026, 10, 20, 0, 0)),
+    ("hourly", datetime(2026, 10, 19, 7, 0)),
+    ("*/15 * * * *", datetime(2026, 10, 19, 6, 45)),
+    ("0 9 * * 1-5", datetime(2026, 10, 19, 9, 0)),
+    ("0 0 * * 7", datetime(2026, 10, 25, 0, 0)),  # 7 is Sunday, like 0
+    ("0 12 1 * *", datetime(2026, 11, 1, 12, 0)),
+    ("0 0 29 2 *", datetime(2028, 2, 29, 0, 0)),
+])
+def test_next_after(expression, expected):
+    assert CronExpression(expression).next_after(MONDAY) == expected
+
+def test_next_after_is_strictly_after():
+    assert CronExpression("0 0 * * *").next_after(datetime(2026, 10, 20, 0, 0)) == datetime(2026, 10, 21, 0, 0)
+
+def test_next_after_skips_the_weekend():
+    assert CronExpression("0 9 * * 1-5").next_after(datetime(2026, 10, 23, 10, 0)) == datetime(2026, 10, 26, 9, 0)
+
+def test_restricted_day_fields_match_either():
+    # Friday the 23rd comes before the 13th of next month
+    assert CronExpression("0 0 13 * 5").next_after(MONDAY) == datetime(2026, 10, 23, 0, 0)
+
+def test_never_firing_schedule():
+    with pytest.raises(ValueError, match="never fires"):
+        CronExpression("0 0 30 2 *").next_after(MONDAY)
+
+@pytest.mark.parametrize("expression", ["0 0 * *", "60 * * * *", "* * * * 8", "*/0 * * * *", "0 0 5-1 * *"])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError, match="Invalid schedule"):
+        CronExpression(expression)
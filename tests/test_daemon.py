@@ -0,0 +1,75 @@
+import asyncio
+import json
+import stat
+import threading
+import time
+import pytest
+from configs.init import CONFIG_FILE
+from daemon import client
+from daemon import init as daemon_init
+from db_store.connections import ConnectionManager
+
+TARGET = {"id": "app", "database": {"type": "sqlite", "name": "app", "path": "/tmp/app.sqlite"},
+          "backup": {"local_path": "/tmp", "schedule": "daily", "cloud": {"type": "none"}}}
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    CONFIG_FILE.write_text(json.dumps({"targets": [TARGET]}))
+    monkeypatch.setattr(daemon_init, "connections", ConnectionManager())
+    backup_daemon = daemon_init.BackupDaemon(jobs=1)
+    yield backup_daemon
+    backup_daemon.executor.shutdown(wait=True)
+    CONFIG_FILE.unlink()
+
+def wait_finished(backup_daemon, job_id: str) -> dict:
+    deadline = time.monotonic() + 5
+    while (job := backup_daemon.handle({"op": "status", "job": job_id})["jobs"][0])["state"] not in ("succeeded", "failed"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return job
+
+
+def test_ping_and_unknown_ops(daemon):
+    assert daemon.handle({"op": "ping"})["ok"]
+    with pytest.raises(ValueError, match="Unknown op"):
+        daemon.handle({"op": "nope"})
+
+def test_restore_job_reports_its_outcome(daemon, monkeypatch):
+    calls = []
+    monkeypatch.setattr(daemon_init, "perform_restore", lambda target, *args: calls.append((target["id"], args)))
+    job = daemon.handle({"op": "restore", "id": "app", "file": "/tmp/app.db.zip"})["jobs"][0]
+    assert wait_finished(daemon, job["job"])["error"] is None
+    assert calls == [("app", ("/tmp/app.db.zip", True, False, None))]
+
+def test_failed_job_keeps_its_error(daemon, monkeypatch):
+    def fail(target, *args):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(daemon_init, "perform_restore", fail)
+    job = daemon.handle({"op": "restore", "id": "app", "file": "x.zip"})["jobs"][0]
+    finished = wait_finished(daemon, job["job"])
+    assert (finished["state"], finished["error"]) == ("failed", "disk full")
+
+def test_unknown_target_is_rejected(daemon):
+    with pytest.raises(ValueError, match="No targets found with id: missing"):
+        daemon.handle({"op": "backup", "ids": ["missing"]})
+
+def test_socket_round_trip(daemon):
+    server = threading.Thread(target=asyncio.run, args=(daemon.serve(),))
+    server.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not client.is_running():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert stat.S_IMODE(client.SOCKET_PATH.stat().st_mode) == 0o600
+        assert client.request({"op": "status"}) == {"ok": True, "jobs": []}
+        assert client.request({"op": "reload"}) == {"ok": True, "targets": 1}
+        # Errors come back as replies and the daemon keeps serving
+        with pytest.raises(ValueError, match="No job with id: 42"):
+            client.request({"op": "status", "job": "42"})
+        assert client.request({"op": "shutdown"}) == {"ok": True}
+    finally:
+        server.join(5)
+    assert not server.is_alive()
+    assert not client.SOCKET_PATH.exists()
@@ -0,0 +1,27 @@
+from pathlib import Path
+from operations.fleet import plan_shards
+
+
+def files(*sizes):
+    return [(Path(f"/data/db{i}.sqlite"), f"db{i}.sqlite", size) for i, size in enumerate(sizes)]
+
+
+def test_one_shard_per_worker_when_small():
+    shards = plan_shards(files(10, 10, 10, 10), shard_bytes=1000, workers=2)
+    assert [[name for _, name, _ in shard] for shard in shards] == [["db0.sqlite", "db1.sqlite"], ["db2.sqlite", "db3.sqlite"]]
+
+def test_shard_bytes_bounds_shard_count():
+    shards = plan_shards(files(*[100] * 10), shard_bytes=250, workers=1)
+    assert len(shards) == 4
+    assert all(sum(size for _, _, size in shard) <= 300 for shard in shards)
+
+def test_keeps_order_and_every_file():
+    planned = files(5, 70, 1, 30, 8, 50, 2)
+    shards = plan_shards(planned, shard_bytes=60, workers=3)
+    assert [entry for shard in shards for entry in shard] == planned
+
+def test_no_more_shards_than_files():
+    assert len(plan_shards(files(10, 10), shard_bytes=1000, workers=8)) == 2
+
+def test_empty_files_still_form_one_shard():
+    assert plan_shards(files(0, 0, 0), shard_bytes=1000, workers=1) == [files(0, 0, 0)]
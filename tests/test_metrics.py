@@ -0,0 +1,39 @@
+import json
+import threading
+import pytest
+from operations import metrics
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_FILE", tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(metrics, "ROTATED_METRICS_FILE", tmp_path / "metrics.jsonl.1")
+    monkeypatch.setattr(metrics, "PROM_FILE", tmp_path / "db_backup.prom")
+    return tmp_path
+
+def record(target: str, n: int = 0) -> dict:
+    return {"target": target, "operation": "backup", "timestamp": 1700000000 + n, "status": "succeeded",
+            "duration": 1.0, "process_peak_rss": 0, "phases": [], "n": n}
+
+
+def test_concurrent_appends_stay_whole_lines(files):
+    threads = [threading.Thread(target=lambda i=i: [metrics.write_metrics(record(f"t{i}", n)) for n in range(25)]) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    lines = (files / "metrics.jsonl").read_text().splitlines()
+    assert sorted((r["target"], r["n"]) for r in map(json.loads, lines)) == sorted((f"t{i}", n) for i in range(8) for n in range(25))
+
+def test_rotates_past_the_cap(files, monkeypatch):
+    line_bytes = len(json.dumps(record("app")) + "\n")
+    monkeypatch.setattr(metrics, "METRICS_MAX_BYTES", line_bytes * 3)
+    for n in range(5):
+        metrics.write_metrics(record("app", n))
+    assert [json.loads(line)["n"] for line in (files / "metrics.jsonl.1").read_text().splitlines()] == [0, 1, 2]
+    assert [json.loads(line)["n"] for line in (files / "metrics.jsonl").read_text().splitlines()] == [3, 4]
+
+def test_previous_run_reads_the_rotated_file(files):
+    (files / "metrics.jsonl.1").write_text(json.dumps(record("app", 7)) + "\n")
+    (files / "metrics.jsonl").write_text(json.dumps(record("other")) + "\n")
+    assert metrics.previous_run("backup", "app")["n"] == 7
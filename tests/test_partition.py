@@ -0,0 +1,39 @@
+from datetime import date, datetime
+from decimal import Decimal
+import pytest
+from db_store.dbms import partition_ranges
+
+
+def test_months_cover_dates():
+    assert partition_ranges(date(2026, 1, 30), date(2026, 3, 2), "month") == [
+        ("2026-01", datetime(2026, 1, 1), datetime(2026, 2, 1)),
+        ("2026-02", datetime(2026, 2, 1), datetime(2026, 3, 1)),
+        ("2026-03", datetime(2026, 3, 1), datetime(2026, 4, 1)),
+    ]
+
+def test_days_cross_year_end():
+    assert partition_ranges(datetime(2026, 12, 31, 23), datetime(2027, 1, 1, 1), "day") == [
+        ("2026-12-31", datetime(2026, 12, 31), datetime(2027, 1, 1)),
+        ("2027-01-01", datetime(2027, 1, 1), datetime(2027, 1, 2)),
+    ]
+
+def test_years():
+    assert [label for label, _, _ in partition_ranges(datetime(2025, 6, 1), datetime(2026, 2, 1), "year")] == ["2025", "2026"]
+
+def test_single_value():
+    assert partition_ranges(datetime(2026, 5, 5, 10), datetime(2026, 5, 5, 10), "day") == [
+        ("2026-05-05", datetime(2026, 5, 5), datetime(2026, 5, 6))]
+
+def test_numeric_steps_align_to_interval():
+    assert partition_ranges(7, 25, 10) == [("0-9", 0, 10), ("10-19", 10, 20), ("20-29", 20, 30)]
+
+def test_numeric_decimal():
+    assert partition_ranges(Decimal("5"), Decimal("12"), 5) == [
+        ("5-9", Decimal("5"), Decimal("10")), ("10-14", Decimal("10"), Decimal("15"))]
+
+def test_empty_table():
+    assert partition_ranges(None, None, "day") == []
+
+def test_rejects_text_columns():
+    with pytest.raises(ValueError, match="Can't partition str"):
+        partition_ranges("a", "z", "day")
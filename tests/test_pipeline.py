@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+import pytest
+from operations import metrics, pipeline
+from operations.pipeline import BackupPipeline
+
+
+def target(target_id: str, host: str = "db1") -> dict:
+    return {"id": target_id, "database": {"type": "postgresql", "name": target_id, "host": host, "port": 5432, "user": "backup", "password": ""},
+            "backup": {"local_path": "/backups", "schedule": "daily", "cloud": {"type": "none"}}}
+
+
+class Stages:
+    """Stand-ins for dump_target/compress_dumps/upload_archives that log each call."""
+
+    def __init__(self, monkeypatch, fail: dict = None, dump_seconds: float = 0):
+        self.fail = fail or {}  # stage -> target id that raises there
+        self.dump_seconds = dump_seconds
+        self.events = []
+        self.dumping = {}
+        self.max_dumping = {}
+        self.lock = threading.Lock()
+        monkeypatch.setattr(pipeline, "dump_target", self.dump)
+        monkeypatch.setattr(pipeline, "compress_dumps", lambda t, files, plan: self.step("compress", t, files, ".zip"))
+        monkeypatch.setattr(pipeline, "upload_archives", lambda t, files: self.step("upload", t, files))
+        monkeypatch.setattr(pipeline, "prune_after_backup", lambda t: self.step("prune", t))
+
+    def step(self, stage: str, target: dict, files: list = None, suffix: str = ""):
+        with self.lock:
+            self.events.append((stage, target["id"], list(files or [])))
+        if self.fail.get(stage) == target["id"]:
+            raise RuntimeError(f"{stage} failed")
+        return [f + suffix for f in files or []]
+
+    def dump(self, target: dict, run) -> list:
+        host = target["database"]["host"]
+        with self.lock:
+            self.dumping[host] = self.dumping.get(host, 0) + 1
+            self.max_dumping[host] = max(self.max_dumping.get(host, 0), self.dumping[host])
+        time.sleep(self.dump_seconds)
+        with self.lock:
+            self.dumping[host] -= 1
+        return self.step("dump", target, [f"{target['id']}.sql"])
+
+    def stages_of(self, target_id: str) -> list:
+        return [(stage, files) for stage, tid, files in self.events if tid == target_id]
+
+
+@pytest.fixture(autouse=True)
+def metrics_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_FILE", tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(metrics, "PROM_FILE", tmp_path / "db_backup.prom")
+    return tmp_path / "metrics.jsonl"
+
+
+def test_each_target_passes_through_the_stages_in_order(monkeypatch):
+    stages = Stages(monkeypatch)
+    notified = []
+    backup = BackupPipeline({"dump": 2, "compress": 2, "upload": 2}, per_host=4, notify=lambda *args: notified.append(args))
+    succeeded, failed = backup.run([target("a"), target("b"), target("c", host="db2")])
+    assert sorted(succeeded) == ["a", "b", "c"] and failed == {}
+    for target_id in "abc":
+        assert stages.stages_of(target_id) == [("dump", [f"{target_id}.sql"]), ("compress", [f"{target_id}.sql"]),
+                                               ("upload", [f"{target_id}.sql.zip"]), ("prune", [])]
+        assert [args for args in notified if args[0] == target_id] == [(target_id, "running"), (target_id, "succeeded")]
+
+def test_failure_stops_only_that_target(monkeypatch, metrics_files):
+    stages = Stages(monkeypatch, fail={"compress": "b"})
+    notified = []
+    succeeded, failed = BackupPipeline({}, notify=lambda *args: notified.append(args)).run([target("a"), target("b"), target("c")])
+    assert sorted(succeeded) == ["a", "c"]
+    assert failed == {"b": "compress failed"}
+    assert [stage for stage, _ in stages.stages_of("b")] == ["dump", "compress"]
+    assert ("b", "failed", "compress failed") in notified
+    records = {r["target"]: r for r in map(json.loads, metrics_files.read_text().splitlines())}
+    assert records["b"]["status"] == "failed" and records["b"]["error"] == "compress failed"
+    assert records["a"]["status"] == records["c"]["status"] == "succeeded"
+    assert ("backup", "b") not in metrics.active_runs
+
+def test_invalid_target_fails_before_dumping(monkeypatch):
+    stages = Stages(monkeypatch)
+    broken = target("broken")
+    del broken["backup"]["local_path"]
+    succeeded, failed = BackupPipeline({}).run([broken, target("a")])
+    assert succeeded == ["a"] and failed["broken"] == "Backup requires 'local_path'"
+    assert stages.stages_of("broken") == []
+
+def test_per_host_limit_holds_across_dump_workers(monkeypatch):
+    stages = Stages(monkeypatch, dump_seconds=0.05)
+    targets = [target(f"one{i}", host="db1") for i in range(3)] + [target(f"two{i}", host="db2") for i in range(3)]
+    succeeded, _ = BackupPipeline({"dump": 4}, per_host=1).run(targets)
+    assert len(succeeded) == 6
+    assert stages.max_dumping == {"db1": 1, "db2": 1}
@@ -0,0 +1,53 @@
+from datetime import datetime
+from operations.retention import parse_backups, select_expired
+
+TARGET = {"id": "app", "database": {"type": "sqlite", "name": "main"}}
+
+
+def backups(*specs):
+    """(timestamp, name) pairs, newest first, from ("YYYYmmdd_HHMMSS", suffix) specs."""
+    pairs = [(datetime.strptime(stamp, "%Y%m%d_%H%M%S"), f"sqlite_app_main_{stamp}.{suffix}") for stamp, suffix in specs]
+    return sorted(pairs, reverse=True)
+
+
+def test_parse_backups_skips_manifests_and_other_targets():
+    names = [
+        "sqlite_app_main_20261018_010000.db.zip",
+        "sqlite_app_main_20261018_010000.db.zip.manifest.json",
+        "sqlite_app_main_20261019_010000.delta.zip",
+        "sqlite_other_main_20261019_010000.db.zip",
+    ]
+    assert parse_backups(names, TARGET) == [
+        (datetime(2026, 10, 19, 1, 0), "sqlite_app_main_20261019_010000.delta.zip"),
+        (datetime(2026, 10, 18, 1, 0), "sqlite_app_main_20261018_010000.db.zip"),
+    ]
+
+def test_keeps_newest_of_each_day():
+    listed = backups(("20261019_120000", "db.zip"), ("20261019_010000", "db.zip"),
+                     ("20261018_120000", "db.zip"), ("20261017_120000", "db.zip"))
+    assert select_expired(listed, {"daily": 2}) == ["sqlite_app_main_20261019_010000.db.zip", "sqlite_app_main_20261017_120000.db.zip"]
+
+def test_periods_combine():
+    listed = backups(("20261019_120000", "db.zip"), ("20261018_120000", "db.zip"),
+                     ("20261001_120000", "db.zip"), ("20260915_120000", "db.zip"))
+    # daily keeps the 19th; monthly keeps the newest of October (the 19th again) and of September
+    assert select_expired(listed, {"daily": 1, "monthly": 2}) == [
+        "sqlite_app_main_20261018_120000.db.zip", "sqlite_app_main_20261001_120000.db.zip"]
+
+def test_kept_delta_keeps_its_base():
+    listed = backups(("20261019_120000", "delta.zip"), ("20261018_120000", "delta.zip"),
+                     ("20261017_120000", "db.zip"), ("20261016_120000", "db.zip"))
+    assert select_expired(listed, {"daily": 1}) == ["sqlite_app_main_20261018_120000.delta.zip", "sqlite_app_main_20261016_120000.db.zip"]
+
+def test_delta_base_is_newest_full_before_it():
+    listed = backups(("20261019_120000", "delta.zip"), ("20261018_120000", "db.zip"),
+                     ("20261017_120000", "delta.zip"), ("20261016_120000", "db.zip"))
+    assert select_expired(listed, {"daily": 1}) == ["sqlite_app_main_20261017_120000.delta.zip", "sqlite_app_main_20261016_120000.db.zip"]
+
+def test_zero_policy_keeps_newest():
+    listed = backups(("20261019_120000", "db.zip"), ("20261018_120000", "db.zip"))
+    assert select_expired(listed, {"daily": 0}) == ["sqlite_app_main_20261018_120000.db.zip"]
+
+def test_runs_sharing_a_timestamp_are_kept_together():
+    listed = backups(("20261019_120000", "shard-0001.zip"), ("20261019_120000", "index.json"), ("20261018_120000", "index.json"))
+    assert select_expired(listed, {"daily": 1}) == ["sqlite_app_main_20261018_120000.index.json"]
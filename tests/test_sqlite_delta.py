@@ -0,0 +1,81 @@
+import shutil
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+import pytest
+from db_store import sqlite as sqlite_module
+from db_store.sqlite import SQLiteHandler
+from operations.checksum import MANIFEST_SUFFIX
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_module, "PAGE_STATE_DIR", tmp_path / "pages")
+    db = tmp_path / "app.sqlite"
+    with closing(sqlite3.connect(db)) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, body TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, f"row {i} " * 20) for i in range(2000)])
+        conn.commit()
+    target = {"id": "app", "database": {"type": "sqlite", "name": "app", "path": str(db)},
+              "backup": {"local_path": str(tmp_path / "backups"), "incremental": True, "cloud": {"type": "none"}, "step_sleep": 0}}
+    (tmp_path / "backups").mkdir()
+    return SQLiteHandler(), target, db
+
+def snapshot(handler, target, name: str):
+    path = Path(target["backup"]["local_path"]) / name
+    return path, handler.copy_stepped(target, target["database"]["path"], path)
+
+def full_backup(handler, target):
+    """A full backup as stored: kept under its archive's name, with its manifest in storage."""
+    path, page_size = snapshot(handler, target, "full.db")
+    assert handler._delta_or_full(target, path, page_size) == path
+    (path.parent / (path.name + ".zip" + MANIFEST_SUFFIX)).write_text("{}")
+    return path
+
+def update(db, sql: str):
+    with closing(sqlite3.connect(db)) as conn:
+        conn.execute(sql)
+        conn.commit()
+
+
+def test_delta_round_trip(setup):
+    handler, target, db = setup
+    base = full_backup(handler, target)
+    update(db, "UPDATE t SET body = 'changed' WHERE id IN (5, 1500)")
+    update(db, "INSERT INTO t VALUES (5000, 'new')")
+    path, page_size = snapshot(handler, target, "second.db")
+    expected = path.read_bytes()
+
+    delta = handler._delta_or_full(target, path, page_size)
+    assert delta.suffix == ".delta" and not path.exists()
+    assert delta.stat().st_size < base.stat().st_size / 4
+    assert handler.delta_base(delta) == "full.db.zip"
+    image = handler.apply_delta(base, delta)
+    assert image.read_bytes() == expected
+    with closing(sqlite3.connect(image)) as conn:
+        assert conn.execute("SELECT body FROM t WHERE id IN (5, 5000) ORDER BY id").fetchall() == [("changed",), ("new",)]
+
+def test_delta_against_the_wrong_base_is_refused(setup, tmp_path):
+    handler, target, db = setup
+    base = full_backup(handler, target)
+    wrong = shutil.copyfile(base, tmp_path / "wrong.db")
+    update(db, "UPDATE t SET body = 'changed' WHERE id = 5")
+    delta = handler._delta_or_full(target, *snapshot(handler, target, "second.db"))
+    update(wrong, "UPDATE t SET body = 'other' WHERE id = 7")
+    with pytest.raises(ValueError, match="isn't the full backup"):
+        handler.apply_delta(wrong, delta)
+
+def test_mostly_changed_database_gets_a_full_backup(setup):
+    handler, target, db = setup
+    full_backup(handler, target)
+    update(db, "UPDATE t SET body = 'rewritten ' || body")
+    path, page_size = snapshot(handler, target, "second.db")
+    assert handler._delta_or_full(target, path, page_size) == path
+
+def test_full_backup_missing_from_storage_gets_a_full_backup(setup):
+    handler, target, db = setup
+    base = full_backup(handler, target)
+    (base.parent / (base.name + ".zip" + MANIFEST_SUFFIX)).unlink()
+    update(db, "UPDATE t SET body = 'changed' WHERE id = 5")
+    path, page_size = snapshot(handler, target, "second.db")
+    assert handler._delta_or_full(target, path, page_size) == path
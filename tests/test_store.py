@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+import pytest
+from configs.store import TargetStore
+
+
+def target(target_id: str, **extra) -> dict:
+    return {"id": target_id, "database": {"type": "sqlite", "name": target_id, "path": f"/data/{target_id}.sqlite"},
+            "backup": {"local_path": "/backups", "schedule": "daily", "cloud": {"type": "none"}}, **extra}
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"targets": [target("a", tags=["prod"], group="eu")], "scheduler": {"jobs": 2}}))
+    return path
+
+
+def test_select_by_id_tag_and_group(config):
+    store = TargetStore(config)
+    store.add(target("b", tags=["prod", "pg"], group="us"))
+    assert [t["id"] for t in store.select(tags=["prod"])] == ["a", "b"]
+    assert [t["id"] for t in store.select(tags=["prod"], groups=["us"])] == ["b"]
+    assert [t["id"] for t in store.select(["b", "a"])] == ["b", "a"]
+
+def test_concurrent_writers_dont_lose_edits(config):
+    stores = [TargetStore(config) for _ in range(4)]
+    threads = [threading.Thread(target=lambda s=s, i=i: [s.add(target(f"t{i}_{n}")) for n in range(10)]) for i, s in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    saved = json.loads(config.read_text())
+    assert len(saved["targets"]) == 41 and saved["scheduler"] == {"jobs": 2}
+
+def test_failed_change_leaves_the_file_alone(config, monkeypatch):
+    store = TargetStore(config)
+    before = config.read_text()
+    with pytest.raises(ValueError, match="already exists"):
+        store.add(target("a"))
+
+    def fsync(fd):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "fsync", fsync)
+    with pytest.raises(OSError, match="disk full"):
+        store.add(target("b"))
+    assert config.read_text() == before
+    assert store.get("b") is None
+    assert sorted(p.name for p in config.parent.iterdir()) == ["config.json", "config.lock"]
+
+def test_refresh_picks_up_other_writers(config):
+    store, other = TargetStore(config), TargetStore(config)
+    assert not store.refresh()
+    other.remove("a")
+    assert store.refresh()
+    assert store.targets == [] and store.get("a") is None
+    assert not store.refresh()
+
+def test_writes_one_target_per_line_past_the_pretty_print_limit(config, monkeypatch):
+    monkeypatch.setattr("configs.store.PRETTY_PRINT_LIMIT", 1)
+    store = TargetStore(config)
+    store.add(target("b"))
+    assert len(config.read_text().splitlines()) == 7
+    assert TargetStore(config).config == store.config
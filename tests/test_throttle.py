@@ -0,0 +1,58 @@
+import pytest
+from operations import throttle
+from operations.throttle import TokenBucket, parse_rate
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock that time.sleep advances, recording each sleep."""
+    state = {"now": 1000.0, "sleeps": []}
+
+    def sleep(seconds):
+        state["sleeps"].append(seconds)
+        state["now"] += seconds
+
+    monkeypatch.setattr(throttle.time, "monotonic", lambda: state["now"])
+    monkeypatch.setattr(throttle.time, "sleep", sleep)
+    return state
+
+
+def test_unlimited_never_waits(clock):
+    assert TokenBucket(0).consume(10**9) == 0.0
+    assert clock["sleeps"] == []
+
+def test_burst_is_free(clock):
+    bucket = TokenBucket(100)
+    assert bucket.consume(100) == 0.0
+    assert clock["sleeps"] == []
+
+def test_deficit_is_slept_off(clock):
+    bucket = TokenBucket(100)
+    bucket.consume(100)
+    assert bucket.consume(50) == pytest.approx(0.5)
+    assert bucket.consume(100) == pytest.approx(1.0)
+
+def test_refills_with_time(clock):
+    bucket = TokenBucket(100)
+    bucket.consume(100)
+    clock["now"] += 0.5
+    assert bucket.consume(50) == 0.0
+
+def test_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(100, burst=200)
+    bucket.consume(200)
+    clock["now"] += 60
+    assert bucket.consume(200) == 0.0
+    assert bucket.consume(100) == pytest.approx(1.0)
+
+def test_oversized_chunk_gets_through(clock):
+    assert TokenBucket(100).consume(300) == pytest.approx(2.0)
+
+@pytest.mark.parametrize("value, expected", [(0, 0), ("512K", 512 * 1024), ("20M", 20 * 2**20), ("1G/s", 2**30), ("1.5MB", int(1.5 * 2**20))])
+def test_parse_rate(value, expected):
+    assert parse_rate(value) == expected
+
+@pytest.mark.parametrize("value", ["fast", "-1M"])
+def test_parse_rate_rejects(value):
+    with pytest.raises(ValueError):
+        parse_rate(value)
@@ -0,0 +1,48 @@
+import pytest
+from operations.verify import check_sql_framing
+
+
+@pytest.fixture
+def dump(tmp_path):
+    def write(text: str):
+        path = tmp_path / "dump.sql"
+        path.write_text(text, encoding="utf-8")
+        return path
+    return write
+
+
+def test_complete_dump(dump):
+    path = dump("-- header\nCREATE TABLE t (a text);\nINSERT INTO t VALUES ('it''s; fine');\n")
+    assert check_sql_framing(path, backslash_escapes=False) == []
+
+def test_multiline_string(dump):
+    path = dump("INSERT INTO t VALUES ('line one\n-- not a comment;\nline three');\n")
+    assert check_sql_framing(path, backslash_escapes=False) == []
+
+def test_dollar_quoted_body(dump):
+    path = dump("CREATE FUNCTION f() RETURNS int AS $body$\nBEGIN\n  RETURN 1;\nEND;\n$body$ LANGUAGE plpgsql;\n")
+    assert check_sql_framing(path, backslash_escapes=False) == []
+
+def test_truncated_inside_string(dump):
+    problems = check_sql_framing(dump("INSERT INTO t VALUES ('cut off\n"), backslash_escapes=False)
+    assert len(problems) == 1 and "unterminated ' quote" in problems[0]
+
+def test_truncated_inside_dollar_quote(dump):
+    problems = check_sql_framing(dump("CREATE FUNCTION f() RETURNS int AS $$\nBEGIN\n"), backslash_escapes=False)
+    assert len(problems) == 1 and "unterminated $$ quote" in problems[0]
+
+def test_unterminated_statement(dump):
+    problems = check_sql_framing(dump("CREATE TABLE t (a int);\nINSERT INTO t VALUES (1)\n"), backslash_escapes=False)
+    assert len(problems) == 1 and "isn't terminated" in problems[0]
+
+def test_backslash_escapes(dump):
+    path = dump("INSERT INTO t VALUES ('a \\' quote');\n")
+    assert check_sql_framing(path, backslash_escapes=True) == []
+    # Without backslash escapes the same quote ends the string and leaves one open
+    assert check_sql_framing(path, backslash_escapes=False) != []
+
+def test_e_strings_always_take_backslash_escapes(dump):
+    assert check_sql_framing(dump("INSERT INTO t VALUES (E'a \\' quote');\n"), backslash_escapes=False) == []
+
+def test_empty_dump(dump):
+    assert check_sql_framing(dump("-- nothing here\n"), backslash_escapes=False) == ["dump contains no SQL statements"]